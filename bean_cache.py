@@ -0,0 +1,139 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from utils import get_module_logger
+from sample_store import sample_count, samples_since, replay_samples
+
+
+logger = get_module_logger(__name__)
+
+
+class CacheEntry(object):
+    __slots__ = ('fingerprint', 'beans')
+
+    def __init__(self, fingerprint, beans):
+        self.fingerprint = fingerprint
+        self.beans = beans
+
+
+class BeanSamples(object):
+    __slots__ = ('bean', 'samples')
+
+    def __init__(self, bean):
+        self.bean = bean
+        # family key -> samples added by the collector for this bean
+        self.samples = None
+
+
+class BeanCache(object):
+    """
+    The last decoded beans of each jmx document, with the md5 of its raw bytes.
+    A document whose bytes did not change is not decoded again, and the samples
+    built from its beans are replayed instead of mapping them again. At most
+    `size` beans are kept, the least recently used documents are dropped first.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.by_bean = {}
+        self.beans = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.beans -= len(entry.beans)
+        for bean in entry.beans:
+            self.by_bean.pop(id(bean), None)
+
+    def lookup(self, url, content):
+        """
+        The beans decoded from `url` last time if `content` did not change, else
+        None and the fingerprint to store the new beans with.
+        """
+        fingerprint = hashlib.md5(content).digest()
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None and entry.fingerprint == fingerprint:
+                del self.entries[url]
+                self.entries[url] = entry
+                self.hits += 1
+                return entry.beans, fingerprint
+            self.misses += 1
+        return None, fingerprint
+
+    def store(self, url, fingerprint, beans):
+        with self.lock:
+            if url in self.entries:
+                self._remove(url)
+            self.entries[url] = CacheEntry(fingerprint, beans)
+            self.beans += len(beans)
+            for bean in beans:
+                self.by_bean[id(bean)] = BeanSamples(bean)
+            while self.beans > self.size and self.entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        return beans
+
+    def map_bean(self, bean, families, handler):
+        """
+        Call handler(bean), which adds samples to the metric families of `families`,
+        or add the samples it built the last time it got this same bean.
+        """
+        entry = self.by_bean.get(id(bean))
+        if entry is None or entry.bean is not bean:
+            handler(bean)
+            return
+        if entry.samples is not None and all(key in families for key in entry.samples):
+            for key, samples in entry.samples.items():
+                # kept in the label table of this refresh, the one of the last refresh is not pinned
+                entry.samples[key] = replay_samples(families[key], samples)
+            return
+        counts = dict((key, sample_count(family)) for key, family in families.items())
+        handler(bean)
+        samples = {}
+        for key, family in families.items():
+            if sample_count(family) > counts.get(key, 0):
+                samples[key] = samples_since(family, counts.get(key, 0))
+        entry.samples = samples
+
+    def collect(self):
+        hits = CounterMetricFamily("hadoop_exporter_bean_cache_hits", "Number of jmx documents reused because their content did not change")
+        hits.add_metric([], self.hits)
+        yield hits
+        misses = CounterMetricFamily("hadoop_exporter_bean_cache_misses", "Number of jmx documents decoded because they are new or changed")
+        misses.add_metric([], self.misses)
+        yield misses
+        evictions = CounterMetricFamily("hadoop_exporter_bean_cache_evictions", "Number of jmx documents dropped from the cache to keep it under its size")
+        evictions.add_metric([], self.evictions)
+        yield evictions
+        entries = GaugeMetricFamily("hadoop_exporter_bean_cache_entries", "Number of cached beans")
+        entries.add_metric([], self.beans)
+        yield entries
+
+
+_cache = None
+
+
+def configure(size):
+    global _cache
+    _cache = BeanCache(size) if size > 0 else None
+
+
+def bean_cache():
+    return _cache
+
+
+def map_bean(bean, families, handler):
+    if _cache is None:
+        handler(bean)
+    else:
+        _cache.map_bean(bean, families, handler)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+
+from utils import get_module_logger
+from fetch_plan import bean_pattern, parse_object_name, BeanPattern
+from bean_cache import map_bean
+
+
+logger = get_module_logger(__name__)
+
+# Bean names resolved by one router are cached, up to this many.
+CACHE_SIZE = 65536
+
+
+class BeanKey(namedtuple('BeanKey', ['domain', 'service', 'name', 'sub'])):
+    """The parts of an ObjectName used for dispatch, `name` is the `type` of java.lang beans."""
+    __slots__ = ()
+
+
+def parse_bean_key(name):
+    domain, props = parse_object_name(name)
+    return BeanKey(domain, props.get('service'), props.get('name', props.get('type')), props.get('sub'))
+
+
+class BeanRouter(object):
+    """
+    Map a bean to the metrics/*/<name>.json file describing it. Each ObjectName is
+    parsed once and looked up in a dict, patterns with wildcards such as
+    RpcActivityForPort* are only tried for names not seen before.
+    """
+    def __init__(self, service, file_list):
+        self.routes = {}
+        self.patterns = []
+        self.resolved = {}
+        for file_name in file_list:
+            pattern = bean_pattern(service, file_name)
+            _, props = parse_object_name(pattern)
+            if any('*' in v for v in props.values()):
+                self.patterns.append((BeanPattern(pattern), file_name))
+            else:
+                self.routes.setdefault(parse_bean_key(pattern.rstrip(",*")), file_name)
+
+    def route(self, name):
+        if name in self.resolved:
+            return self.resolved[name]
+        file_name = self.routes.get(parse_bean_key(name))
+        if file_name is None:
+            for pattern, pattern_file_name in self.patterns:
+                if pattern.match(name):
+                    file_name = pattern_file_name
+                    break
+        if len(self.resolved) >= CACHE_SIZE:
+            self.resolved.clear()
+        self.resolved[name] = file_name
+        return file_name
+
+    def dispatch(self, beans, handlers, families):
+        """Map each bean that has a handler into the metric families families[<file name>]."""
+        for bean in beans:
+            file_name = self.route(bean['name'])
+            if file_name in handlers:
+                map_bean(bean, families[file_name], handlers[file_name])
@@ -0,0 +1,149 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+Time, retained objects and peak memory of one collect of each collector, fed
+with the beans of examples/*.json and synthetic clusters instead of HTTP.
+
+    python benchmarks/bench_collectors.py [-datanodes 1000 5000 20000]
+                                          [-queues 1000 5000] [-users 2]
+                                          [-repeat 3] [-collector namenode ...]
+
+Each case runs in its own process, reading its beans from a file, and prints
+one JSON object per line. `nodes` 0 stands for the example document as is,
+`retained_objects` is the number of objects the collect left alive.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from fixtures import load_example, namenode_document, resourcemanager_document, node_beans
+
+import hdfs_datanode
+import yarn_nodemanager
+from common import CommonMetricCollector
+from sample_store import sample_count
+from hdfs_namenode import NameNodeMetricCollector
+from hdfs_datanode import DataNodeMetricCollector
+from yarn_resourcemanager import ResourceManagerMetricCollector
+from yarn_nodemanager import NodeManagerMetricCollector
+
+COLLECTORS = ["namenode", "datanode", "resourcemanager", "nodemanager", "common"]
+
+
+class FixtureScrape(object):
+    """Stands for ScrapeMetrics, returns the same bean lists on every scrape."""
+    def __init__(self, beans_list):
+        self.beans_list = beans_list
+
+    def __call__(self, urls, plan=None):
+        return self
+
+    def scrape(self):
+        return self.beans_list
+
+
+class FixtureNode(object):
+    """Stands for the NameNode or ResourceManager collector a node collector reads its targets from."""
+    dns = nms = set(["http://fixture/jmx"])
+
+
+def beans_list(collector, size, queues, users):
+    if collector == "namenode":
+        return [namenode_document(size)['beans'] if size else load_example("NameNode")['beans']]
+    if collector == "resourcemanager":
+        return [resourcemanager_document(size, queues, users)['beans']]
+    example = load_example("NodeManager" if collector == "nodemanager" else "DataNode")
+    return [node_beans(example, i) for i in range(max(size, 1))]
+
+
+def build(collector, beans):
+    scrape = FixtureScrape(beans)
+    if collector == "namenode":
+        c = NameNodeMetricCollector("bench", ["http://fixture/jmx"])
+        c.scrape_metrics = scrape
+        return c.collect
+    if collector == "resourcemanager":
+        c = ResourceManagerMetricCollector("bench", ["http://fixture/jmx"], "root.*")
+        c.scrape_metrics = scrape
+        return c.collect
+    if collector == "datanode":
+        hdfs_datanode.ScrapeMetrics = scrape
+        return DataNodeMetricCollector("bench", FixtureNode()).collect
+    if collector == "nodemanager":
+        yarn_nodemanager.ScrapeMetrics = scrape
+        return NodeManagerMetricCollector("bench", FixtureNode()).collect
+    c = CommonMetricCollector("bench", "hdfs", "datanode")
+
+    def collect():
+        c.setup_labels(beans[0])
+        for i, node in enumerate(beans):
+            metrics = c.get_metrics(node, "node-{0:05d}".format(i))
+        for service in metrics:
+            for metric in metrics[service].values():
+                yield metric
+    return collect
+
+
+def child(collector, path, repeat):
+    with open(path, 'rb') as f:
+        beans = json.load(f)
+    collect = build(collector, beans)
+    gc.collect()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    objects = len(gc.get_objects())
+    metrics = list(collect())
+    gc.collect()
+    retained = len(gc.get_objects()) - objects
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+    # counted after the measures, compact families build their samples on demand
+    samples = sum(sample_count(metric) for metric in metrics)
+    del metrics
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        list(collect())
+        times.append(time.time() - start)
+    return {"seconds": min(times), "mean_seconds": sum(times) / len(times), "samples": samples,
+            "retained_objects": retained, "peak_rss_kb": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='collector benchmark')
+    parser.add_argument('-datanodes', type=int, nargs='+', default=[1000, 5000, 20000], help='Number of DataNodes (NameNodeInfo.LiveNodes, DataNode and common collectors) and NodeManagers. default: 1000 5000 20000')
+    parser.add_argument('-queues', type=int, nargs='+', default=[1000, 5000], help='Number of synthetic YARN leaf queues. default: 1000 5000')
+    parser.add_argument('-users', type=int, default=2, help='Number of users of each synthetic queue. default: 2')
+    parser.add_argument('-repeat', type=int, default=3, help='Number of timed runs. default: 3')
+    parser.add_argument('-collector', nargs='+', choices=COLLECTORS, default=COLLECTORS, help='Collectors to run. default: all')
+    parser.add_argument('-child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print json.dumps(child(args.child[0], args.child[1], args.repeat))
+        return
+    for collector in args.collector:
+        sizes = [(0, 0)] + [(n, 0) for n in args.datanodes]
+        if collector == "resourcemanager":
+            sizes += [(0, n) for n in args.queues]
+        for size, queues in sizes:
+            fd, path = tempfile.mkstemp(suffix=".json")
+            with os.fdopen(fd, 'wb') as f:
+                json.dump(beans_list(collector, size, queues, args.users), f)
+            try:
+                output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "-repeat", str(args.repeat), "-child", collector, path])
+            finally:
+                os.remove(path)
+            result = {"benchmark": "collector", "collector": collector, "nodes": size, "queues": queues,
+                      "users": args.users if queues else 0}
+            result.update(json.loads(output))
+            print json.dumps(result, sort_keys=True)
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+Decode time and peak memory of a NameNode jmx document, decoded in one piece
+by decoder.load_beans as the exporter does by default, or walked by
+decoder.iter_beans as with -stream-above, for every installed json module.
+
+    python benchmarks/bench_decode.py [-datanodes 10000] [-repeat 5]
+
+Each case runs in its own process, reading the document from a file, and
+prints one JSON object per line.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from fixtures import load_example, namenode_document
+
+import utils
+import decoder
+from fetch_plan import compile_plan
+
+CHUNK_SIZE = 64 * 1024
+
+
+def document(spec):
+    if spec == "example":
+        return json.dumps(load_example("NameNode"))
+    return json.dumps(namenode_document(int(spec)))
+
+
+def run_case(case, path):
+    mode, name = case.split(":")
+    loads = decoder.get_loads(name)
+    plan = compile_plan("namenode", utils.get_file_list("namenode") + utils.get_file_list("common"))
+    with open(path, 'rb') as f:
+        if mode == "full":
+            decoder.configure(name)
+            return decoder.load_beans(f.read(), plan.wants)
+        chunks = iter(lambda: f.read(CHUNK_SIZE), "")
+        return list(decoder.iter_beans(chunks, plan.wants, loads))
+
+
+def child(case, path, repeat):
+    gc.collect()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    beans = run_case(case, path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+    del beans
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        run_case(case, path)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"seconds": best, "peak_rss_kb": peak}
+
+
+def installed():
+    names = ["json"]
+    for name in ["simplejson", "ujson"]:
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='jmx document decode benchmark')
+    parser.add_argument('-datanodes', type=int, default=10000, help='Number of LiveNodes in the synthetic document. default: 10000')
+    parser.add_argument('-repeat', type=int, default=5, help='Number of timed runs, the best is reported. default: 5')
+    parser.add_argument('-child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print json.dumps(child(args.child[0], args.child[1], args.repeat))
+        return
+    for spec in ["example", str(args.datanodes)]:
+        raw = document(spec)
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw)
+        try:
+            for name in installed():
+                for mode in ["full", "stream"]:
+                    case = "{0}:{1}".format(mode, name)
+                    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "-repeat", str(args.repeat), "-child", case, path])
+                    result = {"benchmark": "decode", "document": spec, "bytes": len(raw), "case": case}
+                    result.update(json.loads(output))
+                    print json.dumps(result, sort_keys=True)
+                    sys.stdout.flush()
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
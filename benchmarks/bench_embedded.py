@@ -0,0 +1,60 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+Decode time of the JSON documents embedded in bean attributes, with
+yaml.safe_load as the collectors used to, with the stdlib json module and with
+decoder.load_embedded / decoder.count_embedded.
+
+    python benchmarks/bench_embedded.py [-nodes 1000 5000] [-repeat 3]
+
+Prints one JSON object per line, `speedup` is relative to yaml.safe_load.
+"""
+
+import json
+import time
+import argparse
+
+import yaml
+
+from fixtures import find_bean, namenode_document, resourcemanager_document
+
+import decoder
+
+
+def best_of(repeat, func, value):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        func(value)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def attributes(nodes):
+    nninfo = find_bean(namenode_document(nodes, corrupt_files=nodes * 10), "NameNodeInfo")
+    rmnminfo = find_bean(resourcemanager_document(nodes), "RMNMInfo")
+    yield "LiveNodes", nninfo['LiveNodes'], decoder.load_embedded
+    yield "LiveNodeManagers", rmnminfo['LiveNodeManagers'], decoder.load_embedded
+    yield "CorruptFiles", nninfo['CorruptFiles'], decoder.count_embedded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='embedded attribute decode benchmark')
+    parser.add_argument('-nodes', type=int, nargs='+', default=[1000, 5000], help='Number of DataNodes and NodeManagers. default: 1000 5000')
+    parser.add_argument('-repeat', type=int, default=3, help='Number of timed runs, the best is reported. default: 3')
+    args = parser.parse_args()
+    decoder.configure("auto")
+    for nodes in args.nodes:
+        for attribute, value, func in attributes(nodes):
+            baseline = best_of(1, yaml.safe_load, value)
+            cases = [("yaml", baseline), ("json", best_of(args.repeat, json.loads, value)),
+                     (func.__name__, best_of(args.repeat, func, value))]
+            for case, seconds in cases:
+                print json.dumps({"benchmark": "embedded", "attribute": attribute, "nodes": nodes, "bytes": len(value),
+                                  "case": case, "seconds": seconds, "speedup": baseline / seconds if seconds else None},
+                                 sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
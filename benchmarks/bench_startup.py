@@ -0,0 +1,130 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+Startup time of the exporter: the imports and the construction of every
+collector in a fresh process, and the time to the first /metrics response
+holding samples of every collector against benchmarks/simulator.py. Each is
+measured with a cold metric catalog cache, then with the cache written by the
+cold run.
+
+    python benchmarks/bench_startup.py [-repeat 3] [-timeout 60]
+                                       [simulator flags, e.g. -datanodes 1000]
+
+Prints one JSON object per line.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import requests
+
+import simulator
+import catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metric prefix of each collector, /metrics is complete once all of them are in.
+PREFIXES = ["hadoop_hdfs_namenode_", "hadoop_hdfs_datanode_", "hadoop_yarn_resourcemanager_", "hadoop_yarn_nodemanager_",
+            "hadoop_hdfs_journalnode_"]
+
+CONSTRUCT = """
+import time
+start = time.time()
+import hadoop_jmx_exporter
+from hdfs_namenode import NameNodeMetricCollector
+from hdfs_datanode import DataNodeMetricCollector
+from hdfs_journalnode import JournalNodeMetricCollector
+from yarn_resourcemanager import ResourceManagerMetricCollector
+from yarn_nodemanager import NodeManagerMetricCollector
+imported = time.time()
+nnc = NameNodeMetricCollector("bench", ["http://127.0.0.1:1/jmx"])
+DataNodeMetricCollector("bench", nnc)
+rmc = ResourceManagerMetricCollector("bench", ["http://127.0.0.1:1/jmx"], "root.*")
+NodeManagerMetricCollector("bench", rmc)
+JournalNodeMetricCollector("bench", ["http://127.0.0.1:1/jmx"])
+print time.time() - start, imported - start
+"""
+
+
+def drop_cache():
+    if os.path.exists(catalog.CACHE_FILE):
+        os.remove(catalog.CACHE_FILE)
+
+
+def construct():
+    out = subprocess.check_output([sys.executable, "-c", CONSTRUCT], cwd=ROOT, stderr=open(os.devnull, 'w'))
+    total, imported = [float(v) for v in out.split()[-2:]]
+    return total, imported
+
+
+def first_metrics(sim_args, port, timeout):
+    """Seconds from the start of the exporter to a /metrics response with samples of every collector."""
+    base = "http://{0}:" + str(sim_args.port) + "/jmx"
+    start = time.time()
+    exporter = subprocess.Popen([sys.executable, os.path.join(ROOT, "hadoop_jmx_exporter.py"), "-cluster", "simulator",
+                                 "-nns", base.format(simulator.NAMENODE), "-rms", base.format(simulator.RESOURCEMANAGER),
+                                 "-jns", base.format(simulator.JOURNALNODE), "-port", str(port)],
+                                stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    try:
+        first_response = None
+        while time.time() - start < timeout:
+            try:
+                text = requests.get("http://127.0.0.1:{0}/metrics".format(port), timeout=timeout).text
+            except requests.exceptions.ConnectionError:
+                time.sleep(0.01)
+                continue
+            if first_response is None:
+                first_response = time.time() - start
+            if all(("\n" + prefix) in text for prefix in PREFIXES):
+                return first_response, time.time() - start
+            time.sleep(0.05)
+        return first_response, None
+    finally:
+        exporter.terminate()
+        exporter.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='exporter startup benchmark')
+    parser.add_argument('-repeat', type=int, default=3, help='Runs of each case, the best one is kept. default: 3')
+    parser.add_argument('-timeout', type=float, default=60, help='Seconds to wait for a complete /metrics. default: 60')
+    parser.add_argument('-exporter-port', type=int, default=19688, help='Port of the exporter. default: 19688')
+    args, simulator_argv = parser.parse_known_args()
+    sim_args = simulator.parse_args(simulator_argv)
+
+    for cache in ("cold", "warm"):
+        runs = []
+        for i in range(args.repeat):
+            if cache == "cold":
+                drop_cache()
+            runs.append(construct())
+        total, imported = min(runs)
+        print json.dumps({"benchmark": "construct", "catalog_cache": cache, "seconds": total, "import_seconds": imported},
+                         sort_keys=True)
+
+    sim = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "simulator.py")] + simulator_argv,
+                           stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    try:
+        time.sleep(2)
+        for cache in ("cold", "warm"):
+            runs = []
+            for i in range(args.repeat):
+                if cache == "cold":
+                    drop_cache()
+                runs.append(first_metrics(sim_args, args.exporter_port, args.timeout))
+            responded = [first for first, _ in runs if first is not None]
+            complete = [seconds for _, seconds in runs if seconds is not None]
+            print json.dumps({"benchmark": "first_metrics", "catalog_cache": cache, "datanodes": sim_args.datanodes,
+                              "nodemanagers": sim_args.nodemanagers,
+                              "first_response_seconds": min(responded) if responded else None,
+                              "complete_seconds": min(complete) if complete else None}, sort_keys=True)
+    finally:
+        sim.terminate()
+
+
+if __name__ == "__main__":
+    main()
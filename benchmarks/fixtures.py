@@ -0,0 +1,130 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import copy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EXAMPLES = os.path.join(ROOT, "examples")
+
+
+def load_example(name):
+    with open(os.path.join(EXAMPLES, "{0}.json".format(name)), 'r') as f:
+        return json.load(f)
+
+
+def find_bean(doc, name):
+    for bean in doc['beans']:
+        if bean['name'].endswith("name=" + name):
+            return bean
+    return None
+
+
+def datanode_address(i, port):
+    return "10.{0}.{1}.{2}:{3}".format(100 + i // 65536, i // 256 % 256, i % 256, port)
+
+
+def namenode_document(datanodes, corrupt_files=0, address=datanode_address):
+    """
+    examples/NameNode.json with `datanodes` entries in NameNodeInfo.LiveNodes,
+    address(i, port) gives the addresses of the i-th DataNode.
+    """
+    doc = load_example("NameNode")
+    info = find_bean(doc, "NameNodeInfo")
+    live_nodes = json.loads(info['LiveNodes'])
+    template = live_nodes.values()[0]
+    live_nodes = {}
+    for i in range(datanodes):
+        node = copy.deepcopy(template)
+        node['infoAddr'] = address(i, 50075)
+        node['infoSecureAddr'] = address(i, 0)
+        node['xferaddr'] = address(i, 50010)
+        node['numBlocks'] += i
+        live_nodes["dn-{0:05d}".format(i)] = node
+    info['LiveNodes'] = json.dumps(live_nodes)
+    info['CorruptFiles'] = json.dumps(["/user/corrupt/file-{0}".format(i) for i in range(corrupt_files)])
+    return doc
+
+
+def resourcemanager_document(nodemanagers, queues=0, users=0, address=datanode_address):
+    """
+    examples/ResouceManager.json with `nodemanagers` entries in RMNMInfo.LiveNodeManagers,
+    and `queues` more leaf queues under root with `users` users each, answering as the
+    active member of an HA pair. address(i, port) gives the addresses of the i-th NodeManager.
+    """
+    doc = load_example("ResouceManager")
+    doc['beans'].extend(queue_beans(doc, queues, users))
+    doc['beans'].append({"name": "Hadoop:service=ResourceManager,name=RMInfo", "modelerType": "org.apache.hadoop.yarn.server.resourcemanager.RMInfo",
+                         "State": "ACTIVE", "RMStartTime": 1577836800000, "HostAndPort": "127.0.1.2:8088"})
+    info = find_bean(doc, "RMNMInfo")
+    template = json.loads(info['LiveNodeManagers'])[0]
+    live_nms = []
+    for i in range(nodemanagers):
+        node = copy.deepcopy(template)
+        node['HostName'] = "node-{0:05d}".format(i)
+        node['Rack'] = "/rack-{0:03d}".format(i // 40)
+        node['NodeId'] = address(i, 8041)
+        node['NodeHTTPAddress'] = address(i, 8042)
+        node['NumContainers'] = i % 50
+        live_nms.append(node)
+    info['LiveNodeManagers'] = json.dumps(live_nms)
+    return doc
+
+
+def queue_beans(doc, queues, users):
+    queue = find_bean(doc, "QueueMetrics,q0=root,q1=default")
+    user = find_bean(doc, "QueueMetrics,q0=root,q1=default,user=work")
+    beans = []
+    for i in range(queues):
+        name = "queue-{0:05d}".format(i)
+        bean = copy.deepcopy(queue)
+        bean['name'] = "Hadoop:service=ResourceManager,name=QueueMetrics,q0=root,q1={0}".format(name)
+        bean['tag.Queue'] = "root." + name
+        bean['AppsRunning'] = i % 20
+        beans.append(bean)
+        for j in range(users):
+            bean = copy.deepcopy(user)
+            bean['name'] = "Hadoop:service=ResourceManager,name=QueueMetrics,q0=root,q1={0},user=user-{1:03d}".format(name, j)
+            bean['tag.Queue'] = "root." + name
+            bean['tag.User'] = "user-{0:03d}".format(j)
+            beans.append(bean)
+    return beans
+
+
+def node_beans(template, i):
+    """The beans of a DataNode or NodeManager example document as returned by the i-th node."""
+    beans = copy.deepcopy(template['beans'])
+    host = "node-{0:05d}".format(i)
+    for bean in beans:
+        if 'tag.Hostname' in bean:
+            bean['tag.Hostname'] = host
+        if 'name=DataNodeActivity-' in bean['name']:
+            bean['name'] = "Hadoop:service=DataNode,name=DataNodeActivity-{0}-50010".format(host)
+    return beans
+
+
+def journalnode_document():
+    """A JournalNode document: the common beans of examples/DataNode.json and a Journal bean."""
+    doc = load_example("DataNode")
+    beans = []
+    for bean in doc['beans']:
+        name = bean['name']
+        if 'name=DataNode' in name or 'name=FSDatasetState' in name:
+            continue
+        bean['name'] = name.replace("service=DataNode", "service=JournalNode").replace("Port50020", "Port8485")
+        beans.append(bean)
+    journal = {"name": "Hadoop:service=JournalNode,name=Journal-ns1", "modelerType": "Journal-ns1", "tag.Context": "dfs",
+               "tag.Hostname": "jn-00000"}
+    for window in ["60s", "300s", "3600s"]:
+        journal["Syncs{0}NumOps".format(window)] = 1200
+        for percentile in [50, 75, 90, 95, 99]:
+            journal["Syncs{0}{1}thPercentileLatencyMicros".format(window, percentile)] = 100 * percentile
+    for attribute in ["BatchesWritten", "TxnsWritten", "BytesWritten", "BatchesWrittenWhileLagging", "LastWriterEpoch",
+                      "CurrentLagTxns", "LastWrittenTxId", "LastPromisedEpoch", "LastJournalTimestamp"]:
+        journal[attribute] = 0
+    beans.append(journal)
+    return {"beans": beans}
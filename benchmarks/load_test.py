@@ -0,0 +1,117 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+Load test of the exporter against benchmarks/simulator.py: start both, pull
+/metrics for a while and report the pull latency and the CPU, memory,
+threads and sockets of the exporter process.
+
+    python benchmarks/load_test.py [-duration 60] [-warmup 40]
+                                   [-exporter-args "-node-interval 15"]
+                                   [simulator flags, e.g. -datanodes 5000]
+
+Linux only, the exporter is measured through /proc. Prints one JSON object.
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import subprocess
+
+import requests
+
+import simulator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def process_stats(pid):
+    with open("/proc/{0}/stat".format(pid)) as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    stats = {"cpu_seconds": (int(fields[11]) + int(fields[12])) / float(os.sysconf("SC_CLK_TCK"))}
+    with open("/proc/{0}/status".format(pid)) as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key == "VmRSS":
+                stats["rss_kb"] = int(value.split()[0])
+            elif key == "VmHWM":
+                stats["peak_rss_kb"] = int(value.split()[0])
+            elif key == "Threads":
+                stats["threads"] = int(value)
+    stats["open_fds"] = len(os.listdir("/proc/{0}/fd".format(pid)))
+    return stats
+
+
+def targets_up(text):
+    """Number of targets up and scraped by service, from hadoop_exporter_target_up."""
+    up, total = {}, {}
+    for line in text.splitlines():
+        if not line.startswith("hadoop_exporter_target_up{"):
+            continue
+        service = line.split('service="', 1)[1].split('"', 1)[0]
+        total[service] = total.get(service, 0) + 1
+        up[service] = up.get(service, 0) + int(float(line.rsplit(" ", 1)[1]))
+    return dict((service, {"up": up[service], "targets": total[service]}) for service in total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='exporter load test')
+    parser.add_argument('-duration', type=float, default=60, help='Seconds spent pulling /metrics. default: 60')
+    parser.add_argument('-warmup', type=float, default=40, help='Seconds to wait before the first pull. default: 40')
+    parser.add_argument('-pull-interval', type=float, default=1, help='Seconds between two pulls. default: 1')
+    parser.add_argument('-exporter-port', type=int, default=19688, help='Port of the exporter. default: 19688')
+    parser.add_argument('-exporter-args', default="", help='More exporter flags, in one string.')
+    args, simulator_argv = parser.parse_known_args()
+    sim_args = simulator.parse_args(simulator_argv)
+
+    sim = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "simulator.py")] + simulator_argv)
+    base = "http://{0}:" + str(sim_args.port) + "/jmx"
+    exporter = subprocess.Popen([sys.executable, os.path.join(ROOT, "hadoop_jmx_exporter.py"), "-cluster", "simulator",
+                                 "-nns", base.format(simulator.NAMENODE), "-rms", base.format(simulator.RESOURCEMANAGER),
+                                 "-jns", base.format(simulator.JOURNALNODE), "-port", str(args.exporter_port)]
+                                + shlex.split(args.exporter_args), stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    try:
+        time.sleep(args.warmup)
+        before = process_stats(exporter.pid)
+        latencies, sizes, samples = [], [], []
+        text = ""
+        end = time.time() + args.duration
+        while time.time() < end:
+            start = time.time()
+            response = requests.get("http://127.0.0.1:{0}/metrics".format(args.exporter_port), timeout=60)
+            latencies.append(time.time() - start)
+            text = response.text
+            sizes.append(len(response.content))
+            samples.append(process_stats(exporter.pid))
+            time.sleep(max(args.pull_interval - (time.time() - start), 0))
+        after = process_stats(exporter.pid)
+        result = {
+            "benchmark": "load", "datanodes": sim_args.datanodes, "nodemanagers": sim_args.nodemanagers,
+            "latency_ms": sim_args.latency, "error_rate": sim_args.error_rate, "slow_hosts": sim_args.slow_hosts,
+            "exporter_args": args.exporter_args, "pulls": len(latencies),
+            "pull_p50_seconds": percentile(latencies, 0.5), "pull_p99_seconds": percentile(latencies, 0.99),
+            "pull_max_seconds": max(latencies) if latencies else None,
+            "response_bytes": max(sizes) if sizes else None,
+            "cpu_percent": 100.0 * (after["cpu_seconds"] - before["cpu_seconds"]) / args.duration,
+            "rss_kb": after["rss_kb"], "peak_rss_kb": after["peak_rss_kb"],
+            "max_threads": max(s["threads"] for s in samples) if samples else None,
+            "max_open_fds": max(s["open_fds"] for s in samples) if samples else None,
+            "targets": targets_up(text),
+        }
+        print json.dumps(result, sort_keys=True)
+    finally:
+        exporter.terminate()
+        sim.terminate()
+
+
+if __name__ == "__main__":
+    main()
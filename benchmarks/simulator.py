@@ -0,0 +1,174 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+A fake Hadoop cluster serving the /jmx endpoints of a NameNode, a
+ResourceManager, a JournalNode and thousands of DataNodes and NodeManagers,
+built from examples/*.json, to load test the exporter without a cluster.
+
+    python benchmarks/simulator.py [-datanodes 1000] [-nodemanagers 1000]
+                                   [-port 19000] [-latency 5] [-error-rate 0.01]
+                                   [-slow-hosts 0.05] [-slow-latency 2000]
+                                   [-payload-kb 0]
+
+Every daemon listens on the same port of its own loopback address: the
+masters on 127.0.1.1 (NameNode), 127.0.1.2 (ResourceManager) and 127.0.1.3
+(JournalNode), the DataNodes on 127.1.x.y and the NodeManagers on 127.2.x.y.
+LiveNodes and LiveNodeManagers list these addresses, so the exporter finds
+the nodes like on a real cluster. `?qry=` is supported.
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import urlparse
+import SocketServer
+import BaseHTTPServer
+
+from fixtures import load_example, namenode_document, resourcemanager_document, journalnode_document, node_beans
+
+from fetch_plan import BeanPattern
+
+NAMENODE = "127.0.1.1"
+RESOURCEMANAGER = "127.0.1.2"
+JOURNALNODE = "127.0.1.3"
+
+
+def node_ip(kind, i):
+    return "127.{0}.{1}.{2}".format(kind, (i + 1) // 256 % 256, (i + 1) % 256)
+
+
+class Cluster(object):
+    """The jmx documents of the simulated daemons, by loopback address."""
+    def __init__(self, args):
+        self.args = args
+        self.port = args.port
+        self.documents = {}
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.datanode_template = load_example("DataNode")
+        self.nodemanager_template = load_example("NodeManager")
+        self.datanodes = dict((node_ip(1, i), i) for i in range(args.datanodes))
+        self.nodemanagers = dict((node_ip(2, i), i) for i in range(args.nodemanagers))
+        self.documents[NAMENODE] = namenode_document(args.datanodes, address=self.address(1))
+        self.documents[RESOURCEMANAGER] = resourcemanager_document(args.nodemanagers, args.queues, args.users, address=self.address(2))
+        self.documents[JOURNALNODE] = journalnode_document()
+        self.requests = 0
+        self.errors = 0
+
+    def address(self, kind):
+        return lambda i, port: "{0}:{1}".format(node_ip(kind, i), self.port)
+
+    def beans(self, ip):
+        if ip in self.documents:
+            return self.documents[ip]['beans']
+        if ip in self.datanodes:
+            return node_beans(self.datanode_template, self.datanodes[ip])
+        if ip in self.nodemanagers:
+            return node_beans(self.nodemanager_template, self.nodemanagers[ip])
+        return None
+
+    def payload(self):
+        if self.args.payload_kb <= 0:
+            return []
+        return [{"name": "Hadoop:service=Simulator,name=Padding", "Padding": "x" * (self.args.payload_kb * 1024)}]
+
+    def render(self, ip, query):
+        """The jmx response of a daemon, rendered once per daemon and query."""
+        key = (ip, query)
+        with self.lock:
+            if key in self.cache:
+                return self.cache[key]
+        beans = self.beans(ip)
+        if beans is None:
+            return None
+        if query:
+            pattern = BeanPattern(query)
+            beans = [bean for bean in beans if pattern.match(bean['name'])]
+        else:
+            beans = beans + self.payload()
+        body = json.dumps({"beans": beans})
+        with self.lock:
+            if ip in self.documents:
+                self.cache[key] = body
+            elif len(self.cache) < self.args.cache_size:
+                self.cache[key] = body
+        return body
+
+    def is_slow(self, ip):
+        return int(hashlib.md5(ip).hexdigest()[:8], 16) % 10000 < self.args.slow_hosts * 10000
+
+    def latency(self, ip):
+        """Seconds to wait before answering: the base latency with jitter, slow hosts add `slow_latency`."""
+        ms = random.expovariate(1.0 / self.args.latency) if self.args.latency > 0 else 0
+        if self.is_slow(ip):
+            ms += self.args.slow_latency
+        return ms / 1000.0
+
+
+class JmxHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cluster = self.server.cluster
+        ip = self.connection.getsockname()[0]
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query).get("qry", [""])[0]
+        cluster.requests += 1
+        time.sleep(cluster.latency(ip))
+        body = None
+        if url.path == "/jmx":
+            body = cluster.render(ip, query)
+        if body is None:
+            self.send_error(404)
+            return
+        if random.random() < cluster.args.error_rate:
+            cluster.errors += 1
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SimulatorServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, cluster):
+        BaseHTTPServer.HTTPServer.__init__(self, ("", cluster.port), JmxHandler)
+        self.cluster = cluster
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='fake Hadoop jmx cluster')
+    parser.add_argument('-port', type=int, default=19000, help='Port of every simulated daemon. default: 19000')
+    parser.add_argument('-datanodes', type=int, default=1000, help='Number of DataNodes. default: 1000')
+    parser.add_argument('-nodemanagers', type=int, default=1000, help='Number of NodeManagers. default: 1000')
+    parser.add_argument('-queues', type=int, default=0, help='Number of extra YARN leaf queues. default: 0')
+    parser.add_argument('-users', type=int, default=0, help='Number of users of each extra queue. default: 0')
+    parser.add_argument('-latency', type=float, default=5, help='Mean response latency in milliseconds, exponentially distributed. default: 5')
+    parser.add_argument('-error-rate', type=float, default=0.0, help='Fraction of requests answered with a 500. default: 0')
+    parser.add_argument('-slow-hosts', type=float, default=0.0, help='Fraction of nodes which are slow. default: 0')
+    parser.add_argument('-slow-latency', type=float, default=2000, help='Latency added by slow nodes in milliseconds. default: 2000')
+    parser.add_argument('-payload-kb', type=int, default=0, help='Size of an unused bean added to full jmx documents in KiB. default: 0')
+    parser.add_argument('-cache-size', type=int, default=100000, help='Max number of rendered node responses kept. default: 100000')
+    return parser.parse_args(argv)
+
+
+def serve(args):
+    server = SimulatorServer(Cluster(args))
+    print "Simulating {0} DataNodes and {1} NodeManagers on port {2}, NameNode at {3}, ResourceManager at {4}, JournalNode at {5}".format(
+        args.datanodes, args.nodemanagers, args.port, NAMENODE, RESOURCEMANAGER, JOURNALNODE)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve(parse_args())
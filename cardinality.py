@@ -0,0 +1,151 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import re
+import copy
+import fnmatch
+import threading
+from collections import OrderedDict
+
+from prometheus_client.core import GaugeMetricFamily
+
+from utils import get_module_logger, read_config_file
+
+
+logger = get_module_logger(__name__)
+
+# Words of the names of gauges whose values can not be summed over label values:
+# averages, percentages, ratios, rates, extremes and loads.
+NON_ADDITIVE_WORDS = frozenset(["avg", "mean", "median", "dev", "percent", "perc", "ratio", "rate", "max", "min",
+                                "load", "average", "utilization"])
+
+
+def additive(metric):
+    """Whether the samples of `metric` can be summed into one series."""
+    if metric.type == "counter":
+        return True
+    return NON_ADDITIVE_WORDS.isdisjoint(metric.name.split("_"))
+
+
+class CardinalityRule(object):
+    """
+    Bound the values of `label` in the metric families whose name matches the
+    `families` pattern. The values kept are the `top` ones by the sum of the
+    samples of the families matching `by` (the limited families by default) and
+    the `allow` ones, the samples of the other values are summed into a series
+    labelled `other` if `fold` is "sum", or dropped if it is "drop". By default
+    they are summed, unless the family is not additive. At most `max_series`
+    series are then kept in each family.
+    """
+    def __init__(self, families, label=None, top=0, by=None, allow=None, max_series=0, other="other", fold=None):
+        if fold not in (None, "sum", "drop"):
+            raise ValueError("fold must be sum or drop, not {0}".format(fold))
+        if label is None and max_series <= 0:
+            raise ValueError("rule for {0} limits nothing".format(families))
+        self.families = re.compile(fnmatch.translate(families))
+        self.label = label
+        self.top = top
+        self.by = re.compile(fnmatch.translate(by)) if by else self.families
+        self.allow = set(allow or [])
+        self.max_series = max_series
+        self.other = other
+        self.fold = fold
+
+    def matches(self, name):
+        return self.families.match(name) is not None
+
+    def kept_values(self, metrics):
+        """The values of `label` kept in this snapshot, None keeps them all."""
+        if self.label is None or (self.top <= 0 and not self.allow):
+            return None
+        totals = {}
+        if self.top > 0:
+            for metric in metrics:
+                if self.by.match(metric.name) is None:
+                    continue
+                for sample in metric.samples:
+                    value = sample.labels.get(self.label)
+                    if value is not None:
+                        totals[value] = totals.get(value, 0.0) + sample.value
+        kept = sorted(totals, key=lambda value: (-totals[value], value))[:self.top]
+        return self.allow.union(kept)
+
+    def limit(self, metric, kept):
+        fold = self.fold or ("sum" if additive(metric) else "drop")
+        samples = OrderedDict()
+        for sample in metric.samples:
+            value = sample.labels.get(self.label) if self.label else None
+            if kept is not None and value is not None and value not in kept:
+                if fold == "drop":
+                    continue
+                labels = dict(sample.labels)
+                labels[self.label] = self.other
+                sample = sample._replace(labels=labels)
+            key = (sample.name, tuple(sorted(sample.labels.items())))
+            if key in samples:
+                samples[key] = samples[key]._replace(value=samples[key].value + sample.value)
+            elif self.max_series <= 0 or len(samples) < self.max_series:
+                samples[key] = sample
+        limited = copy.copy(metric)
+        limited.samples = list(samples.values())
+        return limited
+
+
+class CardinalityLimiter(object):
+    """Apply the rules to the metric families of each snapshot, the first matching rules first."""
+    def __init__(self, rules):
+        self.rules = rules
+        self.lock = threading.Lock()
+        self.dropped = {}
+
+    def limit(self, collector, metrics):
+        kept = [rule.kept_values(metrics) for rule in self.rules]
+        limited, dropped = [], {}
+        for metric in metrics:
+            count = len(metric.samples)
+            for rule, values in zip(self.rules, kept):
+                if rule.matches(metric.name):
+                    metric = rule.limit(metric, values)
+            if len(metric.samples) < count:
+                dropped[metric.name] = count - len(metric.samples)
+            limited.append(metric)
+        with self.lock:
+            self.dropped[collector] = dropped
+        return tuple(limited)
+
+    def collect(self):
+        dropped = GaugeMetricFamily("hadoop_exporter_cardinality_dropped_series", "Number of series folded or dropped from the current snapshot by the cardinality rules", labels=["collector", "family"])
+        with self.lock:
+            for collector in sorted(self.dropped):
+                for family, count in sorted(self.dropped[collector].items()):
+                    dropped.add_metric([collector, family], count)
+        yield dropped
+
+
+def load_rules(config):
+    rules = []
+    for rule in (config or {}).get("rules", []):
+        rules.append(CardinalityRule(**rule))
+    return rules
+
+
+_limiter = None
+
+
+def configure(path):
+    """Load the rules of a YAML config file, None disables the limits."""
+    global _limiter
+    _limiter = None
+    if path is not None:
+        _limiter = CardinalityLimiter(load_rules(read_config_file(path)))
+        logger.info("Load {0} cardinality rules from {1}.".format(len(_limiter.rules), path))
+
+
+def limiter():
+    return _limiter
+
+
+def limit(collector, metrics):
+    if _limiter is None:
+        return metrics
+    return _limiter.limit(collector, metrics)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import marshal
+import threading
+
+import utils
+from utils import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+CATALOG_VERSION = 1
+
+METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics")
+# The parsed metrics/<service>/*.json files, rebuilt when one of them changes.
+CACHE_FILE = os.path.join(METRICS_PATH, ".catalog.cache")
+
+
+def fingerprint(path=METRICS_PATH):
+    """Name, size and mtime of each definition file, and the python version reading the cache."""
+    files = []
+    for service in sorted(os.listdir(path)):
+        service_path = os.path.join(path, service)
+        if not os.path.isdir(service_path):
+            continue
+        for name in sorted(os.listdir(service_path)):
+            st = os.stat(os.path.join(service_path, name))
+            files.append((service, name, st.st_size, int(st.st_mtime * 1000)))
+    return (CATALOG_VERSION, tuple(sys.version_info[:2]), tuple(files))
+
+
+class MetricCatalog(object):
+    """
+    The metric definitions of metrics/<service>/*.json, shared by every collector
+    of the process. Collectors must not modify them.
+    """
+    def __init__(self, services):
+        self.services = services
+
+    @classmethod
+    def parse(cls, path=METRICS_PATH):
+        services = {}
+        for service in sorted(os.listdir(path)):
+            if not os.path.isdir(os.path.join(path, service)):
+                continue
+            names = utils.get_file_list(service)
+            services[service] = (names, dict((name, utils.read_json_file(service, name)) for name in names))
+        return cls(services)
+
+    def file_list(self, service):
+        """The definition files of a service, in the order the collectors used to list them."""
+        return list(self.services.get(service, ([], {}))[0])
+
+    def metrics(self, service):
+        """The definitions of each file of a service, by file name."""
+        return self.services.get(service, ([], {}))[1]
+
+
+def load(cache_file=CACHE_FILE):
+    """The catalog of the cache file if no definition changed since it was written, else parse the files."""
+    key = fingerprint()
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = marshal.load(f)
+        if cached[0] == key:
+            return MetricCatalog(cached[1])
+    except Exception:
+        pass
+    result = MetricCatalog.parse()
+    try:
+        tmp = cache_file + ".tmp"
+        with open(tmp, 'wb') as f:
+            marshal.dump((key, result.services), f)
+        os.rename(tmp, cache_file)
+    except Exception as e:
+        logger.info("Write metric catalog cache {0} failed, error: {1}.".format(cache_file, str(e)))
+    return result
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def catalog():
+    global _catalog
+    with _lock:
+        if _catalog is None:
+            _catalog = load()
+        return _catalog
@@ -2,13 +2,32 @@
 # -*- coding: utf-8 -*-
 
 import re
-from prometheus_client.core import GaugeMetricFamily
-
 import utils
+from catalog import catalog
+from fetch_plan import compile_plan
+from bean_router import BeanRouter
+from sample_store import CompactGaugeFamily
 
 
 logger = utils.get_module_logger(__name__)
 
+_SNAKE_CASE = re.compile('([a-z0-9])([A-Z])')
+_snake_cases = {}
+
+
+def to_snake_case(name):
+    if name not in _snake_cases:
+        _snake_cases[name] = _SNAKE_CASE.sub(r'\1_\2', name).lower()
+    return _snake_cases[name]
+
+
+def get_value(bean, metric):
+    return bean[metric] if metric in bean else 0
+
+
+def get_value_or_zero(bean, metric):
+    return bean[metric] if metric in bean and bean[metric] else 0
+
 
 class MetricCollector(object):
     def __init__(self, cluster, component, service):
@@ -16,13 +35,13 @@ class MetricCollector(object):
         self.component = component
         self.prefix = 'hadoop_{0}_{1}'.format(component, service)
 
-        self.file_list = utils.get_file_list(service)
-        self.metrics = {}
-        for i in range(len(self.file_list)):
-            self.metrics.setdefault(self.file_list[i], utils.read_json_file(service, self.file_list[i]))
+        self.file_list = catalog().file_list(service)
+        self.metrics = catalog().metrics(service)
 
-        common_file = utils.get_file_list("common")
+        common_file = catalog().file_list("common")
         self.merge_list = self.file_list + common_file
+        self.fetch_plan = compile_plan(service, self.merge_list)
+        self.router = BeanRouter(service, self.file_list)
 
     def collect(self):
         pass
@@ -41,51 +60,54 @@ class CommonMetricCollector():
         self.service = service
         self.prefix = 'hadoop_{0}_{1}'.format(component, service)
         self.common_metrics = {}
-        self.tmp_metrics = {}
-        file_list = utils.get_file_list("common")
+        self.tmp_metrics = catalog().metrics("common")
+        file_list = catalog().file_list("common")
         for i in range(len(file_list)):
             self.common_metrics.setdefault(file_list[i], {})
-            self.tmp_metrics.setdefault(file_list[i], utils.read_json_file("common", file_list[i]))
+        self.plans = {}
+        if 'JvmMetrics' in self.tmp_metrics:
+            self.plans['JvmMetrics'] = self.compile_jvm_plan()
+        if 'RpcActivity' in self.tmp_metrics:
+            self.plans['RpcActivity'] = self.compile_rpc_plan()
+        if 'UgiMetrics' in self.tmp_metrics:
+            self.plans['UgiMetrics'] = self.compile_ugi_plan()
+        if 'MetricsSystem' in self.tmp_metrics:
+            self.plans['MetricsSystem'] = self.compile_metric_system_plan()
+        self.rpc_detailed_plan = {}
+        self.router = BeanRouter(service, file_list)
+        self.setup_handlers = {
+            'JvmMetrics': self.setup_jvm_labels,
+            'OperatingSystem': self.setup_os_labels,
+            'RpcActivity': self.setup_rpc_labels,
+            'RpcDetailedActivity': self.setup_rpc_detailed_labels,
+            'UgiMetrics': self.setup_ugi_labels,
+            'MetricsSystem': self.setup_metric_system_labels,
+            'Runtime': self.setup_runtime_labels,
+        }
+        self.get_handlers = {
+            'JvmMetrics': self.get_jvm_metrics,
+            'OperatingSystem': self.get_os_metrics,
+            'RpcActivity': self.get_rpc_metrics,
+            'RpcDetailedActivity': self.get_rpc_detailed_metrics,
+            'UgiMetrics': self.get_ugi_metrics,
+            'MetricsSystem': self.get_metric_system_metrics,
+            'Runtime': self.get_runtime_metrics,
+        }
 
     def setup_labels(self, beans):
         for i in range(len(beans)):
-            if 'name=JvmMetrics' in beans[i]['name']:
-                self.setup_jvm_labels()
-            if 'OperatingSystem' in beans[i]['name']:
-                self.setup_os_labels()
-            if 'RpcActivity' in beans[i]['name']:
-                self.setup_rpc_labels()
-            if 'RpcDetailedActivity' in beans[i]['name']:
-                self.setup_rpc_detailed_labels()
-            if 'UgiMetrics' in beans[i]['name']:
-                self.setup_ugi_labels()
-            if 'MetricsSystem' in beans[i]['name'] and "sub=Stats" in beans[i]['name']:
-                self.setup_metric_system_labels()
-            if 'Runtime' in beans[i]['name']:
-                self.setup_runtime_labels()
+            setup = self.setup_handlers.get(self.router.route(beans[i]['name']))
+            if setup is not None:
+                setup()
 
     def get_metrics(self, beans, target):
         self.target = target
-        for i in range(len(beans)):
-            if 'name=JvmMetrics' in beans[i]['name']:
-                self.get_jvm_metrics(beans[i])
-            if 'OperatingSystem' in beans[i]['name']:
-                self.get_os_metrics(beans[i])
-            if 'RpcActivity' in beans[i]['name']:
-                self.get_rpc_metrics(beans[i])
-            if 'RpcDetailedActivity' in beans[i]['name']:
-                self.get_rpc_detailed_metrics(beans[i])
-            if 'UgiMetrics' in beans[i]['name']:
-                self.get_ugi_metrics(beans[i])
-            if 'MetricsSystem' in beans[i]['name'] and "sub=Stats" in beans[i]['name']:
-                self.get_metric_system_metrics(beans[i])
-            if 'Runtime' in beans[i]['name']:
-                self.get_runtime_metrics(beans[i])
+        self.router.dispatch(beans, self.get_handlers, self.common_metrics)
         return self.common_metrics
 
     def setup_jvm_labels(self):
         for metric in self.tmp_metrics["JvmMetrics"]:
-            snake_case = "_".join(["jvm", re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()])
+            snake_case = "_".join(["jvm", to_snake_case(metric)])
             if 'Mem' in metric:
                 name = "".join([snake_case, "ebibytes"])
                 label = ["cluster", "mode"]
@@ -130,21 +152,21 @@ class CommonMetricCollector():
                 key = snake_case
                 descriptions = self.tmp_metrics['JvmMetrics'][metric]
             label.append("_target")
-            self.common_metrics['JvmMetrics'][key] = GaugeMetricFamily("_".join([self.prefix, key]), descriptions, labels=label)
+            self.common_metrics['JvmMetrics'][key] = CompactGaugeFamily("_".join([self.prefix, key]), descriptions, labels=label)
 
     def setup_os_labels(self):
         for metric in self.tmp_metrics['OperatingSystem']:
             label = ["cluster", "_target"]
-            snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+            snake_case = to_snake_case(metric)
             name = "_".join([self.prefix, snake_case])
-            self.common_metrics['OperatingSystem'][metric] = GaugeMetricFamily(name, self.tmp_metrics['OperatingSystem'][metric], labels=label)
+            self.common_metrics['OperatingSystem'][metric] = CompactGaugeFamily(name, self.tmp_metrics['OperatingSystem'][metric], labels=label)
 
     def setup_rpc_labels(self):
         num_rpc_flag, avg_rpc_flag = 1, 1
         for metric in self.tmp_metrics["RpcActivity"]:
-            snake_case = "_".join(["rpc", re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()])
+            snake_case = "_".join(["rpc", to_snake_case(metric)])
             if 'Rpc' in metric:
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+                snake_case = to_snake_case(metric)
             label = ["cluster", "tag"]
             if "NumOps" in metric:
                 if num_rpc_flag:
@@ -152,7 +174,7 @@ class CommonMetricCollector():
                     label.extend(["method", "_target"])
                     name = "_".join([self.prefix, "rpc_method_called_total"])
                     description = "Total number of the times the method is called."
-                    self.common_metrics['RpcActivity'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.common_metrics['RpcActivity'][key] = CompactGaugeFamily(name, description, labels=label)
                     num_rpc_flag = 0
                 else:
                     continue
@@ -162,7 +184,7 @@ class CommonMetricCollector():
                     label.extend(["method", "_target"])
                     name = "_".join([self.prefix, "rpc_method_avg_time_milliseconds"])
                     descrption = "Average turn around time of the method in milliseconds."
-                    self.common_metrics['RpcActivity'][key] = GaugeMetricFamily(name, descrption, labels=label)
+                    self.common_metrics['RpcActivity'][key] = CompactGaugeFamily(name, descrption, labels=label)
                     avg_rpc_flag = 0
                 else:
                     continue
@@ -170,7 +192,7 @@ class CommonMetricCollector():
                 key = metric
                 label.append("_target")
                 name = "_".join([self.prefix, snake_case])
-                self.common_metrics['RpcActivity'][key] = GaugeMetricFamily(name, self.tmp_metrics['RpcActivity'][metric], labels=label)
+                self.common_metrics['RpcActivity'][key] = CompactGaugeFamily(name, self.tmp_metrics['RpcActivity'][metric], labels=label)
 
     def setup_rpc_detailed_labels(self):
         for metric in self.tmp_metrics['RpcDetailedActivity']:
@@ -183,7 +205,7 @@ class CommonMetricCollector():
                 name = "_".join([self.prefix, 'rpc_detailed_method_avg_time_milliseconds'])
             else:
                 continue
-            self.common_metrics['RpcDetailedActivity'][key] = GaugeMetricFamily(name, self.tmp_metrics['RpcDetailedActivity'][metric], labels=label)
+            self.common_metrics['RpcDetailedActivity'][key] = CompactGaugeFamily(name, self.tmp_metrics['RpcDetailedActivity'][metric], labels=label)
         return self.common_metrics
 
     def setup_ugi_labels(self):
@@ -197,7 +219,7 @@ class CommonMetricCollector():
                     ugi_num_flag = 0
                     name = "_".join([self.prefix, 'ugi_method_called_total'])
                     description = "Total number of the times the method is called."
-                    self.common_metrics['UgiMetrics'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.common_metrics['UgiMetrics'][key] = CompactGaugeFamily(name, description, labels=label)
                 else:
                     continue
             elif 'AvgTime' in metric:
@@ -207,14 +229,14 @@ class CommonMetricCollector():
                     ugi_avg_flag = 0
                     name = "_".join([self.prefix, 'ugi_method_avg_time_milliseconds'])
                     description = "Average turn around time of the method in milliseconds."
-                    self.common_metrics['UgiMetrics'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.common_metrics['UgiMetrics'][key] = CompactGaugeFamily(name, description, labels=label)
                 else:
                     continue
             else:
                 label.append("_target")
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+                snake_case = to_snake_case(metric)
                 name = "_".join([self.prefix, 'ugi', snake_case])
-                self.common_metrics['UgiMetrics'][metric] = GaugeMetricFamily(name, self.tmp_metrics['UgiMetrics'][metric], labels=label)
+                self.common_metrics['UgiMetrics'][metric] = CompactGaugeFamily(name, self.tmp_metrics['UgiMetrics'][metric], labels=label)
 
     def setup_metric_system_labels(self):
         metric_num_flag, metric_avg_flag = 1, 1
@@ -226,7 +248,7 @@ class CommonMetricCollector():
                     label.extend(["oper", "_target"])
                     metric_num_flag = 0
                     name = "_".join([self.prefix, 'metricssystem_operations_total'])
-                    self.common_metrics['MetricsSystem'][key] = GaugeMetricFamily(name, "Total number of operations", labels=label)
+                    self.common_metrics['MetricsSystem'][key] = CompactGaugeFamily(name, "Total number of operations", labels=label)
                 else:
                     continue
             elif 'AvgTime' in metric:
@@ -236,25 +258,26 @@ class CommonMetricCollector():
                     metric_avg_flag = 0
                     name = "_".join([self.prefix, 'metricssystem_method_avg_time_milliseconds'])
                     description = "Average turn around time of the operations in milliseconds."
-                    self.common_metrics['MetricsSystem'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.common_metrics['MetricsSystem'][key] = CompactGaugeFamily(name, description, labels=label)
                 else:
                     continue
             else:
                 label.append("_target")
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+                snake_case = to_snake_case(metric)
                 name = "_".join([self.prefix, 'metricssystem', snake_case])
-                self.common_metrics['MetricsSystem'][metric] = GaugeMetricFamily(name, self.tmp_metrics['MetricsSystem'][metric], labels=label)
+                self.common_metrics['MetricsSystem'][metric] = CompactGaugeFamily(name, self.tmp_metrics['MetricsSystem'][metric], labels=label)
 
     def setup_runtime_labels(self):
         for metric in self.tmp_metrics['Runtime']:
             label = ["cluster", "host", "_target"]
-            snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+            snake_case = to_snake_case(metric)
             name = "_".join([self.prefix, snake_case, "milliseconds"])
-            self.common_metrics['Runtime'][metric] = GaugeMetricFamily(name, self.tmp_metrics['Runtime'][metric], labels=label)
+            self.common_metrics['Runtime'][metric] = CompactGaugeFamily(name, self.tmp_metrics['Runtime'][metric], labels=label)
 
-    def get_jvm_metrics(self, bean):
+    def compile_jvm_plan(self):
+        plan = []
         for metric in self.tmp_metrics['JvmMetrics']:
-            name = "_".join(["jvm", re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()])
+            name = "_".join(["jvm", to_snake_case(metric)])
             if 'Mem' in metric:
                 if "Used" in metric:
                     key = "jvm_mem_used_mebibytes"
@@ -308,48 +331,26 @@ class CommonMetricCollector():
             else:
                 key = name
                 label = [self.cluster]
-            label.append(self.target)
-            self.common_metrics['JvmMetrics'][key].add_metric(label, bean[metric] if metric in bean else 0)
-
-    def get_os_metrics(self, bean):
-        for metric in self.tmp_metrics['OperatingSystem']:
-            label = [self.cluster]
-            label.append(self.target)
-            self.common_metrics['OperatingSystem'][metric].add_metric(label, bean[metric] if metric in bean else 0)
+            plan.append((metric, key, label))
+        return plan
 
-    def get_rpc_metrics(self, bean):
-        rpc_tag = bean['tag.port']
+    def compile_rpc_plan(self):
+        plan = []
         for metric in self.tmp_metrics['RpcActivity']:
             if "NumOps" in metric:
-                method = metric.split('NumOps')[0]
-                label = [self.cluster, rpc_tag, method]
                 key = "MethodNumOps"
+                label = [metric.split('NumOps')[0]]
             elif "AvgTime" in metric:
-                method = metric.split('AvgTime')[0]
-                label = [self.cluster, rpc_tag, method]
                 key = "MethodAvgTime"
+                label = [metric.split('AvgTime')[0]]
             else:
-                label = [self.cluster, rpc_tag]
                 key = metric
-            label.append(self.target)
-            self.common_metrics['RpcActivity'][key].add_metric(label, bean[metric] if metric in bean else 0)
-
-    def get_rpc_detailed_metrics(self, bean):
-        detail_tag = bean['tag.port']
-        for metric in bean:
-            if metric[0].isupper():
-                if "NumOps" in metric:
-                    key = "NumOps"
-                    method = metric.split('NumOps')[0]
-                elif "AvgTime" in metric:
-                    key = "AvgTime"
-                    method = metric.split("AvgTime")[0]
-                else:
-                    continue
-                label = [self.cluster, detail_tag, method, self.target]
-                self.common_metrics['RpcDetailedActivity'][key].add_metric(label, bean[metric])
+                label = []
+            plan.append((metric, key, label))
+        return plan
 
-    def get_ugi_metrics(self, bean):
+    def compile_ugi_plan(self):
+        plan = []
         for metric in self.tmp_metrics['UgiMetrics']:
             if 'NumOps' in metric:
                 key = 'NumOps'
@@ -372,10 +373,11 @@ class CommonMetricCollector():
             else:
                 key = metric
                 label = [self.cluster]
-            label.append(self.target)
-            self.common_metrics['UgiMetrics'][key].add_metric(label, bean[metric] if metric in bean and bean[metric] else 0)
+            plan.append((metric, key, label))
+        return plan
 
-    def get_metric_system_metrics(self, bean):
+    def compile_metric_system_plan(self):
+        plan = []
         for metric in self.tmp_metrics['MetricsSystem']:
             if 'NumOps' in metric:
                 key = 'NumOps'
@@ -388,10 +390,52 @@ class CommonMetricCollector():
             else:
                 key = metric
                 label = [self.cluster]
-            label.append(self.target)
-            self.common_metrics['MetricsSystem'][key].add_metric(label, bean[metric] if metric in bean and bean[metric] else 0)
+            plan.append((metric, key, label))
+        return plan
+
+    def compile_rpc_detailed_metric(self, metric):
+        if metric[0].isupper():
+            if "NumOps" in metric:
+                return "NumOps", metric.split('NumOps')[0]
+            elif "AvgTime" in metric:
+                return "AvgTime", metric.split("AvgTime")[0]
+        return None
+
+    def get_jvm_metrics(self, bean):
+        for metric, key, label in self.plans['JvmMetrics']:
+            self.common_metrics['JvmMetrics'][key].add_metric(label + [self.target], bean[metric] if metric in bean else 0)
+
+    def get_os_metrics(self, bean):
+        label = [self.cluster, self.target]
+        for metric in self.tmp_metrics['OperatingSystem']:
+            self.common_metrics['OperatingSystem'][metric].add_metric(label, bean[metric] if metric in bean else 0)
+
+    def get_rpc_metrics(self, bean):
+        rpc_label = [self.cluster, bean['tag.port']]
+        for metric, key, label in self.plans['RpcActivity']:
+            self.common_metrics['RpcActivity'][key].add_metric(rpc_label + label + [self.target], bean[metric] if metric in bean else 0)
+
+    def get_rpc_detailed_metrics(self, bean):
+        detail_tag = bean['tag.port']
+        plan = self.rpc_detailed_plan
+        for metric in bean:
+            if metric not in plan:
+                plan[metric] = self.compile_rpc_detailed_metric(metric)
+            if plan[metric] is None:
+                continue
+            key, method = plan[metric]
+            label = [self.cluster, detail_tag, method, self.target]
+            self.common_metrics['RpcDetailedActivity'][key].add_metric(label, bean[metric])
+
+    def get_ugi_metrics(self, bean):
+        for metric, key, label in self.plans['UgiMetrics']:
+            self.common_metrics['UgiMetrics'][key].add_metric(label + [self.target], get_value_or_zero(bean, metric))
+
+    def get_metric_system_metrics(self, bean):
+        for metric, key, label in self.plans['MetricsSystem']:
+            self.common_metrics['MetricsSystem'][key].add_metric(label + [self.target], get_value_or_zero(bean, metric))
 
     def get_runtime_metrics(self, bean):
+        label = [self.cluster, bean['Name'].split("@")[1], self.target]
         for metric in self.tmp_metrics['Runtime']:
-            label = [self.cluster, bean['Name'].split("@")[1], self.target]
-            self.common_metrics['Runtime'][metric].add_metric(label, bean[metric] if metric in bean and bean[metric] else 0)
+            self.common_metrics['Runtime'][metric].add_metric(label, get_value_or_zero(bean, metric))
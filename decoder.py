@@ -0,0 +1,170 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import re
+import json
+
+from utils import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+
+_BEANS = re.compile(r'"beans"\s*:\s*\[')
+_TOKEN = re.compile(r'[{}"\]]')
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+_NAME = re.compile(r'"name"\s*:\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+
+
+def get_loads(name):
+    """Return the `loads` of the named json module, "auto" picks the fastest installed one."""
+    names = ["ujson", "simplejson"] if name == "auto" else [name]
+    for module_name in names:
+        if module_name == "json":
+            break
+        try:
+            module = __import__(module_name)
+        except ImportError:
+            if name != "auto":
+                logger.warning("json decoder {0} is not installed, fall back to json.".format(module_name))
+            continue
+        return module.loads
+    return json.loads
+
+
+_loads = json.loads
+
+
+def configure(name):
+    global _loads
+    _loads = get_loads(name)
+
+
+def loads(s):
+    return _loads(s)
+
+
+# Attributes holding a JSON document in a string, decoded with their bean by the parsing processes.
+EMBEDDED = ("LiveNodes", "DeadNodes", "DecomNodes", "EnteringMaintenanceNodes", "NodeUsage", "VolumeInfo",
+            "LiveNodeManagers")
+
+
+def load_beans(document, wanted=None):
+    """Decode a whole jmx document and return its beans accepted by `wanted`."""
+    rlt = _loads(document)
+    beans = rlt['beans'] if rlt and "beans" in rlt else []
+    if wanted is not None:
+        beans = [bean for bean in beans if 'name' in bean and wanted(bean['name'])]
+    return beans
+
+
+def load_embedded(value):
+    """
+    Decode an attribute holding a JSON document in a string, such as
+    NameNodeInfo.LiveNodes, DataNodeInfo.VolumeInfo or RMNMInfo.LiveNodeManagers.
+    An attribute already decoded by a parsing process is returned as is.
+    """
+    if not isinstance(value, basestring):
+        return value
+    try:
+        return _loads(value)
+    except ValueError:
+        import yaml
+        return yaml.safe_load(value)
+
+
+def decode_embedded(beans):
+    """Decode the EMBEDDED attributes of the beans in place, the ones which fail are left to the collectors."""
+    for bean in beans:
+        for key in EMBEDDED:
+            value = bean.get(key)
+            if isinstance(value, basestring):
+                try:
+                    bean[key] = load_embedded(value)
+                except Exception:
+                    pass
+    return beans
+
+
+def count_embedded(value):
+    """
+    Number of items of an attribute holding a JSON array of strings, such as
+    NameNodeInfo.CorruptFiles. Strings without escapes are counted from their
+    quotes, without decoding them.
+    """
+    if '\\' not in value and '{' not in value and value.count('[') == 1:
+        if value.strip() == "[]":
+            return 0
+        quotes = value.count('"')
+        if quotes > 0 and quotes % 2 == 0 and value.count(',') == quotes // 2 - 1:
+            return quotes // 2
+    return len(load_embedded(value))
+
+
+def iter_bean_texts(chunks, wanted=None):
+    """
+    Walk the `beans` array of a jmx document chunk by chunk and yield the name and
+    the raw text of the beans accepted by `wanted`, other beans are skipped without
+    building any object. All chunks are consumed so the connection can be reused.
+    """
+    buf = ""
+    pos = 0
+    started = finished = in_string = False
+    start, depth = -1, 0
+    for chunk in chunks:
+        if finished:
+            continue
+        buf += chunk
+        if not started:
+            m = _BEANS.search(buf)
+            if m is None:
+                continue
+            started = True
+            buf, pos = buf[m.end():], 0
+        while True:
+            if in_string:
+                pos = _STRING_BODY.match(buf, pos).end()
+                if pos >= len(buf) - 1 and (pos == len(buf) or buf[pos] == '\\'):
+                    # the string or an escape continues in the next chunk
+                    break
+                pos += 1
+                in_string = False
+            m = _TOKEN.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            c = m.group()
+            pos = m.end()
+            if c == '"':
+                in_string = True
+            elif c == '{':
+                if depth == 0:
+                    start = m.start()
+                depth += 1
+            elif c == '}':
+                depth -= 1
+                if depth == 0:
+                    bean = buf[start:pos]
+                    buf, pos = buf[pos:], 0
+                    name = _NAME.search(bean)
+                    if name is None:
+                        if wanted is None:
+                            yield None, bean
+                        continue
+                    name = name.group(1)
+                    if '\\' in name:
+                        name = json.loads('"%s"' % name)
+                    if wanted is None or wanted(name):
+                        yield name, bean
+            elif depth == 0:
+                finished = True
+                break
+        if depth == 0 and not finished:
+            buf, pos = buf[pos:], 0
+
+
+def iter_beans(chunks, wanted=None, loads=None):
+    """Decode the beans of a jmx document accepted by `wanted`, see iter_bean_texts."""
+    loads = loads or _loads
+    for _, bean in iter_bean_texts(chunks, wanted):
+        yield loads(bean)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import time
+import zlib
+import threading
+import SocketServer
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from prometheus_client import exposition as text_format
+from prometheus_client.openmetrics import exposition as openmetrics_format
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+from utils import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+FORMATS = {
+    "text": (text_format.generate_latest, text_format.CONTENT_TYPE_LATEST),
+    "openmetrics": (openmetrics_format.generate_latest, openmetrics_format.CONTENT_TYPE_LATEST),
+}
+OPENMETRICS_EOF = "# EOF\n"
+
+
+def gzip_member(data):
+    """A complete gzip member, members can be concatenated into one gzip stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class _Metrics(object):
+    """Metric families in the shape generate_latest expects of a registry."""
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def collect(self):
+        return self.metrics
+
+
+class RenderedMetrics(object):
+    """
+    The exposition of a fixed list of metric families, rendered once per format
+    and encoding on first use. The OpenMetrics `# EOF` line is left out so that
+    renderings can be concatenated.
+    """
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.rendered = {}
+        self.render_seconds = {}
+
+    @classmethod
+    def restore(cls, gzipped_text):
+        """
+        The rendering of a snapshot saved by an earlier run, its metric families
+        are parsed back only when another format is asked for.
+        """
+        rendered = cls(None)
+        rendered.rendered[("text", True)] = gzipped_text
+        rendered.rendered[("text", False)] = zlib.decompress(gzipped_text, 16 + zlib.MAX_WBITS)
+        return rendered
+
+    def get(self, fmt, gzipped):
+        key = (fmt, gzipped)
+        with self.lock:
+            if key not in self.rendered:
+                if gzipped:
+                    self.rendered[key] = gzip_member(self.get_locked(fmt))
+                else:
+                    self.rendered[key] = self.get_locked(fmt)
+            return self.rendered[key]
+
+    def get_locked(self, fmt):
+        if (fmt, False) not in self.rendered:
+            start = time.time()
+            if self.metrics is None:
+                from prometheus_client.parser import text_string_to_metric_families
+                self.metrics = list(text_string_to_metric_families(self.rendered[("text", False)].decode("utf-8")))
+            data = FORMATS[fmt][0](_Metrics(self.metrics))
+            if fmt == "openmetrics" and data.endswith(OPENMETRICS_EOF):
+                data = data[:-len(OPENMETRICS_EOF)]
+            self.rendered[(fmt, False)] = data
+            self.render_seconds[fmt] = time.time() - start
+        return self.rendered[(fmt, False)]
+
+    def sizes(self):
+        return dict(self.rendered.items())
+
+
+class Exposition(object):
+    """
+    The /metrics response: the cached renderings of the snapshots of the scheduled
+    collectors and of the per target stats, followed by the few metrics of
+    `registry` rendered on each request.
+    """
+    def __init__(self, scheduler, registry=REGISTRY):
+        self.scheduler = scheduler
+        self.registry = registry
+        self.requests = {}
+        self.response_bytes = {}
+        self.lock = threading.Lock()
+
+    def render(self, fmt, gzipped):
+        parts = []
+        for scheduled in self.scheduler.exported():
+            rendered = scheduled.rendered
+            if rendered is not None:
+                parts.append(rendered.get(fmt, gzipped))
+        targets = self.scheduler.targets
+        if targets is not None:
+            parts.append(targets.get(fmt, gzipped))
+        live = RenderedMetrics(list(self.registry.collect()))
+        tail = live.get_locked(fmt)
+        if fmt == "openmetrics":
+            tail += OPENMETRICS_EOF
+        parts.append(gzip_member(tail) if gzipped else tail)
+        body = "".join(parts)
+        with self.lock:
+            key = (fmt, "gzip" if gzipped else "identity")
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.response_bytes[key] = self.response_bytes.get(key, 0) + len(body)
+        return body
+
+    def collect(self):
+        label = ["collector", "format"]
+        render = GaugeMetricFamily("hadoop_exporter_render_duration_seconds", "Time spent rendering the current snapshot", labels=label)
+        size = GaugeMetricFamily("hadoop_exporter_rendered_bytes", "Size of the rendered current snapshot", labels=label + ["encoding"])
+        for scheduled in self.scheduler.exported():
+            rendered = scheduled.rendered
+            if rendered is None:
+                continue
+            for fmt, seconds in rendered.render_seconds.items():
+                render.add_metric([scheduled.collector_name, fmt], seconds)
+            for (fmt, gzipped), data in rendered.sizes().items():
+                size.add_metric([scheduled.collector_name, fmt, "gzip" if gzipped else "identity"], len(data))
+        yield render
+        yield size
+        label = ["format", "encoding"]
+        requests = CounterMetricFamily("hadoop_exporter_http_requests", "Number of /metrics requests", labels=label)
+        response_bytes = CounterMetricFamily("hadoop_exporter_http_response_bytes", "Size of /metrics responses", labels=label)
+        with self.lock:
+            for key in sorted(self.requests):
+                requests.add_metric(list(key), self.requests[key])
+                response_bytes.add_metric(list(key), self.response_bytes[key])
+        yield requests
+        yield response_bytes
+
+
+def weights(header):
+    """The (value, q) of each entry of an Accept or Accept-Encoding header."""
+    entries = []
+    for entry in (header or "").split(","):
+        parts = entry.split(";")
+        value = parts[0].strip().lower()
+        if not value:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            name, _, weight = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(weight)
+                except ValueError:
+                    # a malformed weight does not accept the value
+                    q = 0.0
+        entries.append((value, q))
+    return entries
+
+
+def weight(entries, *values):
+    """The q of the first of `values` listed in `entries`, the most specific first, or None."""
+    for value in values:
+        listed = [q for v, q in entries if v == value]
+        if listed:
+            return max(listed)
+    return None
+
+
+def accepts_gzip(accept_encoding):
+    q = weight(weights(accept_encoding), "gzip", "*")
+    return q is not None and q > 0
+
+
+def choose_format(accept):
+    entries = weights(accept)
+    openmetrics = weight(entries, "application/openmetrics-text")
+    text = weight(entries, "text/plain", "text/*", "*/*") or 0.0
+    if openmetrics is not None and openmetrics > 0 and openmetrics >= text:
+        return "openmetrics"
+    return "text"
+
+
+class ExpositionHandler(BaseHTTPRequestHandler):
+    exposition = None
+
+    def do_GET(self):
+        fmt = choose_format(self.headers.get("Accept"))
+        gzipped = accepts_gzip(self.headers.get("Accept-Encoding"))
+        try:
+            body = self.exposition.render(fmt, gzipped)
+        except Exception as e:
+            logger.warning("Render /metrics failed, error: {0}.".format(str(e)))
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", FORMATS[fmt][1])
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ExpositionServer(SocketServer.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_http_server(port, addr, exposition):
+    handler = type("ExpositionHandler", (ExpositionHandler, object), {"exposition": exposition})
+    httpd = ExpositionServer((addr, port), handler)
+    t = threading.Thread(target=httpd.serve_forever, name="exposition")
+    t.daemon = True
+    t.start()
+    return httpd
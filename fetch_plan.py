@@ -0,0 +1,127 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import re
+import fnmatch
+import urllib
+
+from utils import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+
+# Value of the `service` key in the ObjectName of each daemon.
+SERVICES = {
+    "namenode": "NameNode",
+    "datanode": "DataNode",
+    "journalnode": "JournalNode",
+    "resourcemanager": "ResourceManager",
+    "nodemanager": "NodeManager",
+}
+
+# ObjectName pattern of the beans described by a metrics/*/<name>.json file,
+# when it is not simply "Hadoop:service=<service>,name=<name>".
+BEAN_PATTERNS = {
+    "OperatingSystem": "java.lang:type=OperatingSystem",
+    "Runtime": "java.lang:type=Runtime",
+    "MetricsSystem": "Hadoop:service={service},name=MetricsSystem,sub=Stats",
+    "RpcActivity": "Hadoop:service={service},name=RpcActivityForPort*",
+    "RpcDetailedActivity": "Hadoop:service={service},name=RpcDetailedActivityForPort*",
+    "DataNodeActivity": "Hadoop:service={service},name=DataNodeActivity*",
+    "FSDatasetState": "Hadoop:service={service},name=FSDatasetState*",
+    "RetryCache": "Hadoop:service={service},name=RetryCache*",
+    "JournalNode": "Hadoop:service={service},name=Journal-*",
+    "QueueMetrics": "Hadoop:service={service},name=QueueMetrics,*",
+}
+
+# Daemons whose beans are fetched with one `/jmx?qry=` request per pattern, their
+# full jmx document is large. A DataNode or NodeManager answers its small full
+# document in one request instead of about ten.
+QUERY_SERVICES = ("namenode", "resourcemanager")
+
+_full_jmx = False
+
+
+def configure(full_jmx):
+    global _full_jmx
+    _full_jmx = full_jmx
+
+
+def bean_pattern(service, name):
+    """ObjectName pattern of the beans described by metrics/*/<name>.json."""
+    pattern = BEAN_PATTERNS.get(name, "Hadoop:service={service},name={name}")
+    return pattern.format(service=SERVICES.get(service, "*"), name=name)
+
+
+def parse_object_name(name):
+    domain, _, props = name.partition(":")
+    return domain, dict(kv.split("=", 1) for kv in props.split(",") if "=" in kv)
+
+
+class BeanPattern(object):
+    """An ObjectName pattern, with `*` wildcards in the values and `,*` for any other keys."""
+    def __init__(self, pattern):
+        domain, props = parse_object_name(pattern)
+        self.domain = domain
+        self.any_keys = pattern.endswith(",*")
+        self.props = dict((k, re.compile(fnmatch.translate(v))) for k, v in props.items())
+
+    def match(self, name):
+        domain, props = parse_object_name(name)
+        if domain != self.domain:
+            return False
+        if not self.any_keys and len(props) != len(self.props):
+            return False
+        for k, v in self.props.items():
+            if k not in props or not v.match(props[k]):
+                return False
+        return True
+
+
+class FetchPlan(object):
+    """
+    The `/jmx?qry=` requests which fetch only the beans a collector reads, instead
+    of the full jmx document.
+    """
+    def __init__(self, service, file_list):
+        self.service = service
+        self.queries = []
+        for name in file_list:
+            query = bean_pattern(service, name)
+            if query not in self.queries:
+                self.queries.append(query)
+        self.patterns = [BeanPattern(query) for query in self.queries]
+        self.wanted = {}
+
+    def urls(self, url):
+        if _full_jmx or self.service not in QUERY_SERVICES:
+            return [url]
+        sep = "&" if "?" in url else "?"
+        return [url + sep + "qry=" + urllib.quote(query, safe=":=,*") for query in self.queries]
+
+    def wants(self, name):
+        if name not in self.wanted:
+            self.wanted[name] = any(pattern.match(name) for pattern in self.patterns)
+        return self.wanted[name]
+
+
+def compile_plan(service, file_list):
+    if service not in SERVICES:
+        return None
+    return FetchPlan(service, file_list)
+
+
+def merge_beans(parts):
+    """
+    Merge the bean lists returned by the queries of one target, patterns may
+    overlap so a bean is kept only once.
+    """
+    beans, names = [], set()
+    for part in parts:
+        for bean in part:
+            if bean['name'] in names:
+                continue
+            names.add(bean['name'])
+            beans.append(bean)
+    return beans
@@ -0,0 +1,77 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import time
+
+from utils import get_module_logger
+import scraper
+
+
+logger = get_module_logger(__name__)
+
+STANDBY = "standby"
+
+
+class HAScrape(object):
+    """
+    Scrape the members of a NameNode or ResourceManager HA pair according to their
+    last seen role. Members which are not standby are scraped every cycle with
+    `plan`, standby members every `standby_interval` seconds with `standby_plan`
+    and their last beans are reused in between. `role_of(url, beans)` returns the
+    role of a member from what it answered.
+
+    When no member answers as active any more, the standby members are scraped
+    again with `plan` in the same cycle, so a failover is picked up at once.
+    """
+    def __init__(self, name, urls, plan, standby_plan, standby_interval, role_of):
+        self.name = name
+        self.urls = urls
+        self.plan = plan
+        self.standby_plan = standby_plan
+        self.standby_interval = standby_interval
+        self.role_of = role_of
+        self.roles = {}
+        self.standby_beans = {}
+        self.last_standby = 0
+
+    def update(self, urls, targets):
+        answered = dict(targets)
+        for url in urls:
+            if url in answered:
+                role = self.role_of(url, answered[url])
+            else:
+                role = None
+            if role != self.roles.get(url):
+                logger.info("{0} {1} is {2}.".format(self.name, url, role or "unknown"))
+            if role is None:
+                self.roles.pop(url, None)
+            else:
+                self.roles[url] = role
+
+    def scrape_standby(self, urls, now):
+        if urls and self.standby_plan.queries and now - self.last_standby >= self.standby_interval:
+            targets = scraper.ScrapeMetrics(urls, self.standby_plan).scrape_targets()
+            self.update(urls, targets)
+            self.standby_beans = dict(targets)
+            self.last_standby = now
+        return [(url, self.standby_beans[url]) for url in urls if url in self.standby_beans and self.roles.get(url) == STANDBY]
+
+    def scrape(self):
+        now = time.time()
+        standby = [url for url in self.urls if self.roles.get(url) == STANDBY]
+        serving = [url for url in self.urls if url not in standby]
+        targets = scraper.ScrapeMetrics(serving, self.plan).scrape_targets()
+        self.update(serving, targets)
+        if standby and not any(self.roles.get(url, "") != STANDBY for url, _ in targets):
+            # failover: nothing answered as active, detect the roles of all members again
+            logger.info("No active {0}, scrape the standby ones again.".format(self.name))
+            retried = scraper.ScrapeMetrics(standby, self.plan).scrape_targets()
+            self.update(standby, retried)
+            targets.extend(retried)
+            standby = []
+        for url, beans in targets:
+            if self.roles.get(url) == STANDBY:
+                # kept until the next scrape of the standby members
+                self.standby_beans[url] = beans
+        targets.extend(self.scrape_standby(standby, now))
+        return [beans for _, beans in targets]
@@ -2,11 +2,22 @@
 # -*- coding: utf-8 -*-
 
 import time
-from prometheus_client import start_http_server
 from prometheus_client.core import REGISTRY
 
 import utils
+import scraper
+import fetch_plan
+import decoder
+import sharding
+import bean_cache
+import parse_pool
+import cardinality
+import rollup
+import instrumentation
+import exposition
 from utils import get_module_logger
+from scheduler import Scheduler
+from state import StateFile
 from hdfs_namenode import NameNodeMetricCollector
 from hdfs_datanode import DataNodeMetricCollector
 from hdfs_journalnode import JournalNodeMetricCollector
@@ -17,25 +28,72 @@ logger = get_module_logger(__name__)
 
 
 def register_prometheus(cluster, args):
+    scheduler = Scheduler(cluster)
+    state = None
+    if args.state_file is not None:
+        state = StateFile(args.state_file, cluster, scheduler, args.state_snapshots)
+    master = sharding.is_master()
+    rolling_interval = args.node_interval if args.rolling_scrape else None
     if args.nns is not None and len(args.nns) > 0:
-        nnc = NameNodeMetricCollector(cluster, args.nns)
-        nnc.collect()
-        REGISTRY.register(nnc)
-        REGISTRY.register(DataNodeMetricCollector(cluster, nnc))
+        nnc = NameNodeMetricCollector(cluster, args.nns, discovery_only=not master, standby_interval=args.standby_interval)
+        scheduler.add("namenode", nnc, args.interval, export=master, deadline=args.deadline)
+        scheduler.add("datanode", DataNodeMetricCollector(cluster, nnc, rolling_interval), args.node_interval, deadline=args.node_deadline)
+        if state is not None:
+            state.track("datanodes", nnc, "dns")
     if args.rms is not None and len(args.rms) > 0:
-        rmc = ResourceManagerMetricCollector(cluster, args.rms, args.queue)
-        rmc.collect()
-        REGISTRY.register(rmc)
-        REGISTRY.register(NodeManagerMetricCollector(cluster, rmc))
-    if args.jns is not None and len(args.jns) > 0:
-        REGISTRY.register(JournalNodeMetricCollector(cluster, args.jns))
+        rmc = ResourceManagerMetricCollector(cluster, args.rms, args.queue, discovery_only=not master,
+                                             standby_interval=args.standby_interval)
+        scheduler.add("resourcemanager", rmc, args.interval, export=master, deadline=args.deadline)
+        rollup.set_racks(lambda: rmc.racks)
+        scheduler.add("nodemanager", NodeManagerMetricCollector(cluster, rmc, rolling_interval), args.node_interval,
+                      deadline=args.node_deadline)
+        if state is not None:
+            state.track("nodemanagers", rmc, "nms")
+            state.track("racks", rmc, "racks")
+    if args.jns is not None and len(args.jns) > 0 and master:
+        scheduler.add("journalnode", JournalNodeMetricCollector(cluster, args.jns), args.interval, deadline=args.deadline)
+    REGISTRY.register(scheduler)
+    if state is not None:
+        # serve the saved snapshots and scrape the saved nodes until the first refresh
+        state.restore()
+        state.start()
+    scheduler.start()
+    return scheduler
+
+
 def main():
     args = utils.parse_args()
+    utils.set_log_level(args.log_level)
+    # fork the parsing processes before any thread is started
+    parse_pool.configure(args.parse_workers, args.json_decoder)
+    if parse_pool.parse_pool() is not None:
+        REGISTRY.register(parse_pool.parse_pool())
     host = args.host
     port = int(args.port)
-    start_http_server(port, host)
+    scraper.configure(args.concurrency, args.host_concurrency, args.pool_size, args.pool_idle_timeout, args.request_timeout,
+                      args.breaker_failures, args.breaker_backoff, args.hedge_after, args.late_policy,
+                      args.stream_above)
+    REGISTRY.register(scraper.connection_pool())
+    REGISTRY.register(scraper.scrape_pool())
+    REGISTRY.register(scraper.circuit_breakers())
+    REGISTRY.register(instrumentation.stats())
+    fetch_plan.configure(args.full_jmx)
+    decoder.configure(args.json_decoder)
+    bean_cache.configure(args.bean_cache_size)
+    if bean_cache.bean_cache() is not None:
+        REGISTRY.register(bean_cache.bean_cache())
+    rollup.configure(args.rollup_config)
+    if rollup.rollups() is not None:
+        REGISTRY.register(rollup.rollups())
+    cardinality.configure(args.cardinality_config)
+    if cardinality.limiter() is not None:
+        REGISTRY.register(cardinality.limiter())
+    sharding.configure(args.shard_index, args.shard_count)
+    scheduler = register_prometheus(args.cluster, args)
+    metrics = exposition.Exposition(scheduler)
+    REGISTRY.register(metrics)
+    exposition.start_http_server(port, host, metrics)
     print "Listen at %s:%s" % (host, port)
-    register_prometheus(args.cluster, args)
     while True:
         time.sleep(300)
 
@@ -1,34 +1,43 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8 -*-
 
-import yaml
-import re
-from prometheus_client.core import GaugeMetricFamily
-
 from utils import get_module_logger
-from common import MetricCollector, CommonMetricCollector
-from scraper import ScrapeMetrics
+from sample_store import CompactGaugeFamily
+from common import MetricCollector, CommonMetricCollector, to_snake_case
+from scraper import ScrapeMetrics, RollingScrapeMetrics
+import sharding
+from decoder import load_embedded
 
 logger = get_module_logger(__name__)
 
 
 class DataNodeMetricCollector(MetricCollector):
-    def __init__(self, cluster, nnc):
+    def __init__(self, cluster, nnc, rolling_interval=None):
         MetricCollector.__init__(self, cluster, "hdfs", "datanode")
         self.target = "-"
         self.nnc = nnc
+        self.rolling = None
+        if rolling_interval is not None:
+            self.rolling = RollingScrapeMetrics("datanode", rolling_interval, self.fetch_plan)
+            self.rolling.start()
 
         self.hadoop_datanode_metrics = {}
         for i in range(len(self.file_list)):
             self.hadoop_datanode_metrics.setdefault(self.file_list[i], {})
 
         self.common_metric_collector = CommonMetricCollector(cluster, "hdfs", "datanode")
+        self.dnactivity_plan = self.compile_dnactivity_plan()
 
     def collect(self):
         isSetup = False
         if self.nnc.dns == "":
             return
-        beans_list = ScrapeMetrics(self.nnc.dns).scrape()
+        if self.rolling is not None:
+            beans_list = self.rolling.scrape(sharding.select(self.nnc.dns))
+        else:
+            beans_list = ScrapeMetrics(sharding.select(self.nnc.dns), self.fetch_plan).scrape()
+        if len(beans_list) == 0:
+            return
         for beans in beans_list:
             if not isSetup:
                 self.common_metric_collector.setup_labels(beans)
@@ -54,10 +63,9 @@ class DataNodeMetricCollector(MetricCollector):
                 name = "_".join([self.prefix, 'volume_state'])
             else:
                 label = ["cluster", "version"]
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
-                name = "_".join([self.prefix, snake_case])
+                name = "_".join([self.prefix, to_snake_case(metric)])
             label.append("_target")
-            self.hadoop_datanode_metrics['DataNodeInfo'][metric] = GaugeMetricFamily(name, self.metrics['DataNodeInfo'][metric], labels=label)
+            self.hadoop_datanode_metrics['DataNodeInfo'][metric] = CompactGaugeFamily(name, self.metrics['DataNodeInfo'][metric], labels=label)
 
     def setup_dnactivity_labels(self):
         block_flag, client_flag = 1, 1
@@ -81,39 +89,40 @@ class DataNodeMetricCollector(MetricCollector):
                 else:
                     continue
             else:
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
                 label = ['cluster', 'host']
                 key = metric
-                name = snake_case
+                name = to_snake_case(metric)
                 descriptions = self.metrics['DataNodeActivity'][metric]
             label.append("_target")
-            self.hadoop_datanode_metrics['DataNodeActivity'][key] = GaugeMetricFamily("_".join([self.prefix, name]), descriptions, labels=label)
+            self.hadoop_datanode_metrics['DataNodeActivity'][key] = CompactGaugeFamily("_".join([self.prefix, name]), descriptions, labels=label)
 
     def setup_fsdatasetstate_labels(self):
         for metric in self.metrics['FSDatasetState']:
             label = ['cluster', 'host', "_target"]
             if "Num" in metric:
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric.split("Num")[1]).lower()
+                snake_case = to_snake_case(metric.split("Num")[1])
             else:
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+                snake_case = to_snake_case(metric)
             name = "_".join([self.prefix, snake_case])
-            self.hadoop_datanode_metrics['FSDatasetState'][metric] = GaugeMetricFamily(name, self.metrics['FSDatasetState'][metric], labels=label)
+            self.hadoop_datanode_metrics['FSDatasetState'][metric] = CompactGaugeFamily(name, self.metrics['FSDatasetState'][metric], labels=label)
 
     def setup_metrics_labels(self, beans):
+        setup_handlers = {
+            'DataNodeInfo': self.setup_dninfo_labels,
+            'DataNodeActivity': self.setup_dnactivity_labels,
+            'FSDatasetState': self.setup_fsdatasetstate_labels,
+        }
         for i in range(len(beans)):
-            if 'DataNodeInfo' in beans[i]['name']:
-                self.setup_dninfo_labels()
-            if 'DataNodeActivity' in beans[i]['name']:
-                self.setup_dnactivity_labels()
-            if 'FSDatasetState' in beans[i]['name']:
-                self.setup_fsdatasetstate_labels()
+            setup = setup_handlers.get(self.router.route(beans[i]['name']))
+            if setup is not None:
+                setup()
 
     def get_dninfo_metrics(self, bean):
         for metric in self.metrics['DataNodeInfo']:
             version = bean['Version']
             if 'VolumeInfo' in metric:
                 if 'VolumeInfo' in bean:
-                    volume_info_dict = yaml.safe_load(bean['VolumeInfo'])
+                    volume_info_dict = load_embedded(bean['VolumeInfo'])
                     for k, v in volume_info_dict.items():
                         path = k
                         for key, val in v.items():
@@ -129,23 +138,26 @@ class DataNodeMetricCollector(MetricCollector):
                 value = bean[metric]
                 self.hadoop_datanode_metrics['DataNodeInfo'][metric].add_metric(label, value)
 
-    def get_dnactivity_metrics(self, bean):
+    def compile_dnactivity_plan(self):
+        plan = []
         for metric in self.metrics['DataNodeActivity']:
-            host = bean['tag.Hostname']
-            label = [self.cluster, host]
             if 'Blocks' in metric:
-                oper = metric.split("Blocks")[1]
-                label.append(oper)
+                label = [metric.split("Blocks")[1]]
                 key = "Blocks"
             elif 'Client' in metric:
-                oper = metric.split("Client")[0].split("From")[0]
-                client = metric.split("Client")[0].split("From")[1]
-                label.extend([oper, client])
+                oper, client = metric.split("Client")[0].split("From")[:2]
+                label = [oper, client]
                 key = "Client"
             else:
+                label = []
                 key = metric
-            label.append(self.target)
-            self.hadoop_datanode_metrics['DataNodeActivity'][key].add_metric(label, bean[metric] if metric in bean else 0)
+            plan.append((metric, key, label))
+        return plan
+
+    def get_dnactivity_metrics(self, bean):
+        prefix = [self.cluster, bean['tag.Hostname']]
+        for metric, key, label in self.dnactivity_plan:
+            self.hadoop_datanode_metrics['DataNodeActivity'][key].add_metric(prefix + label + [self.target], bean[metric] if metric in bean else 0)
 
     def get_fsdatasetstate_metrics(self, bean):
         for metric in self.metrics['FSDatasetState']:
@@ -154,10 +166,8 @@ class DataNodeMetricCollector(MetricCollector):
                 label, bean[metric] if metric in bean else 0)
 
     def get_metrics(self, beans):
-        for i in range(len(beans)):
-            if 'DataNodeInfo' in beans[i]['name']:
-                self.get_dninfo_metrics(beans[i])
-            if 'DataNodeActivity' in beans[i]['name']:
-                self.get_dnactivity_metrics(beans[i])
-            if 'FSDatasetState' in beans[i]['name']:
-                self.get_fsdatasetstate_metrics(beans[i])
+        self.router.dispatch(beans, {
+            'DataNodeInfo': self.get_dninfo_metrics,
+            'DataNodeActivity': self.get_dnactivity_metrics,
+            'FSDatasetState': self.get_fsdatasetstate_metrics,
+        }, self.hadoop_datanode_metrics)
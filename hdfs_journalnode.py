@@ -1,11 +1,11 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8 -*-
 
-import re
-from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.core import HistogramMetricFamily
 
 from utils import get_module_logger
-from common import MetricCollector, CommonMetricCollector
+from sample_store import CompactGaugeFamily
+from common import MetricCollector, CommonMetricCollector, to_snake_case
 from scraper import ScrapeMetrics
 
 logger = get_module_logger(__name__)
@@ -23,11 +23,13 @@ class JournalNodeMetricCollector(MetricCollector):
 
         self.common_metric_collector = CommonMetricCollector(cluster, "hdfs", "journalnode")
 
-        self.scrape_metrics = ScrapeMetrics(urls)
+        self.scrape_metrics = ScrapeMetrics(urls, self.fetch_plan)
 
     def collect(self):
         isSetup = False
         beans_list = self.scrape_metrics.scrape()
+        if len(beans_list) == 0:
+            return
         for beans in beans_list:
             if not isSetup:
                 self.common_metric_collector.setup_labels(beans)
@@ -78,18 +80,18 @@ class JournalNodeMetricCollector(MetricCollector):
                 else:
                     continue
             else:
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+                snake_case = to_snake_case(metric)
                 name = "_".join([self.prefix, snake_case])
-                self.hadoop_journalnode_metrics['JournalNode'][metric] = GaugeMetricFamily(name, self.metrics['JournalNode'][metric], labels=label)
+                self.hadoop_journalnode_metrics['JournalNode'][metric] = CompactGaugeFamily(name, self.metrics['JournalNode'][metric], labels=label)
 
     def setup_metrics_labels(self, beans):
         for i in range(len(beans)):
-            if 'name=Journal-' in beans[i]['name']:
+            if self.router.route(beans[i]['name']) == 'JournalNode':
                 self.setup_journalnode_labels()
 
     def get_metrics(self, beans):
         for i in range(len(beans)):
-            if 'name=Journal-' in beans[i]['name'] and 'JournalNode' in self.metrics:
+            if self.router.route(beans[i]['name']) == 'JournalNode':
                 host = beans[i]['tag.Hostname']
                 label = [self.cluster, host, self.target]
 
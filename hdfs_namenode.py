@@ -1,21 +1,58 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8 -*-
 
-import yaml
 import re
-
-from prometheus_client.core import GaugeMetricFamily
+from functools import partial
 
 from utils import get_module_logger
-from common import MetricCollector, CommonMetricCollector
+from sample_store import CompactGaugeFamily
+from common import MetricCollector, CommonMetricCollector, to_snake_case, get_value, get_value_or_zero
 from scraper import ScrapeMetrics
+from fetch_plan import compile_plan
+from decoder import load_embedded, count_embedded
+from bean_cache import map_bean
+from ha import HAScrape
 
 logger = get_module_logger(__name__)
 
 
 class NameNodeMetricCollector(MetricCollector):
-    def __init__(self, cluster, urls):
+
+    HA_STATE = {
+        'initializing': 0.0,
+        'active': 1.0,
+        'standby': 2.0,
+        'stopping': 3.0,
+    }
+
+    FS_STATE = {
+        'Safemode': 0.0,
+        'Operational': 1.0,
+    }
+
+    ADMIN_STATE = {
+        'In Service': 0,
+        'Decommission In Progress': 1,
+    }
+
+    NNINFO_ITEMS = {
+        'LiveNodes': ["lastContact", "usedSpace", "adminState", "nonDfsUsedSpace", "capacity", "numBlocks",
+                      "used", "remaining", "blockScheduled", "blockPoolUsed", "blockPoolUsedPercent", "volfails"],
+        'DecomNodes': ["underReplicatedBlocks", "decommissionOnlyReplicas", "underReplicateInOpenFiles"],
+        'EnteringMaintenanceNodes': ["underReplicatedBlocks", "maintenanceOnlyReplicas", "underReplicateInOpenFiles"],
+        'NodeUsage': ["min", "median", "max", "stdDev"],
+    }
+
+    # beans not fetched from a standby NameNode
+    STANDBY_EXCLUDED = ['NameNodeInfo']
+
+    def __init__(self, cluster, urls, discovery_only=False, standby_interval=0):
         MetricCollector.__init__(self, cluster, "hdfs", "namenode")
+        names = self.merge_list
+        if discovery_only:
+            # NameNodeInfo finds the DataNodes, FSNamesystem tells the active NameNode
+            names = ["NameNodeInfo", "FSNamesystem"]
+            self.fetch_plan = compile_plan("namenode", names)
         self.target = "-"
         self.urls = urls
         self.dns = set()
@@ -26,11 +63,29 @@ class NameNodeMetricCollector(MetricCollector):
 
         self.common_metric_collector = CommonMetricCollector(cluster, "hdfs", "namenode")
 
-        self.scrape_metrics = ScrapeMetrics(urls)
+        if standby_interval > 0:
+            standby_plan = compile_plan("namenode", [name for name in names if name not in self.STANDBY_EXCLUDED])
+            self.scrape_metrics = HAScrape("namenode", urls, self.fetch_plan, standby_plan, standby_interval, self.ha_role)
+        else:
+            self.scrape_metrics = ScrapeMetrics(urls, self.fetch_plan)
+
+        self.nninfo_items = {}
+        for attribute, items in self.NNINFO_ITEMS.items():
+            self.nninfo_items[attribute] = [(item, "-".join([attribute, to_snake_case(item)])) for item in items]
+        self.plans = {}
+        for service, compile_service_plan in [('NameNodeActivity', self.compile_nnactivity_plan),
+                                      ('StartupProgress', self.compile_startupprogress_plan),
+                                      ('FSNamesystem', self.compile_fsnamesystem_plan),
+                                      ('FSNamesystemState', self.compile_fsnamesystem_state_plan),
+                                      ('RetryCache', self.compile_retrycache_plan)]:
+            if service in self.metrics:
+                self.plans[service] = compile_service_plan()
 
     def collect(self):
         isSetup = False
         beans_list = self.scrape_metrics.scrape()
+        if len(beans_list) == 0:
+            return
         for beans in beans_list:
             if not isSetup:
                 self.common_metric_collector.setup_labels(beans)
@@ -49,6 +104,12 @@ class NameNodeMetricCollector(MetricCollector):
                 for metric in self.hadoop_namenode_metrics[service]:
                     yield self.hadoop_namenode_metrics[service][metric]
 
+    def ha_role(self, url, beans):
+        for bean in beans:
+            if self.router.route(bean['name']) == 'FSNamesystem':
+                return bean.get('tag.HAState')
+        return None
+
     def setup_nnactivity_labels(self):
         num_namenode_flag, avg_namenode_flag, ops_namenode_flag = 1, 1, 1
         for metric in self.metrics['NameNodeActivity']:
@@ -58,7 +119,7 @@ class NameNodeMetricCollector(MetricCollector):
                     key = "MethodNumOps"
                     name = "_".join([self.prefix, "nnactivity_method_ops_total"])
                     description = "Total number of the times the method is called."
-                    self.hadoop_namenode_metrics['NameNodeActivity'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.hadoop_namenode_metrics['NameNodeActivity'][key] = CompactGaugeFamily(name, description, labels=label)
                     num_namenode_flag = 0
                 else:
                     continue
@@ -67,7 +128,7 @@ class NameNodeMetricCollector(MetricCollector):
                     key = "MethodAvgTime"
                     name = "_".join([self.prefix, "nnactivity_method_avg_time_milliseconds"])
                     descripton = "Average turn around time of the method in milliseconds."
-                    self.hadoop_namenode_metrics['NameNodeActivity'][key] = GaugeMetricFamily(name, descripton, labels=label)
+                    self.hadoop_namenode_metrics['NameNodeActivity'][key] = CompactGaugeFamily(name, descripton, labels=label)
                     avg_namenode_flag = 0
                 else:
                     continue
@@ -75,13 +136,13 @@ class NameNodeMetricCollector(MetricCollector):
                 key = "Operations"
                 name = "_".join([self.prefix, "nnactivity_operations_total"])
                 description = "Total number of each operation."
-                self.hadoop_namenode_metrics['NameNodeActivity'][key] = GaugeMetricFamily(name, description, labels=label)
+                self.hadoop_namenode_metrics['NameNodeActivity'][key] = CompactGaugeFamily(name, description, labels=label)
                 ops_namenode_flag = 0
 
     def setup_startupprogress_labels(self):
         sp_count_flag, sp_elapsed_flag, sp_total_flag, sp_complete_flag = 1, 1, 1, 1
         for metric in self.metrics['StartupProgress']:
-            snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+            snake_case = to_snake_case(metric)
             if "ElapsedTime" == metric:
                 key = "ElapsedTime"
                 name = "total_elapsed_time_milliseconds"
@@ -128,7 +189,7 @@ class NameNodeMetricCollector(MetricCollector):
                 descriptions = self.metrics['StartupProgress'][metric]
             label = ["cluster", "phase", "_target"]
             name = "_".join([self.prefix, "startup_process", name])
-            self.hadoop_namenode_metrics['StartupProgress'][key] = GaugeMetricFamily(name, descriptions, labels=label)
+            self.hadoop_namenode_metrics['StartupProgress'][key] = CompactGaugeFamily(name, descriptions, labels=label)
 
     def setup_fsnamesystem_labels(self):
         cap_flag = 1
@@ -145,16 +206,16 @@ class NameNodeMetricCollector(MetricCollector):
             else:
                 key = metric
                 label = ["cluster"]
-                name = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+                name = to_snake_case(metric)
                 descriptions = self.metrics['FSNamesystem'][metric]
             label.append("_target")
             name = "_".join([self.prefix, "fsname_system", name])
-            self.hadoop_namenode_metrics['FSNamesystem'][key] = GaugeMetricFamily(name, descriptions, labels=label)
+            self.hadoop_namenode_metrics['FSNamesystem'][key] = CompactGaugeFamily(name, descriptions, labels=label)
 
     def setup_fsnamesystem_state_labels(self):
         num_flag = 1
         for metric in self.metrics['FSNamesystemState']:
-            snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+            snake_case = to_snake_case(metric)
             if 'DataNodes' in metric:
                 if num_flag:
                     num_flag = 0
@@ -169,7 +230,7 @@ class NameNodeMetricCollector(MetricCollector):
                 descriptions = self.metrics['FSNamesystemState'][metric]
             label.append("_target")
             name = "_".join([self.prefix, "fsname_system_state", snake_case])
-            self.hadoop_namenode_metrics['FSNamesystemState'][key] = GaugeMetricFamily(name, descriptions, labels=label)
+            self.hadoop_namenode_metrics['FSNamesystemState'][key] = CompactGaugeFamily(name, descriptions, labels=label)
 
     def setup_retrycache_labels(self):
         cache_flag = 1
@@ -180,82 +241,73 @@ class NameNodeMetricCollector(MetricCollector):
                 label = ["cluster", "mode", "_target"]
                 name = "_".join([self.prefix, "cache_total"])
                 description = "Total number of RetryCache in each mode"
-                self.hadoop_namenode_metrics['RetryCache'][key] = GaugeMetricFamily(name, description, labels=label)
+                self.hadoop_namenode_metrics['RetryCache'][key] = CompactGaugeFamily(name, description, labels=label)
 
     def setup_nninfo_labels(self):
         for metric in self.metrics['NameNodeInfo']:
             if "LiveNodes" in metric:
                 name = "_".join([self.prefix, "nninfo_live_nodes_count"])
                 description = "Count of live data node"
-                self.hadoop_namenode_metrics['NameNodeInfo']["LiveNodeCount"] = GaugeMetricFamily(name, description, labels=["cluster", "_target"])
+                self.hadoop_namenode_metrics['NameNodeInfo']["LiveNodeCount"] = CompactGaugeFamily(name, description, labels=["cluster", "_target"])
 
                 label = ["cluster", "datanode", "infoAddr", "infoSecureAddr", "xferaddr", "version", "_target"]
-                items = ["lastContact", "usedSpace", "adminState", "nonDfsUsedSpace", "capacity", "numBlocks",
-                         "used", "remaining", "blockScheduled", "blockPoolUsed", "blockPoolUsedPercent", "volfails"]
-                for item in items:
-                    item = re.sub('([a-z0-9])([A-Z])', r'\1_\2', item).lower()
+                for item, key in self.nninfo_items['LiveNodes']:
+                    item = to_snake_case(item)
                     name = "_".join([self.prefix, "nninfo_live_nodes", item])
-                    key = "LiveNodes-" + item
                     description = "Live node " + item
                     if item == "admin_state":
                         description += " 0: In Service, 1: Decommission In Progress, 2: Decommissioned"
-                    self.hadoop_namenode_metrics['NameNodeInfo'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.hadoop_namenode_metrics['NameNodeInfo'][key] = CompactGaugeFamily(name, description, labels=label)
                 continue
             elif "DeadNodes" in metric:
                 name = "_".join([self.prefix, "nninfo_dead_nodes_count"])
                 description = "Count of dead data node"
-                self.hadoop_namenode_metrics['NameNodeInfo']["DeadNodeCount"] = GaugeMetricFamily(name, description, labels=["cluster", "_target"])
+                self.hadoop_namenode_metrics['NameNodeInfo']["DeadNodeCount"] = CompactGaugeFamily(name, description, labels=["cluster", "_target"])
 
-                label = ["cluster", "datanode", "decommissioned", "xferaddr"]
+                label = ["cluster", "datanode", "decommissioned", "xferaddr", "_target"]
                 name = "_".join([self.prefix, "nninfo_dead_nodes_last_contact"])
                 key = "DeadNodes"
                 description = "Dead node last contact in milions"
-                self.hadoop_namenode_metrics['NameNodeInfo'][key] = GaugeMetricFamily(name, description, labels=label)
+                self.hadoop_namenode_metrics['NameNodeInfo'][key] = CompactGaugeFamily(name, description, labels=label)
                 continue
             elif "DecomNodes" in metric:
                 name = "_".join([self.prefix, "nninfo_decom_nodes_count"])
                 description = "Count of decommissioned data node"
-                self.hadoop_namenode_metrics['NameNodeInfo']["DecomNodeCount"] = GaugeMetricFamily(name, description, labels=["cluster", "_target"])
+                self.hadoop_namenode_metrics['NameNodeInfo']["DecomNodeCount"] = CompactGaugeFamily(name, description, labels=["cluster", "_target"])
 
                 label = ["cluster", "datanode", "xferaddr", "_target"]
-                items = ["underReplicatedBlocks", "decommissionOnlyReplicas", "underReplicateInOpenFiles"]
-                for item in items:
-                    item = re.sub('([a-z0-9])([A-Z])', r'\1_\2', item).lower()
+                for item, key in self.nninfo_items['DecomNodes']:
+                    item = to_snake_case(item)
                     name = "_".join([self.prefix, "nninfo_decom_nodes", item])
-                    key = "DecomNodes-" + item
                     description = "Decom Node " + item
-                    self.hadoop_namenode_metrics['NameNodeInfo'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.hadoop_namenode_metrics['NameNodeInfo'][key] = CompactGaugeFamily(name, description, labels=label)
                 continue
             elif "EnteringMaintenanceNodes" in metric:
                 name = "_".join([self.prefix, "nninfo_maintenance_nodes_count"])
                 description = "Count of maintenance data node"
-                self.hadoop_namenode_metrics['NameNodeInfo']["MaintenanceNodeCount"] = GaugeMetricFamily(name, description, labels=["cluster", "_target"])
+                self.hadoop_namenode_metrics['NameNodeInfo']["MaintenanceNodeCount"] = CompactGaugeFamily(name, description, labels=["cluster", "_target"])
 
                 label = ["cluster", "datanode", "xferaddr", "_target"]
-                items = ["underReplicatedBlocks", "maintenanceOnlyReplicas", "underReplicateInOpenFiles"]
-                for item in items:
-                    item = re.sub('([a-z0-9])([A-Z])', r'\1_\2', item).lower()
+                for item, key in self.nninfo_items['EnteringMaintenanceNodes']:
+                    item = to_snake_case(item)
                     name = "_".join([self.prefix, "nninfo_entering_maintenance_nodes", item])
-                    key = "EnteringMaintenanceNodes-" + item
                     description = "Entering maintenance node " + item
-                    self.hadoop_namenode_metrics['NameNodeInfo'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.hadoop_namenode_metrics['NameNodeInfo'][key] = CompactGaugeFamily(name, description, labels=label)
                 continue
             elif "CorruptFiles" in metric:
                 label = ["cluster", "_target"]
                 name = "_".join([self.prefix, "nninfo_corrupt_file_count"])
                 key = "CorruptFiles"
                 description = "Corrupt file count"
-                self.hadoop_namenode_metrics['NameNodeInfo'][key] = GaugeMetricFamily(name, description, labels=label)
+                self.hadoop_namenode_metrics['NameNodeInfo'][key] = CompactGaugeFamily(name, description, labels=label)
                 continue
             elif "NodeUsage" in metric:
                 label = ["cluster", "_target"]
-                items = ["min", "median", "max", "stdDev"]
-                for item in items:
-                    item = re.sub('([a-z0-9])([A-Z])', r'\1_\2', item).lower()
+                for item, key in self.nninfo_items['NodeUsage']:
+                    item = to_snake_case(item)
                     name = "_".join([self.prefix, "nninfo_node_usage", item])
-                    key = "NodeUsage-" + item
                     description = "Node usage " + item
-                    self.hadoop_namenode_metrics['NameNodeInfo'][key] = GaugeMetricFamily(name, description, labels=label)
+                    self.hadoop_namenode_metrics['NameNodeInfo'][key] = CompactGaugeFamily(name, description, labels=label)
                 continue
             elif "SoftwareVersion" in metric:
                 label = ["cluster", "software_version"]
@@ -267,28 +319,28 @@ class NameNodeMetricCollector(MetricCollector):
                 key = "Safemode"
             else:
                 label = ["cluster"]
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
+                snake_case = to_snake_case(metric)
                 name = "_".join([self.prefix, "nninfo", snake_case])
                 key = metric
             label.append("_target")
-            self.hadoop_namenode_metrics['NameNodeInfo'][key] = GaugeMetricFamily(name, self.metrics["NameNodeInfo"][metric], labels=label)
+            self.hadoop_namenode_metrics['NameNodeInfo'][key] = CompactGaugeFamily(name, self.metrics["NameNodeInfo"][metric], labels=label)
 
     def setup_metrics_labels(self, beans):
+        setup_handlers = {
+            'NameNodeActivity': self.setup_nnactivity_labels,
+            'StartupProgress': self.setup_startupprogress_labels,
+            'FSNamesystem': self.setup_fsnamesystem_labels,
+            'FSNamesystemState': self.setup_fsnamesystem_state_labels,
+            'RetryCache': self.setup_retrycache_labels,
+            'NameNodeInfo': self.setup_nninfo_labels,
+        }
         for i in range(len(beans)):
-            if 'NameNodeActivity' in beans[i]['name']:
-                self.setup_nnactivity_labels()
-            if 'StartupProgress' in beans[i]['name']:
-                self.setup_startupprogress_labels()
-            if 'FSNamesystem' in beans[i]['name']:
-                self.setup_fsnamesystem_labels()
-            if 'FSNamesystemState' in beans[i]['name']:
-                self.setup_fsnamesystem_state_labels()
-            if 'RetryCache' in beans[i]['name']:
-                self.setup_retrycache_labels()
-            if "NameNodeInfo" in beans[i]['name']:
-                self.setup_nninfo_labels()
-
-    def get_nnactivity_metrics(self, bean):
+            setup = setup_handlers.get(self.router.route(beans[i]['name']))
+            if setup is not None:
+                setup()
+
+    def compile_nnactivity_plan(self):
+        plan = []
         for metric in self.metrics['NameNodeActivity']:
             if "NumOps" in metric:
                 method = metric.split('NumOps')[0]
@@ -302,10 +354,11 @@ class NameNodeMetricCollector(MetricCollector):
                 else:
                     method = metric
                 key = "Operations"
-            label = [self.cluster, method, self.target]
-            self.hadoop_namenode_metrics['NameNodeActivity'][key].add_metric(label, bean[metric] if metric in bean else 0)
+            plan.append((metric, key, [self.cluster, method], get_value))
+        return plan
 
-    def get_startupprogress_metrics(self, bean):
+    def compile_startupprogress_plan(self):
+        plan = []
         for metric in self.metrics['StartupProgress']:
             if "Count" in metric:
                 key = "PhaseCount"
@@ -322,135 +375,102 @@ class NameNodeMetricCollector(MetricCollector):
             else:
                 key = metric
                 phase = "-"
-            label = [self.cluster, phase, self.target]
-            self.hadoop_namenode_metrics['StartupProgress'][key].add_metric(label, bean[metric] if metric in bean else 0)
+            plan.append((metric, key, [self.cluster, phase], get_value))
+        return plan
 
-    def get_fsnamesystem_metrics(self, bean):
+    def compile_fsnamesystem_plan(self):
+        plan = []
         for metric in self.metrics['FSNamesystem']:
-            key = metric
             if 'HAState' in metric:
-                label = [self.cluster]
-                if 'initializing' == bean['tag.HAState']:
-                    value = 0.0
-                elif 'active' == bean['tag.HAState']:
-                    value = 1.0
-                elif 'standby' == bean['tag.HAState']:
-                    value = 2.0
-                elif 'stopping' == bean['tag.HAState']:
-                    value = 3.0
-                else:
-                    value = 9999
-                label.append(self.target)
-                self.hadoop_namenode_metrics['FSNamesystem'][key].add_metric(label, value)
+                plan.append((metric, metric, [self.cluster], self.get_ha_state))
             elif metric.startswith("Capacity"):
-                key = 'capacity'
                 mode = metric.split("Capacity")[1]
-                label = [self.cluster, mode]
-                label.append(self.target)
-                self.hadoop_namenode_metrics['FSNamesystem'][key].add_metric(label, bean[metric] if metric in bean else 0)
+                plan.append((metric, 'capacity', [self.cluster, mode], get_value))
             else:
-                label = [self.cluster]
-                label.append(self.target)
-                self.hadoop_namenode_metrics['FSNamesystem'][key].add_metric(label, bean[metric] if metric in bean else 0)
+                plan.append((metric, metric, [self.cluster], get_value))
+        return plan
 
-    def get_fsnamesystem_state_metrics(self, bean):
+    def compile_fsnamesystem_state_plan(self):
+        plan = []
         for metric in self.metrics['FSNamesystemState']:
-            label = [self.cluster]
-            key = metric
             if 'FSState' in metric:
-                if 'Safemode' == bean['FSState']:
-                    value = 0.0
-                elif 'Operational' == bean['FSState']:
-                    value = 1.0
-                else:
-                    value = 9999
-                label.append(self.target)
-                self.hadoop_namenode_metrics['FSNamesystemState'][key].add_metric(label, value)
+                plan.append((metric, metric, [self.cluster], self.get_fs_state))
             elif "TotalSyncTimes" in metric:
-                label.append(self.target)
-                self.hadoop_namenode_metrics['FSNamesystemState'][key].add_metric(label, float(
-                    re.sub(r'\s', '', bean[metric])) if metric in bean and bean[metric] else 0)
+                plan.append((metric, metric, [self.cluster], self.get_total_sync_times))
             elif "DataNodes" in metric:
-                key = 'datanodes_num'
                 state = metric.split("DataNodes")[0].split("Num")[1]
-                label = [self.cluster, state, self.target]
-                self.hadoop_namenode_metrics['FSNamesystemState'][key].add_metric(label, bean[metric] if metric in bean and bean[metric] else 0)
+                plan.append((metric, 'datanodes_num', [self.cluster, state], get_value_or_zero))
             else:
-                label.append(self.target)
-                self.hadoop_namenode_metrics['FSNamesystemState'][key].add_metric(label, bean[metric] if metric in bean and bean[metric] else 0)
+                plan.append((metric, metric, [self.cluster], get_value_or_zero))
+        return plan
 
-    def get_retrycache_metrics(self, bean):
+    def compile_retrycache_plan(self):
+        plan = []
         for metric in self.metrics['RetryCache']:
-            key = "cache"
-            label = [self.cluster, metric.split('Cache')[1], self.target]
-            self.hadoop_namenode_metrics['RetryCache'][key].add_metric(label, bean[metric] if metric in bean and bean[metric] else 0)
+            plan.append((metric, "cache", [self.cluster, metric.split('Cache')[1]], get_value_or_zero))
+        return plan
+
+    def get_ha_state(self, bean, metric):
+        return self.HA_STATE.get(bean['tag.HAState'], 9999)
+
+    def get_fs_state(self, bean, metric):
+        return self.FS_STATE.get(bean['FSState'], 9999)
+
+    def get_total_sync_times(self, bean, metric):
+        return float(re.sub(r'\s', '', bean[metric])) if metric in bean and bean[metric] else 0
+
+    def get_plan_metrics(self, service, bean):
+        metrics = self.hadoop_namenode_metrics[service]
+        for metric, key, label, get in self.plans[service]:
+            metrics[key].add_metric(label + [self.target], get(bean, metric))
 
     def get_nninfo_metrics(self, bean):
         for metric in self.metrics["NameNodeInfo"]:
             if "LiveNodes" in metric and "LiveNodes" in bean:
-                live_node_dict = yaml.safe_load(bean["LiveNodes"])
+                live_node_dict = load_embedded(bean["LiveNodes"])
                 self.hadoop_namenode_metrics["NameNodeInfo"]["LiveNodeCount"].add_metric([self.cluster, self.target], len(live_node_dict))
                 dns = set()
                 for node, info in live_node_dict.items():
                     label = [self.cluster, node, info["infoAddr"], info["infoSecureAddr"], info["xferaddr"], info["version"], self.target]
-                    items = ["lastContact", "usedSpace", "adminState", "nonDfsUsedSpace", "capacity", "numBlocks",
-                             "used", "remaining", "blockScheduled", "blockPoolUsed", "blockPoolUsedPercent", "volfails"]
                     dns.add("http://"+info["infoAddr"]+"/jmx")
-                    for item in items:
+                    for item, key in self.nninfo_items['LiveNodes']:
                         value = info[item] if item in info else 0
                         if item == "adminState":
-                            if value == "In Service":
-                                value = 0
-                            elif value == "Decommission In Progress":
-                                value = 1
-                            else:  # Decommissioned
-                                value = 2
-                        item = re.sub('([a-z0-9])([A-Z])', r'\1_\2', item).lower()
-                        key = "LiveNodes-" + item
+                            value = self.ADMIN_STATE.get(value, 2)  # 2: Decommissioned
                         self.hadoop_namenode_metrics["NameNodeInfo"][key].add_metric(label, value)
                 self.dns = dns
             elif "DeadNodes" in metric and "DeadNodes" in bean:
-                dead_node_dict = yaml.safe_load(bean["DeadNodes"])
+                dead_node_dict = load_embedded(bean["DeadNodes"])
                 self.hadoop_namenode_metrics["NameNodeInfo"]["DeadNodeCount"].add_metric([self.cluster, self.target], len(dead_node_dict))
                 for node, info in dead_node_dict.items():
                     label = [self.cluster, node, str(info["decommissioned"]), info["xferaddr"], self.target]
                     value = info["lastContact"]
                     self.hadoop_namenode_metrics["NameNodeInfo"]["DeadNodes"].add_metric(label, value)
             elif "DecomNodes" in metric and "DecomNodes" in bean:
-                decom_node_dict = yaml.safe_load(bean["DecomNodes"])
+                decom_node_dict = load_embedded(bean["DecomNodes"])
                 self.hadoop_namenode_metrics["NameNodeInfo"]["DecomNodeCount"].add_metric([self.cluster, self.target], len(decom_node_dict))
                 for node, info in decom_node_dict.items():
                     label = [self.cluster, node, info["xferaddr"], self.target]
-                    items = ["underReplicatedBlocks", "decommissionOnlyReplicas", "underReplicateInOpenFiles"]
-                    for item in items:
+                    for item, key in self.nninfo_items['DecomNodes']:
                         value = info[item] if item in info else 0
-                        item = re.sub('([a-z0-9])([A-Z])', r'\1_\2', item).lower()
-                        key = "DecomNodes-" + item
                         self.hadoop_namenode_metrics["NameNodeInfo"][key].add_metric(label, value)
             elif "EnteringMaintenanceNodes" in metric and "EnteringMaintenanceNodes" in bean:
-                node_dict = yaml.safe_load(bean["EnteringMaintenanceNodes"])
+                node_dict = load_embedded(bean["EnteringMaintenanceNodes"])
                 self.hadoop_namenode_metrics["NameNodeInfo"]["MaintenanceNodeCount"].add_metric([self.cluster, self.target], len(node_dict))
                 for node, info in node_dict.items():
                     label = [self.cluster, node, info["xferaddr"], self.target]
-                    items = ["underReplicatedBlocks", "maintenanceOnlyReplicas", "underReplicateInOpenFiles"]
-                    for item in items:
+                    for item, key in self.nninfo_items['EnteringMaintenanceNodes']:
                         value = info[item] if item in info else 0
-                        item = re.sub('([a-z0-9])([A-Z])', r'\1_\2', item).lower()
-                        key = "EnteringMaintenanceNodes-" + item
                         self.hadoop_namenode_metrics["NameNodeInfo"][key].add_metric(label, value)
             elif "CorruptFiles" in metric and "CorruptFiles" in bean:
-                file_list = yaml.safe_load(bean["CorruptFiles"])
                 label = [self.cluster, self.target]
-                self.hadoop_namenode_metrics["NameNodeInfo"]["CorruptFiles"].add_metric(label, len(file_list))
+                self.hadoop_namenode_metrics["NameNodeInfo"]["CorruptFiles"].add_metric(label, count_embedded(bean["CorruptFiles"]))
             elif "NodeUsage" in metric and "NodeUsage" in bean:
-                node_usage_dict = yaml.safe_load(bean["NodeUsage"])["nodeUsage"]
+                node_usage_dict = load_embedded(bean["NodeUsage"])["nodeUsage"]
                 label = [self.cluster, self.target]
-                items = ["min", "median", "max", "stdDev"]
-                for item in items:
+                for item, key in self.nninfo_items['NodeUsage']:
                     value = node_usage_dict[item] if item in node_usage_dict else 0
                     value = float(value.strip("%"))
-                    item = re.sub('([a-z0-9])([A-Z])', r'\1_\2', item).lower()
-                    key = "NodeUsage-" + item
                     self.hadoop_namenode_metrics["NameNodeInfo"][key].add_metric(label, value)
             elif "SoftwareVersion" in metric and "SoftwareVersion" in bean:
                 label = [self.cluster, bean["SoftwareVersion"], self.target]
@@ -464,15 +484,9 @@ class NameNodeMetricCollector(MetricCollector):
 
     def get_metrics(self, beans):
         for i in range(len(beans)):
-            if 'NameNodeActivity' in beans[i]['name']:
-                self.get_nnactivity_metrics(beans[i])
-            if 'StartupProgress' in beans[i]['name']:
-                self.get_startupprogress_metrics(beans[i])
-            if 'FSNamesystem' in beans[i]['name'] and 'FSNamesystemState' not in beans[i]['name']:
-                self.get_fsnamesystem_metrics(beans[i])
-            if 'FSNamesystemState' in beans[i]['name']:
-                self.get_fsnamesystem_state_metrics(beans[i])
-            if 'RetryCache' in beans[i]['name']:
-                self.get_retrycache_metrics(beans[i])
-            if 'NameNodeInfo' in beans[i]['name']:
+            service = self.router.route(beans[i]['name'])
+            if service in self.plans:
+                map_bean(beans[i], self.hadoop_namenode_metrics[service], partial(self.get_plan_metrics, service))
+            elif service == 'NameNodeInfo':
+                # not replayed from the bean cache, it also updates the DataNodes to scrape
                 self.get_nninfo_metrics(beans[i])
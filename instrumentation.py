@@ -0,0 +1,168 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+from utils import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+FETCH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COLLECT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Targets not scraped for this long, such as removed DataNodes, are not exported any more.
+TARGET_TTL = 600
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+    def add_to(self, family, label):
+        buckets, count = [], 0
+        for bound, n in zip([str(b) for b in self.buckets] + ["+Inf"], self.counts):
+            count += n
+            buckets.append((bound, count))
+        family.add_metric(label, buckets, self.sum)
+
+
+class TargetStats(object):
+    __slots__ = ('up', 'duration', 'bytes', 'beans', 'answered_at', 'late', 'timestamp')
+
+    def __init__(self, up, duration, bytes, beans, answered_at, late):
+        self.up = up
+        self.duration = duration
+        self.bytes = bytes
+        self.beans = beans
+        self.answered_at = answered_at
+        self.late = late
+        self.timestamp = time.time()
+
+
+class ScrapeStats(object):
+    """Self metrics of the exporter: how each target, request and collector cycle went."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.targets = {}
+        self.fetch = {}
+        self.response_bytes = {}
+        self.requests = {}
+        self.failures = {}
+        self.decode_seconds = {}
+        self.cycles = {}
+        self.collect_failures = {}
+        self.map_seconds = {}
+
+    def observe_request(self, service, ok, duration, nbytes, decode_seconds):
+        with self.lock:
+            if service not in self.fetch:
+                self.fetch[service] = Histogram(FETCH_BUCKETS)
+            self.fetch[service].observe(duration)
+            self.requests[service] = self.requests.get(service, 0) + 1
+            if not ok:
+                self.failures[service] = self.failures.get(service, 0) + 1
+            self.response_bytes[service] = self.response_bytes.get(service, 0) + nbytes
+            self.decode_seconds[service] = self.decode_seconds.get(service, 0.0) + decode_seconds
+
+    def observe_target(self, service, url, duration, nbytes, beans, answered_at=None, late=False):
+        """`answered_at` is when the target last answered in time, `late` whether it missed the deadline."""
+        with self.lock:
+            up = 1 if beans > 0 and not late else 0
+            self.targets[(service, url)] = TargetStats(up, duration, nbytes, beans, answered_at, 1 if late else 0)
+
+    def start_cycle(self):
+        self.local.fetch_seconds = 0.0
+
+    def observe_fetch(self, seconds):
+        """Wall time spent waiting on jmx requests by the collector cycle of this thread."""
+        if getattr(self.local, "fetch_seconds", None) is not None:
+            self.local.fetch_seconds += seconds
+
+    def end_cycle(self, collector, duration, ok):
+        fetch_seconds = getattr(self.local, "fetch_seconds", None) or 0.0
+        self.local.fetch_seconds = None
+        with self.lock:
+            if collector not in self.cycles:
+                self.cycles[collector] = Histogram(COLLECT_BUCKETS)
+                self.collect_failures[collector] = 0
+            self.cycles[collector].observe(duration)
+            if not ok:
+                self.collect_failures[collector] += 1
+            self.map_seconds[collector] = max(duration - fetch_seconds, 0.0)
+
+    def collect_targets(self):
+        """The stats of each target, rendered by the scheduler after each collector cycle."""
+        now = time.time()
+        label = ["service", "target"]
+        up = GaugeMetricFamily("hadoop_exporter_target_up", "Whether the last scrape of the target returned beans", labels=label)
+        duration = GaugeMetricFamily("hadoop_exporter_target_fetch_duration_seconds", "Time spent on the jmx requests of the last scrape of the target", labels=label)
+        nbytes = GaugeMetricFamily("hadoop_exporter_target_response_bytes", "Size of the jmx responses of the last scrape of the target", labels=label)
+        beans = GaugeMetricFamily("hadoop_exporter_target_beans", "Number of beans returned by the last scrape of the target", labels=label)
+        age = GaugeMetricFamily("hadoop_exporter_target_sample_age_seconds", "Time since the target last answered by the deadline, as of the end of the last collector cycle", labels=label)
+        late = GaugeMetricFamily("hadoop_exporter_target_late", "Whether the last scrape of the target missed the deadline of the collector cycle", labels=label)
+        with self.lock:
+            for key in list(self.targets):
+                stats = self.targets[key]
+                if now - stats.timestamp > TARGET_TTL:
+                    del self.targets[key]
+                    continue
+                label = list(key)
+                up.add_metric(label, stats.up)
+                duration.add_metric(label, stats.duration)
+                nbytes.add_metric(label, stats.bytes)
+                beans.add_metric(label, stats.beans)
+                late.add_metric(label, stats.late)
+                if stats.answered_at is not None:
+                    age.add_metric(label, max(now - stats.answered_at, 0.0))
+        return [up, duration, nbytes, beans, age, late]
+
+    def collect(self):
+        metrics = []
+        with self.lock:
+            fetch = HistogramMetricFamily("hadoop_exporter_fetch_duration_seconds", "Duration of jmx requests", labels=["service"])
+            requests = CounterMetricFamily("hadoop_exporter_requests", "Number of jmx requests", labels=["service"])
+            failures = CounterMetricFamily("hadoop_exporter_request_failures", "Number of jmx requests which failed or returned no beans", labels=["service"])
+            nbytes = CounterMetricFamily("hadoop_exporter_response_bytes", "Size of jmx responses", labels=["service"])
+            decode = CounterMetricFamily("hadoop_exporter_decode_seconds", "Time spent reading and decoding jmx responses", labels=["service"])
+            for service in sorted(self.fetch):
+                self.fetch[service].add_to(fetch, [service])
+                requests.add_metric([service], self.requests.get(service, 0))
+                failures.add_metric([service], self.failures.get(service, 0))
+                nbytes.add_metric([service], self.response_bytes.get(service, 0))
+                decode.add_metric([service], self.decode_seconds.get(service, 0.0))
+            metrics.extend([fetch, requests, failures, nbytes, decode])
+            collect = HistogramMetricFamily("hadoop_exporter_collect_duration_seconds", "Duration of collector cycles, fetch and mapping included", labels=["collector"])
+            collect_failures = CounterMetricFamily("hadoop_exporter_collect_failures", "Number of collector cycles which failed or got no metrics", labels=["collector"])
+            map_seconds = GaugeMetricFamily("hadoop_exporter_map_duration_seconds", "Time the last collector cycle spent out of jmx requests, mostly mapping beans to metrics", labels=["collector"])
+            for collector in sorted(self.cycles):
+                self.cycles[collector].add_to(collect, [collector])
+                collect_failures.add_metric([collector], self.collect_failures[collector])
+                map_seconds.add_metric([collector], self.map_seconds[collector])
+            metrics.extend([collect, collect_failures, map_seconds])
+        threads = GaugeMetricFamily("hadoop_exporter_threads", "Number of threads of the exporter")
+        threads.add_metric([], threading.active_count())
+        metrics.append(threads)
+        return metrics
+
+
+_stats = ScrapeStats()
+
+
+def stats():
+    return _stats
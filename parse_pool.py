@@ -0,0 +1,107 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import signal
+import marshal
+import threading
+import multiprocessing
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from utils import get_module_logger
+from fetch_plan import BeanPattern
+import decoder
+
+
+logger = get_module_logger(__name__)
+
+_wanted = {}
+
+
+def _init_worker(json_decoder):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    decoder.configure(json_decoder)
+
+
+def wanted_by(queries):
+    """The `wants` of a FetchPlan with these queries, rebuilt once per worker process."""
+    if queries not in _wanted:
+        patterns = [BeanPattern(query) for query in queries]
+        names = {}
+
+        def wanted(name):
+            if name not in names:
+                names[name] = any(pattern.match(name) for pattern in patterns)
+            return names[name]
+        _wanted[queries] = wanted
+    return _wanted[queries]
+
+
+def parse_document(body, queries=None):
+    """
+    Decode the beans of a jmx document, only the ones matched by `queries` if
+    given, and the JSON documents embedded in their attributes. The beans are
+    sent back marshalled, which loads faster than a pickle in the main process.
+    """
+    wanted = wanted_by(queries) if queries is not None else None
+    return marshal.dumps(decoder.decode_embedded(decoder.load_beans(body, wanted)))
+
+
+class ParsePool(object):
+    """
+    Worker processes decoding the jmx documents, so that decoding big documents
+    such as a NameNode with thousands of DataNodes does not hold the GIL of the
+    process which scrapes and maps.
+    """
+    def __init__(self, workers, json_decoder):
+        self.workers = workers
+        self.pool = multiprocessing.Pool(workers, _init_worker, (json_decoder,))
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.documents = 0
+        self.failures = 0
+
+    def parse(self, body, queries=None, timeout=None):
+        """The beans of the document, waiting at most `timeout` seconds for a worker to parse it."""
+        with self.lock:
+            self.in_flight += 1
+        try:
+            beans = marshal.loads(self.pool.apply_async(parse_document, (body, queries)).get(timeout))
+        except Exception:
+            with self.lock:
+                self.failures += 1
+            raise
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.documents += 1
+        return beans
+
+    def collect(self):
+        workers = GaugeMetricFamily("hadoop_exporter_parse_workers", "Number of jmx document parsing processes")
+        workers.add_metric([], self.workers)
+        yield workers
+        in_flight = GaugeMetricFamily("hadoop_exporter_parse_in_flight", "Number of jmx documents being parsed")
+        in_flight.add_metric([], self.in_flight)
+        yield in_flight
+        documents = CounterMetricFamily("hadoop_exporter_parse_documents", "Number of jmx documents sent to the parsing processes")
+        documents.add_metric([], self.documents)
+        yield documents
+        failures = CounterMetricFamily("hadoop_exporter_parse_failures", "Number of jmx documents the parsing processes failed on")
+        failures.add_metric([], self.failures)
+        yield failures
+
+
+_pool = None
+
+
+def configure(workers, json_decoder):
+    """Start `workers` parsing processes, 0 parses in the scraping threads. Call it before starting any thread."""
+    global _pool
+    _pool = ParsePool(workers, json_decoder) if workers > 0 else None
+    if _pool is not None:
+        logger.info("Parse jmx documents in {0} processes.".format(workers))
+
+
+def parse_pool():
+    return _pool
@@ -0,0 +1,185 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import re
+import copy
+import fnmatch
+import hashlib
+import threading
+from collections import OrderedDict
+
+from prometheus_client.core import GaugeMetricFamily
+
+from utils import get_module_logger, read_config_file
+from sample_store import CompactGaugeFamily, sample_count
+import sharding
+
+
+logger = get_module_logger(__name__)
+
+FUNCTIONS = {
+    "sum": sum,
+    "mean": lambda values: sum(values) / len(values),
+    "min": min,
+    "max": max,
+    "count": len,
+}
+
+# Rack of the hosts the ResourceManager does not know.
+DEFAULT_RACK = "/default-rack"
+
+# Labels naming the host a sample comes from.
+HOST_LABELS = ("_target", "target", "host")
+
+
+def host_of(labels):
+    for name in HOST_LABELS:
+        if name in labels:
+            return labels[name]
+    return None
+
+
+class RollupRule(object):
+    """
+    Aggregate the samples of the metric families whose name matches `families`
+    over the hosts, dropping the labels in `without`. Each function gives a family
+    named cluster:<family>:<function>, or rack:<family>:<function> with a `rack`
+    label when `rack` is set, and a `shard` label when the hosts are sharded. The per-host series are kept, dropped when
+    `per_host` is False, or kept for one host in `sample` only.
+    """
+    def __init__(self, families, functions=("sum",), without=HOST_LABELS, rack=False, per_host=True, sample=1):
+        for function in functions:
+            if function not in FUNCTIONS:
+                raise ValueError("unknown rollup function {0}".format(function))
+        self.families = re.compile(fnmatch.translate(families))
+        self.functions = list(functions)
+        self.without = set(without)
+        self.rack = rack
+        self.per_host = per_host
+        self.sample = max(sample, 1)
+        self.sampled = {}
+
+    def matches(self, name):
+        return self.families.match(name) is not None
+
+    def rollup(self, metric, racks, shard=None):
+        labelnames = [name for name in metric_labelnames(metric) if name not in self.without]
+        if self.rack:
+            labelnames.append("rack")
+        if shard is not None:
+            # each replica only aggregates its own hosts
+            labelnames.append("shard")
+        groups = OrderedDict()
+        for sample in metric.samples:
+            labels = [sample.labels.get(name, "") for name in labelnames if name not in ("rack", "shard")]
+            if self.rack:
+                labels.append(racks.get(host_of(sample.labels), DEFAULT_RACK))
+            if shard is not None:
+                labels.append(shard)
+            groups.setdefault(tuple(labels), []).append(sample.value)
+        level = "rack" if self.rack else "cluster"
+        result = []
+        for function in self.functions:
+            family = CompactGaugeFamily(":".join([level, metric.name, function]), "{0} of {1}".format(function, metric.documentation), labels=labelnames)
+            for labels, values in groups.items():
+                family.add_metric(list(labels), FUNCTIONS[function](values))
+            result.append(family)
+        return result
+
+    def keeps(self, host):
+        """Whether the per-host series of `host` are kept."""
+        if not self.per_host:
+            return False
+        if self.sample == 1 or host is None:
+            return True
+        if host not in self.sampled:
+            self.sampled[host] = int(hashlib.md5(host).hexdigest()[:8], 16) % self.sample == 0
+        return self.sampled[host]
+
+    def per_host_series(self, metric):
+        if self.per_host and self.sample == 1:
+            return metric
+        kept = copy.copy(metric)
+        kept.samples = [sample for sample in metric.samples if self.keeps(host_of(sample.labels))]
+        return kept
+
+
+def metric_labelnames(metric):
+    if isinstance(metric, CompactGaugeFamily):
+        return list(metric.labelnames)
+    names = []
+    for sample in metric.samples:
+        for name in sample.labels:
+            if name not in names:
+                names.append(name)
+    return names
+
+
+class Rollups(object):
+    """Add the rollups of the rules to the metric families of each snapshot."""
+    def __init__(self, rules):
+        self.rules = rules
+        self.racks = dict
+        self.lock = threading.Lock()
+        self.dropped = {}
+
+    def apply(self, collector, metrics):
+        racks = self.racks()
+        shard = sharding.shard_label()
+        result, rollups, dropped = [], [], {}
+        for metric in metrics:
+            kept = metric
+            for rule in self.rules:
+                if rule.matches(metric.name):
+                    rollups.extend(rule.rollup(metric, racks, shard))
+                    kept = rule.per_host_series(kept)
+            if kept is not metric and sample_count(kept) < sample_count(metric):
+                dropped[metric.name] = sample_count(metric) - sample_count(kept)
+            if kept is metric or sample_count(kept) > 0:
+                result.append(kept)
+        with self.lock:
+            self.dropped[collector] = dropped
+        return tuple(result + rollups)
+
+    def collect(self):
+        dropped = GaugeMetricFamily("hadoop_exporter_rollup_dropped_series", "Number of per-host series left out of the current snapshot by the rollup rules", labels=["collector", "family"])
+        with self.lock:
+            for collector in sorted(self.dropped):
+                for family, count in sorted(self.dropped[collector].items()):
+                    dropped.add_metric([collector, family], count)
+        yield dropped
+
+
+def load_rules(config):
+    rules = []
+    for rule in (config or {}).get("rollups", []):
+        rules.append(RollupRule(**rule))
+    return rules
+
+
+_rollups = None
+
+
+def configure(path):
+    """Load the rollup rules of a YAML config file, None disables the rollups."""
+    global _rollups
+    _rollups = None
+    if path is not None:
+        _rollups = Rollups(load_rules(read_config_file(path)))
+        logger.info("Load {0} rollup rules from {1}.".format(len(_rollups.rules), path))
+
+
+def rollups():
+    return _rollups
+
+
+def set_racks(racks):
+    """`racks()` returns the rack of each host, for the rules with `rack`."""
+    if _rollups is not None:
+        _rollups.racks = racks
+
+
+def apply(collector, metrics):
+    if _rollups is None:
+        return metrics
+    return _rollups.apply(collector, metrics)
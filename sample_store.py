@@ -0,0 +1,115 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import threading
+from array import array
+
+from prometheus_client.core import Metric, Sample
+
+
+class LabelTable(object):
+    """Label values interned once for the families of a refresh, a sample keeps their indexes."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = {}
+        self.values = []
+
+    def intern(self, value):
+        i = self.ids.get(value)
+        if i is None:
+            with self.lock:
+                i = self.ids.get(value)
+                if i is None:
+                    i = len(self.values)
+                    self.values.append(value)
+                    self.ids[value] = i
+        return i
+
+
+_current = threading.local()
+
+
+def use_label_table(table):
+    """
+    Intern the label values of the families created by this thread in `table`,
+    None gives each new family its own table. A refresh uses a table of its own,
+    so the label values which are gone are dropped with the previous snapshot.
+    """
+    _current.table = table
+
+
+class CompactGaugeFamily(Metric):
+    """
+    A GaugeMetricFamily keeping the label value indexes of its samples in one
+    array and their values in another, instead of a Sample with a label dict per
+    sample. The samples are only built when the family is rendered.
+    """
+    def __init__(self, name, documentation, labels=None):
+        self.table = getattr(_current, "table", None) or LabelTable()
+        self.keys = array('L')
+        self.values = array('d')
+        Metric.__init__(self, name, documentation, 'gauge')
+        self.labelnames = tuple(labels or [])
+
+    def add_metric(self, labels, value, timestamp=None):
+        if len(labels) != len(self.labelnames):
+            # the flat keys array would shift the labels of every later sample
+            raise ValueError("{0} has {1} label names, got {2} label values".format(self.name, len(self.labelnames), len(labels)))
+        intern = self.table.intern
+        self.keys.extend([intern(label) for label in labels])
+        self.values.append(float(value))
+
+    def count(self):
+        return len(self.values)
+
+    def tail(self, start):
+        """The samples added since there were `start`, for replay()."""
+        width = len(self.labelnames)
+        return self.table, self.keys[start * width:], self.values[start:]
+
+    def replay(self, tail):
+        """Add the samples of a tail, and return them as a tail of this family."""
+        table, keys, values = tail
+        if table is not self.table:
+            intern, label_values = self.table.intern, table.values
+            keys = array('L', [intern(label_values[k]) for k in keys])
+        self.keys.extend(keys)
+        self.values.extend(values)
+        return self.table, keys, values
+
+    @property
+    def samples(self):
+        names, width = self.labelnames, len(self.labelnames)
+        keys, label_values = self.keys, self.table.values
+        samples = []
+        for i, value in enumerate(self.values):
+            labels = dict(zip(names, [label_values[k] for k in keys[i * width:(i + 1) * width]]))
+            samples.append(Sample(self.name, labels, value, None, None))
+        return samples
+
+    @samples.setter
+    def samples(self, samples):
+        self.keys = array('L')
+        self.values = array('d')
+        for sample in samples:
+            self.add_metric([sample.labels[name] for name in self.labelnames], sample.value)
+
+
+def sample_count(family):
+    if isinstance(family, CompactGaugeFamily):
+        return family.count()
+    return len(family.samples)
+
+
+def samples_since(family, start):
+    if isinstance(family, CompactGaugeFamily):
+        return family.tail(start)
+    return family.samples[start:]
+
+
+def replay_samples(family, samples):
+    """Add the samples of samples_since() to the family, return them as the family keeps them."""
+    if isinstance(family, CompactGaugeFamily):
+        return family.replay(samples)
+    family.samples.extend(samples)
+    return samples
@@ -0,0 +1,170 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from collections import namedtuple
+
+from prometheus_client.core import GaugeMetricFamily
+
+from utils import get_module_logger
+import instrumentation
+import scraper
+import cardinality
+import rollup
+import sample_store
+from sample_store import LabelTable
+from exposition import RenderedMetrics
+
+
+logger = get_module_logger(__name__)
+
+# Until its first successful refresh, a collector whose refresh failed, such as a
+# DataNode collector started before the NameNode listed its DataNodes, tries again
+# after FIRST_RETRY seconds, doubled up to its interval. A snapshot restored from
+# -state-file does not count, it is only served until then.
+FIRST_RETRY = 1.0
+
+
+class Snapshot(namedtuple('Snapshot', ['metrics', 'timestamp', 'duration'])):
+    """Immutable result of one successful collector refresh."""
+    __slots__ = ()
+
+    @property
+    def age(self):
+        return max(time.time() - self.timestamp, 0.0)
+
+
+class ScheduledCollector(threading.Thread):
+    """
+    Refresh a collector in the background every `interval` seconds and keep the
+    last good snapshot, so that a prometheus pull never waits on jmx fetches.
+    The text exposition of each snapshot is rendered once, in this thread.
+    With a `deadline`, the scrapes of a refresh end that many seconds after it
+    started and the snapshot is built from the targets which answered.
+    `on_cycle` is called after each refresh, whether it succeeded or not.
+    """
+    def __init__(self, name, collector, interval, deadline=0, on_cycle=None):
+        super(ScheduledCollector, self).__init__()
+        self.name = "scheduler-%s" % name
+        self.daemon = True
+        self.collector_name = name
+        self.collector = collector
+        self.interval = interval
+        self.deadline = deadline
+        self.on_cycle = on_cycle
+        self.refreshed = False
+        self.snapshot = None
+        self.rendered = None
+        self._stopped = threading.Event()
+
+    def refresh(self):
+        start = time.time()
+        stats = instrumentation.stats()
+        stats.start_cycle()
+        scraper.set_deadline(start + self.deadline if self.deadline > 0 else None)
+        sample_store.use_label_table(LabelTable())
+        try:
+            metrics = tuple(self.collector.collect())
+        except Exception as e:
+            stats.end_cycle(self.collector_name, time.time() - start, False)
+            logger.warning("Refresh {0} failed, error: {1}.".format(self.collector_name, str(e)))
+            return False
+        stats.end_cycle(self.collector_name, time.time() - start, len(metrics) > 0)
+        if len(metrics) == 0:
+            logger.warning("Refresh {0} got no metrics, keep the last snapshot.".format(self.collector_name))
+            return False
+        metrics = rollup.apply(self.collector_name, metrics)
+        metrics = cardinality.limit(self.collector_name, metrics)
+        rendered = RenderedMetrics(metrics)
+        rendered.get("text", False)
+        rendered.get("text", True)
+        self.snapshot = Snapshot(metrics, start, time.time() - start)
+        self.rendered = rendered
+        self.refreshed = True
+        return True
+
+    def restore(self, timestamp, duration, gzipped_text):
+        """Serve a snapshot saved by an earlier run until the first refresh."""
+        if self.snapshot is None:
+            self.rendered = RenderedMetrics.restore(gzipped_text)
+            self.snapshot = Snapshot((), timestamp, duration)
+
+    def run(self):
+        retry = FIRST_RETRY
+        while not self._stopped.is_set():
+            start = time.time()
+            wait = self.interval
+            if not self.refresh() and not self.refreshed:
+                wait = min(retry, self.interval)
+                retry *= 2
+            if self.on_cycle is not None:
+                self.on_cycle()
+            self._stopped.wait(max(wait - (time.time() - start), 0))
+
+    def stop(self):
+        self._stopped.set()
+
+    def collect(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            return
+        for metric in snapshot.metrics:
+            yield metric
+
+
+class Scheduler(object):
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.collectors = []
+        self.exported_collectors = []
+        self.render_lock = threading.Lock()
+        # rendering of the per target stats as of the last collector cycle
+        self.targets = None
+
+    def add(self, name, collector, interval, export=True, deadline=0):
+        """Schedule `collector`, its snapshots are served on /metrics unless `export` is False."""
+        scheduled = ScheduledCollector(name, collector, interval, deadline, self.render_targets)
+        self.collectors.append(scheduled)
+        if export:
+            self.exported_collectors.append(scheduled)
+        return scheduled
+
+    def exported(self):
+        return list(self.exported_collectors)
+
+    def render_targets(self):
+        """
+        Render the stats of every target once per collector cycle, they only change
+        when a collector scrapes and are too many to render on each /metrics request.
+        """
+        with self.render_lock:
+            rendered = RenderedMetrics(instrumentation.stats().collect_targets())
+            rendered.get("text", False)
+            rendered.get("text", True)
+            self.targets = rendered
+
+    def start(self):
+        for scheduled in self.collectors:
+            scheduled.start()
+
+    def stop(self):
+        for scheduled in self.collectors:
+            scheduled.stop()
+
+    def collect(self):
+        label = ["cluster", "collector"]
+        timestamp = GaugeMetricFamily("hadoop_exporter_snapshot_timestamp_seconds", "Unix time the current snapshot was fetched at", labels=label)
+        age = GaugeMetricFamily("hadoop_exporter_snapshot_age_seconds", "Age of the current snapshot in seconds", labels=label)
+        duration = GaugeMetricFamily("hadoop_exporter_snapshot_duration_seconds", "Time spent building the current snapshot in seconds", labels=label)
+        for scheduled in self.collectors:
+            snapshot = scheduled.snapshot
+            if snapshot is None:
+                continue
+            label = [self.cluster, scheduled.collector_name]
+            timestamp.add_metric(label, snapshot.timestamp)
+            age.add_metric(label, snapshot.age)
+            duration.add_metric(label, snapshot.duration)
+        yield timestamp
+        yield age
+        yield duration
@@ -1,52 +1,741 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8 -*-
 
+import time
+import random
+import hashlib
 import threading
+import Queue
+import collections
+from urlparse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 
 from utils import get_module_logger
+from fetch_plan import merge_beans
+import decoder
+import bean_cache
+import parse_pool
+import instrumentation
 
 
 logger = get_module_logger(__name__)
 
+CHUNK_SIZE = 64 * 1024
 
-class Scraper(threading.Thread):
-    def __init__(self, url, result):
-        super(Scraper, self).__init__()
-        self.name = "thread-%s" % url
+# A rolling scrape wakes up every ROLLING_TICK seconds, give or take ROLLING_JITTER.
+ROLLING_TICK = 1.0
+ROLLING_JITTER = 0.2
+
+# An open circuit breaker waits at most BREAKER_MAX_BACKOFF seconds before probing its target again.
+BREAKER_MAX_BACKOFF = 600
+# Only the DataNodes and NodeManagers have circuit breakers, a NameNode or ResourceManager
+# which fails for a while must not be left out of the export.
+BREAKER_SERVICES = ("datanode", "nodemanager")
+
+# At most HEDGE_RATIO of the requests of one scrape are hedged.
+HEDGE_RATIO = 0.1
+
+# Number of error kinds listed by the summary of the failed targets of a scrape.
+TOP_ERRORS = 3
+
+# What stands in for a target which misses the deadline of a collector cycle: its
+# last beans, its last beans with NaN values, or nothing.
+LATE_POLICIES = ("reuse", "stale", "drop")
+# The last beans of a target stand in for it at most LATE_MAX_AGE seconds.
+LATE_MAX_AGE = 600
+
+
+class ScrapeTarget(object):
+    """Shared by the requests of one target, the remaining ones are skipped once the host is unreachable."""
+    def __init__(self, url, deadline=None):
+        self.url = url
+        self.deadline = deadline
+        self.failed = False
+        self.late = False
+
+
+class Hedge(object):
+    """
+    A request and its hedged copy. The outcome of the first copy to answer is
+    kept, a failure only once no other copy is left to answer.
+    """
+    def __init__(self, task):
+        self.lock = threading.Lock()
+        self.task = task
+        self.answered = False
+        self.settled = False
+        self.running = 1
+
+    def publish(self, task, ok, answered, ended, duration):
+        """Record the outcome of a finished copy on the request, return whether it was kept."""
+        with self.lock:
+            if self.answered or (not answered and self.running > 1):
+                return False
+            self.answered = answered
+            if answered and task is not self.task:
+                _pool.hedge_wins += 1
+            self.task.ok = ok
+            self.task.error = task.failure
+            self.task.bytes = task.received
+            self.task.ended = ended
+            self.task.duration = duration
+            return True
+
+
+class Scraper(object):
+    def __init__(self, url, result, target=None, query_url=None, plan=None, service="-"):
+        self.name = "task-%s" % url
         self.url = url
         self.result = result
+        self.target = target
+        self.query_url = query_url
+        self.plan = plan
+        self.service = service
+        self.duration = 0.0
+        self.bytes = 0
+        self.ok = False
+        self.started = False
+        self.ended = 0.0
+        self.error = None
+        # what this copy got, published by its hedge
+        self.failure = None
+        self.received = 0
+        self.hedge = Hedge(self)
+
+    def hedged(self):
+        """A copy of this request, sent when it takes too long."""
+        task = Scraper(self.url, self.result, self.target, self.query_url, self.plan, self.service)
+        task.hedge = self.hedge
+        with self.hedge.lock:
+            self.hedge.running += 1
+        return task
+
+    def abandoned(self):
+        """Its host is unreachable or it missed the deadline, the request is not sent."""
+        return self.target is not None and (self.target.failed or self.target.late)
+
+    def timeout(self):
+        """Seconds left for the request, -request-timeout bounded by the deadline of the collector cycle."""
+        deadline = self.target.deadline if self.target is not None else None
+        if deadline is None:
+            return _request_timeout
+        return max(min(_request_timeout, deadline - time.time()), 0.001)
+
+    def fail(self, kind, message):
+        """Keep the error of the request, the failed targets of a scrape are logged together."""
+        self.failure = (kind, message)
+        logger.debug(message)
+
+    def count_bytes(self, chunks):
+        for chunk in chunks:
+            self.received += len(chunk)
+            yield chunk
 
     def run(self):
         result = []
+        if self.abandoned():
+            return
+        start = time.time()
+        ok = False
+        unreachable = False
+        decode_seconds = 0.0
         try:
-            s = requests.session()
-            response = s.get(self.url, timeout=5)
+            s = _connections.session(self.url)
+            response = s.get(self.query_url or self.url, timeout=self.timeout(), stream=True)
         except Exception as e:
-            logger.warning("Get {0} failed, error: {1}.".format(self.url, str(e)))
+            unreachable = True
+            self.fail(type(e).__name__, "Get {0} failed, error: {1}.".format(self.query_url or self.url, str(e)))
         else:
             if response.status_code != requests.codes.ok:
-                logger.warning("Get {0} failed, response code is: {1}.".format(self.url, response.status_code))
+                self.fail("HTTP {0}".format(response.status_code),
+                          "Get {0} failed, response code is: {1}.".format(self.query_url or self.url, response.status_code))
+                response.close()
             else:
-                rlt = response.json()
-                if rlt and "beans" in rlt:
-                    result = rlt['beans']
-                else:
-                    logger.warning("No metrics get in the {0}.".format(self.url))
-            s.close()
+                decode_start = time.time()
+                try:
+                    # a full jmx document carries counters which change at each scrape, it would never hit
+                    cache = bean_cache.bean_cache() if self.query_url is not None else None
+                    pool = parse_pool.parse_pool()
+                    # a full jmx document, only the beans in use are kept
+                    wanted = self.plan.wants if self.plan is not None and self.query_url is None else None
+                    if pool is None and cache is None and wanted is not None and streamed(response):
+                        # too big to be held whole, decode it bean by bean
+                        result = list(decoder.iter_beans(self.count_bytes(response.iter_content(CHUNK_SIZE)), wanted))
+                    else:
+                        content = response.content
+                        self.received = len(content)
+                        cached = None
+                        if cache is not None:
+                            # a document which did not change is neither decoded nor mapped again
+                            cached, fingerprint = cache.lookup(self.query_url or self.url, content)
+                        if cached is not None:
+                            result = cached
+                        elif pool is not None:
+                            # decode in a worker process
+                            queries = tuple(self.plan.queries) if wanted is not None else None
+                            result = pool.parse(content, queries, self.timeout())
+                        else:
+                            result = decoder.load_beans(content, wanted)
+                        if cache is not None and cached is None:
+                            cache.store(self.query_url or self.url, fingerprint, result)
+                    ok = True
+                except Exception as e:
+                    self.fail("decode " + type(e).__name__, "Decode {0} failed, error: {1}.".format(self.query_url or self.url, str(e)))
+                    response.close()
+                decode_seconds = time.time() - decode_start
+                if len(result) == 0 and self.query_url is None:
+                    self.fail("no beans", "No metrics get in the {0}.".format(self.url))
+        ended = time.time()
+        if self.hedge.publish(self, ok, len(result) > 0, ended, ended - start):
             if len(result) > 0:
                 self.result.append(result)
+            elif unreachable and self.target is not None:
+                # no copy is left to reach the host, its other requests are skipped
+                self.target.failed = True
+        instrumentation.stats().observe_request(self.service, ok, ended - start, self.received, decode_seconds)
+
+
+class ConnectionPool(object):
+    """
+    Keep-alive sessions shared across scrapes, one per host. Each session keeps up
+    to `pool_size` connections to its host, sessions not used for `idle_timeout`
+    seconds are closed.
+    """
+    def __init__(self, pool_size, idle_timeout):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.last_eviction = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _new_session(self):
+        s = requests.session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        return s
+
+    def _evict(self, now):
+        if now - self.last_eviction < min(self.idle_timeout, 60):
+            return
+        self.last_eviction = now
+        for host in list(self.sessions):
+            s, last_used = self.sessions[host]
+            if now - last_used > self.idle_timeout:
+                del self.sessions[host]
+                s.close()
+                self.evictions += 1
+
+    def session(self, url):
+        host = urlparse(url).netloc
+        now = time.time()
+        with self.lock:
+            self._evict(now)
+            if host in self.sessions:
+                s = self.sessions[host][0]
+                self.hits += 1
+            else:
+                s = self._new_session()
+                self.misses += 1
+            self.sessions[host] = (s, now)
+            return s
+
+    def collect(self):
+        hits = CounterMetricFamily("hadoop_exporter_connection_pool_hits", "Number of jmx requests that reused a pooled session")
+        hits.add_metric([], self.hits)
+        yield hits
+        misses = CounterMetricFamily("hadoop_exporter_connection_pool_misses", "Number of jmx requests that opened a new session")
+        misses.add_metric([], self.misses)
+        yield misses
+        evictions = CounterMetricFamily("hadoop_exporter_connection_pool_evictions", "Number of sessions closed after being idle")
+        evictions.add_metric([], self.evictions)
+        yield evictions
+        sessions = GaugeMetricFamily("hadoop_exporter_connection_pool_sessions", "Number of pooled sessions")
+        sessions.add_metric([], len(self.sessions))
+        yield sessions
+
+
+class ScrapePool(object):
+    """
+    A fixed number of worker threads shared by every ScrapeMetrics, so the number
+    of threads does not grow with the number of DataNodes and NodeManagers.
+    `concurrency` bounds the requests in flight, `host_concurrency` bounds the
+    requests in flight to one host: the tasks of a host at its limit wait in a
+    queue of the host, and the worker moves on to the next task.
+    """
+    def __init__(self, concurrency, host_concurrency):
+        self.concurrency = concurrency
+        self.host_concurrency = host_concurrency
+        self.tasks = Queue.Queue()
+        self.lock = threading.Lock()
+        self.host_running = {}
+        self.host_waiting = {}
+        self.workers = []
+        self.in_flight = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _start(self):
+        with self.lock:
+            if self.workers:
+                return
+            for i in range(self.concurrency):
+                worker = threading.Thread(target=self._work, name="scraper-%d" % i)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+    def _admit(self, host, task, done):
+        """Take a request slot of the host, or queue the task behind the requests in flight to it."""
+        with self.lock:
+            running = self.host_running.get(host, 0)
+            if running >= self.host_concurrency:
+                self.host_waiting.setdefault(host, collections.deque()).append((task, done))
+                return False
+            self.host_running[host] = running + 1
+            self.in_flight += 1
+            return True
+
+    def _next(self, host):
+        """Hand the slot of a finished request to the next task waiting for the host, or release it."""
+        with self.lock:
+            waiting = self.host_waiting.get(host)
+            if waiting:
+                item = waiting.popleft()
+                if not waiting:
+                    del self.host_waiting[host]
+                return item
+            self.host_running[host] -= 1
+            if self.host_running[host] == 0:
+                del self.host_running[host]
+            self.in_flight -= 1
+            return None, None
+
+    def _work(self):
+        while True:
+            task, done = self.tasks.get()
+            if task.abandoned():
+                # do not wait for the host of a late target
+                done(task)
+                continue
+            host = urlparse(task.url).netloc
+            if not self._admit(host, task, done):
+                continue
+            while task is not None:
+                if not task.abandoned():
+                    task.started = True
+                    try:
+                        task.run()
+                    except Exception as e:
+                        logger.warning("Scrape {0} failed, error: {1}.".format(task.url, str(e)))
+                done(task)
+                task, done = self._next(host)
+
+    def run(self, tasks, deadline=None):
+        """
+        Run the tasks and wait for them, or until the `deadline` unix time. With a
+        hedge delay, the requests still running after it are sent once more and
+        the first answer is kept. Return whether every task was settled.
+        """
+        if not tasks:
+            return True
+        self._start()
+        pending = [len(tasks)]
+        lock = threading.Lock()
+        finished = threading.Event()
+
+        def done(task):
+            hedge = task.hedge
+            with lock:
+                with hedge.lock:
+                    hedge.running -= 1
+                    last = hedge.running == 0
+                if hedge.settled or not (hedge.answered or last):
+                    return
+                hedge.settled = True
+                pending[0] -= 1
+                if pending[0] == 0:
+                    finished.set()
+
+        def wait(timeout=None):
+            if deadline is not None:
+                remaining = max(deadline - time.time(), 0)
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            return finished.wait(timeout)
+
+        for task in tasks:
+            self.tasks.put((task, done))
+        if _hedge_after > 0 and not wait(_hedge_after) and (deadline is None or time.time() < deadline):
+            with lock:
+                slow = [task for task in tasks if task.started and not task.hedge.settled]
+            for task in slow[:max(int(len(tasks) * HEDGE_RATIO), 1)]:
+                self.hedged += 1
+                self.tasks.put((task.hedged(), done))
+        return wait()
+
+    def collect(self):
+        workers = GaugeMetricFamily("hadoop_exporter_scrape_workers", "Number of scrape worker threads")
+        workers.add_metric([], len(self.workers))
+        yield workers
+        in_flight = GaugeMetricFamily("hadoop_exporter_scrape_in_flight", "Number of jmx requests in flight")
+        in_flight.add_metric([], self.in_flight)
+        yield in_flight
+        queued = GaugeMetricFamily("hadoop_exporter_scrape_queued_tasks", "Number of jmx requests waiting for a worker")
+        with self.lock:
+            waiting = sum(len(tasks) for tasks in self.host_waiting.values())
+        queued.add_metric([], self.tasks.qsize() + waiting)
+        yield queued
+        hedged = CounterMetricFamily("hadoop_exporter_hedged_requests", "Number of jmx requests sent again because the first one was slow")
+        hedged.add_metric([], self.hedged)
+        yield hedged
+        wins = CounterMetricFamily("hadoop_exporter_hedged_request_wins", "Number of hedged jmx requests which answered first")
+        wins.add_metric([], self.hedge_wins)
+        yield wins
+
+
+class CircuitBreaker(object):
+    __slots__ = ('failures', 'opened_at', 'backoff', 'probing', 'last_seen')
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = 0.0
+        self.backoff = 0.0
+        self.probing = False
+        self.last_seen = 0.0
+
+
+class CircuitBreakers(object):
+    """
+    A circuit breaker per DataNode or NodeManager. After `failures` failed scrapes in a row, the
+    target is skipped for `backoff` seconds. Then one scrape probes it (half open):
+    the breaker closes if the target answers, or opens again for twice as long,
+    up to BREAKER_MAX_BACKOFF seconds. Only the targets which failed are tracked.
+    """
+    def __init__(self, failures, backoff):
+        self.failures = failures
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.breakers = {}
+        self.skipped = 0
+
+    def allow(self, url, now):
+        if self.failures <= 0:
+            return True
+        with self.lock:
+            breaker = self.breakers.get(url)
+            if breaker is None:
+                return True
+            breaker.last_seen = now
+            if breaker.failures < self.failures:
+                return True
+            if breaker.probing or now < breaker.opened_at + breaker.backoff:
+                self.skipped += 1
+                return False
+            breaker.probing = True
+            return True
+
+    def record(self, url, ok, now):
+        if self.failures <= 0:
+            return
+        with self.lock:
+            breaker = self.breakers.get(url)
+            if ok:
+                if breaker is not None:
+                    del self.breakers[url]
+                    if breaker.failures >= self.failures:
+                        logger.info("Close the circuit breaker of {0}.".format(url))
+                return
+            if breaker is None:
+                breaker = self.breakers[url] = CircuitBreaker()
+            breaker.failures += 1
+            breaker.last_seen = now
+            if breaker.probing or breaker.failures == self.failures:
+                breaker.backoff = min(breaker.backoff * 2, BREAKER_MAX_BACKOFF) if breaker.probing else self.backoff
+                breaker.opened_at = now
+                breaker.probing = False
+                logger.info("Open the circuit breaker of {0} for {1} seconds.".format(url, breaker.backoff))
+
+    def release(self, url):
+        """Neither a success nor a failure, such as a target which missed the deadline: a probe may be sent again."""
+        if self.failures <= 0:
+            return
+        with self.lock:
+            breaker = self.breakers.get(url)
+            if breaker is not None:
+                breaker.probing = False
+
+    def collect(self):
+        now = time.time()
+        label = ["target"]
+        state = GaugeMetricFamily("hadoop_exporter_target_breaker_state", "Circuit breaker of each target which is not closed, 1: open, 2: half open", labels=label)
+        targets = GaugeMetricFamily("hadoop_exporter_breaker_targets", "Number of targets by circuit breaker state", labels=["state"])
+        counts = {"open": 0, "half_open": 0}
+        with self.lock:
+            for url in list(self.breakers):
+                breaker = self.breakers[url]
+                if now - breaker.last_seen > 2 * BREAKER_MAX_BACKOFF:
+                    # not scraped any more
+                    del self.breakers[url]
+                elif breaker.failures >= self.failures:
+                    half_open = breaker.probing or now >= breaker.opened_at + breaker.backoff
+                    state.add_metric([url], 2 if half_open else 1)
+                    counts["half_open" if half_open else "open"] += 1
+        for name in sorted(counts):
+            targets.add_metric([name], counts[name])
+        yield state
+        yield targets
+        skipped = CounterMetricFamily("hadoop_exporter_breaker_skipped_targets", "Number of target scrapes skipped because their circuit breaker is open")
+        skipped.add_metric([], self.skipped)
+        yield skipped
+
+
+class LatestAnswers(object):
+    """
+    When each target last answered in time and, within a collector cycle with a
+    deadline, its beans: they stand in for the target when it is late.
+    """
+    def __init__(self, policy):
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.answers = {}
+        self.last_pruning = time.time()
+
+    def answered(self, service, url, beans, now, keep):
+        with self.lock:
+            self.answers[(service, url)] = (now, beans if keep and self.policy != "drop" else None)
+            if now - self.last_pruning > 60:
+                self.last_pruning = now
+                for key in list(self.answers):
+                    if now - self.answers[key][0] > LATE_MAX_AGE:
+                        del self.answers[key]
+
+    def answered_at(self, service, url):
+        answer = self.answers.get((service, url))
+        return answer[0] if answer is not None else None
+
+    def stand_in(self, service, url, now):
+        """The beans exported for a late target, None when it is dropped."""
+        answer = self.answers.get((service, url))
+        if answer is None or answer[1] is None or now - answer[0] > LATE_MAX_AGE:
+            return None
+        if self.policy == "stale":
+            return stale_beans(answer[1])
+        return answer[1]
+
+
+def stale_beans(beans):
+    """Copy of the beans with NaN numbers, so the series of a late target stay but have no value."""
+    nan = float("nan")
+    return [dict((k, nan if isinstance(v, (int, long, float)) and not isinstance(v, bool) else v) for k, v in bean.items())
+            for bean in beans]
+
+
+_pool = ScrapePool(64, 2)
+_connections = ConnectionPool(4, 300)
+_breakers = CircuitBreakers(0, 0)
+_request_timeout = 5
+_hedge_after = 0
+_stream_above = 0
+_answers = LatestAnswers("reuse")
+_cycle = threading.local()
+
+
+def configure(concurrency, host_concurrency, pool_size, pool_idle_timeout, request_timeout=5,
+              breaker_failures=0, breaker_backoff=30, hedge_after=0, late_policy="reuse", stream_above=0):
+    global _pool, _connections, _breakers, _request_timeout, _hedge_after, _answers, _stream_above
+    _pool = ScrapePool(concurrency, host_concurrency)
+    _connections = ConnectionPool(pool_size, pool_idle_timeout)
+    _breakers = CircuitBreakers(breaker_failures, breaker_backoff)
+    _request_timeout = request_timeout
+    _hedge_after = hedge_after
+    _answers = LatestAnswers(late_policy)
+    _stream_above = stream_above
+
+
+def streamed(response):
+    """Whether a full jmx document is larger than -stream-above bytes or of unknown size, 0 never streams."""
+    if _stream_above <= 0:
+        return False
+    length = response.headers.get("Content-Length")
+    return length is None or not length.isdigit() or int(length) > _stream_above
+
+
+def set_deadline(deadline):
+    """Unix time the scrapes of the collector cycle of this thread end at, None waits for every target."""
+    _cycle.deadline = deadline
+
+
+def connection_pool():
+    return _connections
+
+
+def scrape_pool():
+    return _pool
+
+
+def circuit_breakers():
+    return _breakers
+
+
+def count_failure(failures, error):
+    kind, message = error
+    count = failures.get(kind, (0, None))[0]
+    failures[kind] = (count + 1, message)
+
+
+def log_failures(service, total, failures):
+    """One line for the failed targets of a scrape, such as every DataNode of a rack going down."""
+    top = sorted(failures.items(), key=lambda item: -item[1][0])
+    failed = sum(count for _, (count, _) in top)
+    errors = ", ".join("{0} ({1})".format(kind, count) for kind, (count, _) in top[:TOP_ERRORS])
+    logger.warning("{0} of {1} {2} targets failed this cycle, top errors: {3}. e.g. {4}".format(
+        failed, total, service, errors, top[0][1][1]), extra={"rate_key": "scrape-failures-" + service})
 
 
 class ScrapeMetrics(object):
-    def __init__(self, urls):
+    def __init__(self, urls, plan=None):
         self.urls = urls
+        self.plan = plan
+
+    def scrape_targets(self):
+        """
+        Return a (url, beans) pair for each target that answered. The targets which
+        did not answer by the deadline of the collector cycle are left behind and
+        handled by the late policy.
+        """
+        service = self.plan.service if self.plan is not None else "-"
+        stats = instrumentation.stats()
+        deadline = getattr(_cycle, "deadline", None)
+        breakers = _breakers if service in BREAKER_SERVICES else None
+        tasks, targets = [], []
+        now = time.time()
+        for url in self.urls:
+            if breakers is not None and not breakers.allow(url, now):
+                stats.observe_target(service, url, 0.0, 0, 0, _answers.answered_at(service, url))
+                continue
+            parts, target_tasks = [], []
+            target = ScrapeTarget(url, deadline)
+            if self.plan is None:
+                parts.append([])
+                target_tasks.append(Scraper(url, parts[0], target))
+            else:
+                for query_url in self.plan.urls(url):
+                    part = []
+                    parts.append(part)
+                    target_tasks.append(Scraper(url, part, target, query_url if query_url != url else None, self.plan, service))
+            tasks.extend(target_tasks)
+            targets.append((url, target, parts, target_tasks))
+        start = time.time()
+        _pool.run(tasks, deadline)
+        stats.observe_fetch(time.time() - start)
+        result = []
+        failures = {}
+        now = time.time()
+        for url, target, parts, target_tasks in targets:
+            # a request cut short by the deadline leaves its target late, not failed
+            if not all(task.hedge.settled for task in target_tasks) or \
+                    (deadline is not None and any(not task.ok and task.ended >= deadline for task in target_tasks)):
+                # its requests not sent yet are dropped, the running ones are not waited for
+                target.late = True
+                count_failure(failures, ("late", "{0} missed the deadline.".format(url)))
+                # lateness is not a failure of the target, a congested cycle must not open breakers
+                if breakers is not None:
+                    breakers.release(url)
+                beans = _answers.stand_in(service, url, now) or []
+                stats.observe_target(service, url, now - start, 0, len(beans), _answers.answered_at(service, url), True)
+                if len(beans) > 0:
+                    result.append((url, beans))
+                continue
+            ok = all(task.ok for task in target_tasks)
+            if breakers is not None:
+                breakers.record(url, ok, now)
+            # a partial answer would leave the metric families of the missing beans unset
+            beans = merge_beans(part[0] for part in parts if part) if ok else []
+            if len(beans) > 0:
+                _answers.answered(service, url, beans, now, deadline is not None)
+                result.append((url, beans))
+            else:
+                errors = [task.error for task in target_tasks if task.error is not None]
+                count_failure(failures, errors[0] if errors else ("no beans", "No metrics get in the {0}.".format(url)))
+            stats.observe_target(service, url, sum(task.duration for task in target_tasks), sum(task.bytes for task in target_tasks), len(beans),
+                                 _answers.answered_at(service, url))
+        if failures:
+            log_failures(service, len(targets), failures)
+        return result
 
     def scrape(self):
+        return [beans for _, beans in self.scrape_targets()]
+
+
+class RollingScrapeMetrics(threading.Thread):
+    """
+    Scrape each target once per `interval` at a fixed offset derived from its
+    host, instead of every target at the same instant. The ticks are jittered,
+    `scrape()` returns the latest beans of each target without waiting.
+    """
+    def __init__(self, name, interval, plan=None):
+        super(RollingScrapeMetrics, self).__init__()
+        self.name = "rolling-%s" % name
+        self.daemon = True
+        self.interval = interval
+        self.plan = plan
+        self.urls = set()
+        self.offsets = {}
+        self.latest = {}
+        self.lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def offset(self, url):
+        if url not in self.offsets:
+            host = urlparse(url).netloc
+            self.offsets[url] = int(hashlib.md5(host).hexdigest()[:8], 16) % 10000 / 10000.0 * self.interval
+        return self.offsets[url]
+
+    def due(self, start, end):
+        """Targets whose offset is in the [start, end) window of the cycle."""
+        urls = []
+        for url in self.urls:
+            offset = self.offset(url)
+            if start <= end and start <= offset < end:
+                urls.append(url)
+            elif start > end and (offset >= start or offset < end):
+                urls.append(url)
+        return urls
+
+    def run(self):
+        last = time.time()
+        while not self._stopped.is_set():
+            self._stopped.wait(ROLLING_TICK * random.uniform(1 - ROLLING_JITTER, 1 + ROLLING_JITTER))
+            now = time.time()
+            if now - last >= self.interval:
+                urls = list(self.urls)
+            else:
+                urls = self.due(last % self.interval, now % self.interval)
+            for url, beans in ScrapeMetrics(urls, self.plan).scrape_targets():
+                with self.lock:
+                    self.latest[url] = (now, beans)
+            last = now
+
+    def stop(self):
+        self._stopped.set()
+
+    def scrape(self, urls=None):
+        if urls is not None:
+            self.urls = set(urls)
+        now = time.time()
         result = []
-        tasks = [Scraper(url, result) for url in self.urls]
-        for task in tasks:
-            task.start()
-        for task in tasks:
-            task.join()
+        with self.lock:
+            for url in list(self.latest):
+                timestamp, beans = self.latest[url]
+                if url not in self.urls or now - timestamp > 2 * self.interval:
+                    # gone from the cluster or not answering any more
+                    del self.latest[url]
+                    self.offsets.pop(url, None)
+                    continue
+                result.append(beans)
         return result
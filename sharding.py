@@ -0,0 +1,87 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import bisect
+import hashlib
+from urlparse import urlparse
+
+from utils import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+# Points of each shard on the hash ring, more points spread the hosts more evenly.
+VIRTUAL_NODES = 160
+
+
+def _hash(key):
+    return int(hashlib.md5(key).hexdigest()[:16], 16)
+
+
+class HashRing(object):
+    """
+    Consistent hashing of hosts onto `shard_count` shards. A host always maps to
+    the same shard, and changing the number of shards only moves the hosts of
+    the ring segments that changed owner.
+    """
+    def __init__(self, shard_count, virtual_nodes=VIRTUAL_NODES):
+        points = []
+        for shard in range(shard_count):
+            for i in range(virtual_nodes):
+                points.append((_hash("shard-%d-%d" % (shard, i)), shard))
+        points.sort()
+        self.keys = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def shard(self, host):
+        i = bisect.bisect(self.keys, _hash(host)) % len(self.keys)
+        return self.shards[i]
+
+
+class Sharding(object):
+    """The slice of DataNodes and NodeManagers scraped by this exporter replica."""
+    def __init__(self, shard_index, shard_count):
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.ring = HashRing(shard_count)
+        self.owners = {}
+
+    @property
+    def is_master(self):
+        """Only the replica of shard 0 exports the NameNode, ResourceManager and JournalNode metrics."""
+        return self.shard_index == 0
+
+    def owns(self, url):
+        if self.shard_count == 1:
+            return True
+        host = urlparse(url).hostname or url
+        if host not in self.owners:
+            if len(self.owners) > 65536:
+                self.owners.clear()
+            self.owners[host] = self.ring.shard(host)
+        return self.owners[host] == self.shard_index
+
+    def select(self, urls):
+        return set(url for url in urls if self.owns(url))
+
+
+_sharding = Sharding(0, 1)
+
+
+def configure(shard_index, shard_count):
+    global _sharding
+    _sharding = Sharding(shard_index, shard_count)
+    logger.info("Shard {0} of {1}.".format(shard_index, shard_count))
+
+
+def is_master():
+    return _sharding.is_master
+
+
+def shard_label():
+    """The shard of this replica as a label value, None when a single replica scrapes every host."""
+    return str(_sharding.shard_index) if _sharding.shard_count > 1 else None
+
+
+def select(urls):
+    return _sharding.select(urls)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import marshal
+import threading
+
+from utils import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+STATE_VERSION = 1
+
+# The state file is written every SAVE_INTERVAL seconds.
+SAVE_INTERVAL = 60
+
+# Saved targets older than TARGETS_MAX_AGE seconds and saved snapshots older than
+# SNAPSHOT_MAX_AGE seconds are not restored.
+TARGETS_MAX_AGE = 24 * 3600
+SNAPSHOT_MAX_AGE = 600
+
+
+class StateFile(threading.Thread):
+    """
+    Save the DataNodes and NodeManagers discovered and, with `snapshots`, the last
+    snapshot of each exported collector to a marshal file, so that a restarted
+    exporter scrapes the nodes and serves the snapshots at once. The restored
+    targets are replaced by the first refresh of the NameNode and ResourceManager.
+    """
+    def __init__(self, path, cluster, scheduler, snapshots=False):
+        super(StateFile, self).__init__()
+        self.name = "state-file"
+        self.daemon = True
+        self.path = path
+        self.cluster = cluster
+        self.scheduler = scheduler
+        self.snapshots = snapshots
+        self.targets = {}
+        self._stopped = threading.Event()
+
+    def track(self, name, obj, attr):
+        """Save the targets in the `attr` attribute of `obj` under `name`."""
+        self.targets[name] = (obj, attr)
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                state = marshal.load(f)
+        except IOError:
+            return None
+        except Exception as e:
+            logger.warning("Read state file {0} failed, error: {1}.".format(self.path, str(e)))
+            return None
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION or state.get("cluster") != self.cluster:
+            logger.warning("Ignore state file {0}, it is not of this cluster or version.".format(self.path))
+            return None
+        return state
+
+    def restore(self):
+        """Restore the saved state, before the collectors are started."""
+        state = self.load()
+        if state is None:
+            return
+        age = time.time() - state["saved_at"]
+        if age <= TARGETS_MAX_AGE:
+            for name, value in state["targets"].items():
+                if name in self.targets:
+                    obj, attr = self.targets[name]
+                    setattr(obj, attr, value)
+                    logger.info("Restore {0} {1} from {2}.".format(len(value), name, self.path))
+        if age <= SNAPSHOT_MAX_AGE:
+            for scheduled in self.scheduler.exported():
+                saved = state["snapshots"].get(scheduled.collector_name)
+                if saved is not None:
+                    scheduled.restore(saved["timestamp"], saved["duration"], saved["text"])
+
+    def save(self):
+        state = {
+            "version": STATE_VERSION,
+            "cluster": self.cluster,
+            "saved_at": time.time(),
+            "targets": dict((name, getattr(obj, attr)) for name, (obj, attr) in self.targets.items()),
+            "snapshots": {},
+        }
+        if self.snapshots:
+            for scheduled in self.scheduler.exported():
+                snapshot, rendered = scheduled.snapshot, scheduled.rendered
+                if snapshot is None or rendered is None:
+                    continue
+                state["snapshots"][scheduled.collector_name] = {
+                    "timestamp": snapshot.timestamp,
+                    "duration": snapshot.duration,
+                    "text": rendered.get("text", True),
+                }
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                marshal.dump(state, f)
+            os.rename(tmp, self.path)
+        except Exception as e:
+            logger.warning("Write state file {0} failed, error: {1}.".format(self.path, str(e)))
+
+    def run(self):
+        while not self._stopped.wait(SAVE_INTERVAL):
+            self.save()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+# the exporter modules live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+
+
+@pytest.fixture(autouse=True, scope="session")
+def log_writer():
+    """Write the queued log records while the stream captured by pytest is still open."""
+    yield
+    writer = utils.log_handler().writer
+    if writer is not None:
+        writer.stop()
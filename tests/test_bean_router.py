@@ -0,0 +1,40 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from bean_router import BeanKey, BeanRouter, parse_bean_key
+
+
+@pytest.mark.parametrize("name, key", [
+    ("Hadoop:service=NameNode,name=FSNamesystem", BeanKey("Hadoop", "NameNode", "FSNamesystem", None)),
+    ("Hadoop:service=NameNode,name=MetricsSystem,sub=Stats", BeanKey("Hadoop", "NameNode", "MetricsSystem", "Stats")),
+    ("java.lang:type=OperatingSystem", BeanKey("java.lang", None, "OperatingSystem", None)),
+    ("java.lang:type=GarbageCollector,name=G1 Young Generation", BeanKey("java.lang", None, "G1 Young Generation", None)),
+    ("Hadoop:service=ResourceManager,name=QueueMetrics,q0=root,q1=default",
+     BeanKey("Hadoop", "ResourceManager", "QueueMetrics", None)),
+    ("JMImplementation", BeanKey("JMImplementation", None, None, None)),
+])
+def test_parse_bean_key(name, key):
+    assert parse_bean_key(name) == key
+
+
+@pytest.mark.parametrize("service, name, file_name", [
+    ("namenode", "Hadoop:service=NameNode,name=FSNamesystem", "FSNamesystem"),
+    ("namenode", "Hadoop:service=NameNode,name=RpcActivityForPort8020", "RpcActivity"),
+    ("namenode", "Hadoop:service=NameNode,name=RpcDetailedActivityForPort8020", "RpcDetailedActivity"),
+    ("namenode", "Hadoop:service=NameNode,name=MetricsSystem,sub=Stats", "MetricsSystem"),
+    ("namenode", "Hadoop:service=NameNode,name=MetricsSystem,sub=Control", None),
+    ("namenode", "Hadoop:service=NameNode,name=RetryCache.NameNodeRetryCache", "RetryCache"),
+    ("namenode", "java.lang:type=OperatingSystem", "OperatingSystem"),
+    ("namenode", "Hadoop:service=DataNode,name=FSNamesystem", None),
+    ("resourcemanager", "Hadoop:service=ResourceManager,name=QueueMetrics,q0=root,q1=default", "QueueMetrics"),
+    ("resourcemanager", "Hadoop:service=ResourceManager,name=QueueMetrics,q0=root,user=hive", "QueueMetrics"),
+])
+def test_route(service, name, file_name):
+    router = BeanRouter(service, ["FSNamesystem", "RpcActivity", "RpcDetailedActivity", "MetricsSystem", "RetryCache",
+                                  "OperatingSystem", "QueueMetrics"])
+    assert router.route(name) == file_name
+    # the second lookup is answered by the resolved names
+    assert router.route(name) == file_name
+    assert name in router.resolved
@@ -0,0 +1,46 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import pytest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from cardinality import CardinalityRule
+
+
+def by_method(family, values):
+    for method, value in values:
+        family.add_metric(["nn1", method], value)
+    return family
+
+
+def limited(rule, family):
+    metric = rule.limit(family, rule.kept_values([family]))
+    return dict((sample.labels["method"], sample.value) for sample in metric.samples)
+
+
+@pytest.mark.parametrize("family, folded", [
+    (CounterMetricFamily("hadoop_hdfs_namenode_rpc_detailed_method_called", "calls", labels=["_target", "method"]),
+     {"create": 30.0, "other": 30.0}),
+    (GaugeMetricFamily("hadoop_hdfs_namenode_rpc_detailed_method_avg_time_milliseconds", "avg", labels=["_target", "method"]),
+     {"create": 30.0}),
+    (GaugeMetricFamily("hadoop_hdfs_datanode_live_nodes_block_pool_used_percent", "percent", labels=["_target", "method"]),
+     {"create": 30.0}),
+])
+def test_fold_sums_additive_families_only(family, folded):
+    rule = CardinalityRule(family.name, label="method", top=1)
+    assert limited(rule, by_method(family, [("create", 30), ("delete", 10), ("mkdirs", 20)])) == folded
+
+
+@pytest.mark.parametrize("fold, folded", [
+    ("sum", {"create": 30.0, "other": 30.0}),
+    ("drop", {"create": 30.0}),
+])
+def test_explicit_fold(fold, folded):
+    family = GaugeMetricFamily("hadoop_hdfs_namenode_rpc_detailed_method_avg_time_milliseconds", "avg", labels=["_target", "method"])
+    rule = CardinalityRule(family.name, label="method", top=1, fold=fold)
+    assert limited(rule, by_method(family, [("create", 30), ("delete", 10), ("mkdirs", 20)])) == folded
+
+
+def test_unknown_fold():
+    with pytest.raises(ValueError):
+        CardinalityRule("hadoop_*", label="method", top=1, fold="mean")
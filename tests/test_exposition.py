@@ -0,0 +1,60 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import pytest
+from prometheus_client.core import GaugeMetricFamily
+
+from exposition import RenderedMetrics, accepts_gzip, choose_format
+
+
+def epoch_family():
+    family = GaugeMetricFamily("hadoop_hdfs_journalnode_current_writer_epoch", u"Current writer’s epoch number",
+                               labels=["cluster", "_target"])
+    family.add_metric(["c1", "jn1"], 3)
+    return family
+
+
+def test_restored_snapshot_serves_openmetrics():
+    saved = RenderedMetrics([epoch_family()]).get("text", True)
+    restored = RenderedMetrics.restore(saved)
+    text = restored.get("openmetrics", False)
+    assert u"Current writer’s epoch number".encode("utf-8") in text
+    assert 'hadoop_hdfs_journalnode_current_writer_epoch{_target="jn1",cluster="c1"} 3.0' in text
+    assert not text.endswith("# EOF\n")
+
+
+def test_restored_snapshot_serves_its_text():
+    saved = RenderedMetrics([epoch_family()]).get("text", True)
+    restored = RenderedMetrics.restore(saved)
+    assert restored.get("text", False) == RenderedMetrics([epoch_family()]).get("text", False)
+
+
+@pytest.mark.parametrize("accept_encoding, gzipped", [
+    (None, False),
+    ("gzip", True),
+    ("deflate, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("gzip;q=0.0, *", False),
+    ("*;q=0, gzip", True),
+    ("*", True),
+    ("identity, *;q=0", False),
+    ("gzip;q=x", False),
+    ("GZIP ; Q=1", True),
+])
+def test_accepts_gzip(accept_encoding, gzipped):
+    assert accepts_gzip(accept_encoding) == gzipped
+
+
+@pytest.mark.parametrize("accept, fmt", [
+    (None, "text"),
+    ("text/plain", "text"),
+    ("application/openmetrics-text", "openmetrics"),
+    ("application/openmetrics-text;version=1.0.0;q=0.5,application/openmetrics-text;version=0.0.1;q=0.4,"
+     "text/plain;version=0.0.4;q=0.3,*/*;q=0.2", "openmetrics"),
+    ("application/openmetrics-text;q=0", "text"),
+    ("application/openmetrics-text;q=0.2, text/plain;q=0.8", "text"),
+    ("text/*;q=0.1, application/openmetrics-text;q=0.5", "openmetrics"),
+    ("*/*", "text"),
+])
+def test_choose_format(accept, fmt):
+    assert choose_format(accept) == fmt
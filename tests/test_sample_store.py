@@ -0,0 +1,41 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from sample_store import CompactGaugeFamily, LabelTable, use_label_table, sample_count, samples_since, replay_samples
+
+
+def test_samples_keep_their_labels():
+    family = CompactGaugeFamily("dead_nodes", "Dead nodes", labels=["cluster", "datanode", "_target"])
+    family.add_metric(["c1", "dn1", "nn1"], 5)
+    family.add_metric(["c1", "dn2", "nn1"], 7)
+    assert [(s.labels, s.value) for s in family.samples] == [
+        ({"cluster": "c1", "datanode": "dn1", "_target": "nn1"}, 5.0),
+        ({"cluster": "c1", "datanode": "dn2", "_target": "nn1"}, 7.0),
+    ]
+
+
+@pytest.mark.parametrize("labels", [["c1", "dn1"], ["c1", "dn1", "nn1", "extra"]])
+def test_label_width_mismatch_raises(labels):
+    family = CompactGaugeFamily("dead_nodes", "Dead nodes", labels=["cluster", "datanode", "_target"])
+    with pytest.raises(ValueError):
+        family.add_metric(labels, 1)
+    assert sample_count(family) == 0
+
+
+def test_replay_into_another_label_table():
+    use_label_table(LabelTable())
+    try:
+        old = CompactGaugeFamily("f", "f", labels=["host"])
+        old.add_metric(["a"], 1)
+        old.add_metric(["b"], 2)
+        tail = samples_since(old, 0)
+        use_label_table(LabelTable())
+        new = CompactGaugeFamily("f", "f", labels=["host"])
+        new.add_metric(["c"], 3)
+        replayed = replay_samples(new, tail)
+    finally:
+        use_label_table(None)
+    assert replayed[0] is new.table
+    assert [(s.labels["host"], s.value) for s in new.samples] == [("c", 3.0), ("a", 1.0), ("b", 2.0)]
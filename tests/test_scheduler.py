@@ -0,0 +1,46 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import time
+
+from prometheus_client.core import GaugeMetricFamily
+
+import scheduler
+from exposition import RenderedMetrics
+from scheduler import ScheduledCollector
+
+
+class FlakyCollector(object):
+    """Fails its first `failures` refreshes, like a DataNode collector started before the NameNode answered."""
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def collect(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise IOError("no DataNodes yet")
+        family = GaugeMetricFamily("hadoop_hdfs_datanode_up", "up", labels=["cluster"])
+        family.add_metric(["c1"], 1)
+        return [family]
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_restored_snapshot_does_not_delay_the_first_refresh(monkeypatch):
+    monkeypatch.setattr(scheduler, "FIRST_RETRY", 0.01)
+    collector = FlakyCollector(2)
+    scheduled = ScheduledCollector("datanode", collector, 60)
+    scheduled.restore(time.time() - 30, 1.0, RenderedMetrics([]).get("text", True))
+    scheduled.start()
+    try:
+        assert wait_for(lambda: scheduled.refreshed)
+    finally:
+        scheduled.stop()
+    assert collector.calls == 3
+    assert [m.name for m in scheduled.snapshot.metrics] == ["hadoop_hdfs_datanode_up"]
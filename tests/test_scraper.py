@@ -0,0 +1,101 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+import pytest
+import requests
+
+import scraper
+from fetch_plan import compile_plan
+
+URL = "http://dn1:9864/jmx"
+DOCUMENT = '{"beans": [{"name": "Hadoop:service=DataNode,name=DataNodeInfo", "Version": "3.3.6"}]}'
+
+
+class FakeResponse(object):
+    status_code = 200
+    content = DOCUMENT
+    headers = {}
+
+    def close(self):
+        pass
+
+
+def answer():
+    return FakeResponse()
+
+
+def fail_after(seconds):
+    def fail():
+        time.sleep(seconds)
+        raise requests.exceptions.ConnectionError("connection refused")
+    return fail
+
+
+class FakeConnections(object):
+    """Answer the requests in turn with the given behaviours."""
+    def __init__(self, *behaviours):
+        self.lock = threading.Lock()
+        self.behaviours = list(behaviours)
+        self.requests = 0
+
+    def session(self, url):
+        return self
+
+    def get(self, url, timeout=None, stream=False):
+        with self.lock:
+            self.requests += 1
+            behaviour = self.behaviours.pop(0)
+        return behaviour()
+
+
+@pytest.fixture
+def hedging():
+    scraper.configure(4, 2, 4, 300, hedge_after=0.05)
+    yield
+    scraper.configure(64, 2, 4, 300)
+
+
+def run_hedged(behaviours):
+    scraper._connections = FakeConnections(*behaviours)
+    target = scraper.ScrapeTarget(URL)
+    result = []
+    task = scraper.Scraper(URL, result, target)
+    settled = scraper.scrape_pool().run([task])
+    # let the slow copy finish too
+    time.sleep(0.4)
+    return settled, task, target, result
+
+
+def test_slow_failing_original_keeps_the_answer_of_its_copy(hedging):
+    settled, task, target, result = run_hedged([fail_after(0.3), answer])
+    assert settled
+    assert task.ok
+    assert task.error is None
+    assert not target.failed
+    assert [bean["Version"] for bean in result[0]] == ["3.3.6"]
+    assert scraper.scrape_pool().hedge_wins == 1
+
+
+def test_failure_is_kept_once_every_copy_failed(hedging):
+    settled, task, target, result = run_hedged([fail_after(0.2), fail_after(0.1)])
+    assert settled
+    assert not task.ok
+    assert task.error[0] == "ConnectionError"
+    assert target.failed
+    assert result == []
+
+
+@pytest.mark.parametrize("service,requests_sent", [("datanode", 1), ("namenode", 2)])
+def test_breakers_only_skip_worker_nodes(service, requests_sent):
+    scraper.configure(4, 2, 4, 300, breaker_failures=1, breaker_backoff=60)
+    try:
+        scraper._connections = connections = FakeConnections(fail_after(0), fail_after(0))
+        scrape = scraper.ScrapeMetrics([URL], compile_plan(service, ["JvmMetrics"]))
+        assert scrape.scrape_targets() == []
+        assert scrape.scrape_targets() == []
+        assert connections.requests == requests_sent
+    finally:
+        scraper.configure(64, 2, 4, 300)
@@ -2,38 +2,198 @@
 # -*- coding: utf-8 -*-
 
 import os
+import copy
+import time
+import atexit
 import argparse
 import logging
-import yaml
+import threading
+import Queue
 
 
-def get_module_logger(mod_name):
-    logger = logging.getLogger(mod_name)
-    logger.setLevel(logging.DEBUG)
+# Records waiting for the log writer, the ones logged while it is full are dropped.
+LOG_QUEUE_SIZE = 10000
 
-    path = os.path.dirname(os.path.abspath(__file__))
-    par_path = os.path.dirname(path)
-    fh = logging.FileHandler(os.path.join(par_path, "hadoop_jmx_exporter.log"))
-    fh.setLevel(logging.INFO)
+# At most LOG_RATE_BURST messages of one call site are written per LOG_RATE_WINDOW
+# seconds, the others are counted and summed up at the end of the window.
+LOG_RATE_BURST = 10
+LOG_RATE_WINDOW = 60
+
+# Seconds the log writer is given to write the queued records at exit.
+LOG_STOP_TIMEOUT = 5
+
+
+class QueueHandler(logging.Handler):
+    """
+    Hand the records over to the log writer thread, logging never waits on I/O.
+    The writer of a process is started by its first record, so that no thread
+    runs before the parsing processes are forked, and a forked process starts
+    its own.
+    """
+    def __init__(self, handlers):
+        logging.Handler.__init__(self)
+        self.handlers = handlers
+        self.writer = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+
+    def running_writer(self):
+        pid = os.getpid()
+        if self.pid != pid:
+            with self.start_lock:
+                if self.pid != pid:
+                    writer = LogWriter(self.handlers)
+                    writer.start()
+                    atexit.register(writer.stop)
+                    self.writer, self.pid = writer, pid
+        return self.writer
+
+    def emit(self, record):
+        writer = self.running_writer()
+        try:
+            writer.queue.put_nowait(record)
+        except Queue.Full:
+            writer.dropped += 1
+
+
+class LogWriter(threading.Thread):
+    """
+    Write the queued records to the file and stream handlers. Each call site, or
+    the `rate_key` given in `extra`, writes at most LOG_RATE_BURST messages per
+    LOG_RATE_WINDOW seconds, then how many were suppressed and the last of them.
+    """
+    def __init__(self, handlers):
+        super(LogWriter, self).__init__()
+        self.name = "log-writer"
+        self.daemon = True
+        self.handlers = handlers
+        self.queue = Queue.Queue(LOG_QUEUE_SIZE)
+        self.window_start = time.time()
+        self.counts = {}
+        self.suppressed = {}
+        self.dropped = 0
+
+    def key(self, record):
+        return getattr(record, "rate_key", None) or (record.pathname, record.lineno)
+
+    def write(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def end_window(self, now):
+        for key, (count, record) in self.suppressed.items():
+            summary = copy.copy(record)
+            summary.msg = "Suppressed {0} messages like this one in the last {1} seconds, the last one: {2}".format(
+                count, LOG_RATE_WINDOW, record.getMessage())
+            summary.args = None
+            summary.created = now
+            summary.msecs = (now - int(now)) * 1000
+            self.write(summary)
+        if self.dropped > 0:
+            record = logging.makeLogRecord({"name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                                            "pathname": __file__, "filename": os.path.basename(__file__),
+                                            "msg": "Dropped {0} log messages, the log writer fell behind.".format(self.dropped)})
+            self.dropped = 0
+            self.write(record)
+        self.window_start = now
+        self.counts = {}
+        self.suppressed = {}
+
+    def handle(self, record):
+        key = self.key(record)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if self.counts[key] <= LOG_RATE_BURST:
+            self.write(record)
+        else:
+            self.suppressed[key] = (self.suppressed.get(key, (0, None))[0] + 1, record)
 
-    sh = logging.StreamHandler()
-    sh.setLevel(logging.INFO)
+    def stop(self):
+        """Write the queued records and the suppressed counts, at exit."""
+        try:
+            self.queue.put(self, timeout=LOG_STOP_TIMEOUT)
+        except Queue.Full:
+            pass
+        self.join(LOG_STOP_TIMEOUT)
+        self.end_window(time.time())
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except (IOError, ValueError):
+                # the stream was already closed by the embedding program
+                pass
 
-    fmt = logging.Formatter(fmt='%(asctime)s %(filename)s[line:%(lineno)d]-[%(levelname)s]: %(message)s')
-    fh.setFormatter(fmt)
-    sh.setFormatter(fmt)
+    def run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=1)
+            except Queue.Empty:
+                record = None
+            if record is self:
+                # queued by stop()
+                break
+            now = time.time()
+            if now - self.window_start >= LOG_RATE_WINDOW:
+                self.end_window(now)
+            if record is not None:
+                self.handle(record)
 
-    logger.addHandler(fh)
-    logger.addHandler(sh)
+
+_log_lock = threading.Lock()
+_log_handler = None
+_log_level = logging.INFO
+_loggers = []
+
+
+def log_handler():
+    """The handler shared by every module logger."""
+    global _log_handler
+    with _log_lock:
+        if _log_handler is None:
+            path = os.path.dirname(os.path.abspath(__file__))
+            par_path = os.path.dirname(path)
+            fh = logging.FileHandler(os.path.join(par_path, "hadoop_jmx_exporter.log"))
+            sh = logging.StreamHandler()
+
+            fmt = logging.Formatter(fmt='%(asctime)s %(filename)s[line:%(lineno)d]-[%(levelname)s]: %(message)s')
+            fh.setFormatter(fmt)
+            sh.setFormatter(fmt)
+
+            _log_handler = QueueHandler([fh, sh])
+        return _log_handler
+
+
+def get_module_logger(mod_name):
+    logger = logging.getLogger(mod_name)
+    handler = log_handler()
+    with _log_lock:
+        # the level is checked by the logger, a filtered out message is not even formatted
+        logger.setLevel(_log_level)
+        if logger not in _loggers:
+            _loggers.append(logger)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
     return logger
 
 
+def set_log_level(level):
+    """Set the level of every module logger, such as logging.DEBUG or "DEBUG"."""
+    global _log_level
+    if not isinstance(level, int):
+        level = logging.getLevelName(level)
+    with _log_lock:
+        _log_level = level
+        for logger in _loggers:
+            logger.setLevel(level)
+
+
 logger = get_module_logger(__name__)
 
 def read_json_file(path_name, file_name):
     path = os.path.dirname(os.path.realpath(__file__))
     metric_path = os.path.join(path, "metrics", path_name)
     metric_name = "{0}.json".format(file_name)
+    import yaml
     try:
         with open(os.path.join(metric_path, metric_name), 'r') as f:
             metrics = yaml.safe_load(f)
@@ -43,6 +203,13 @@ def read_json_file(path_name, file_name):
         return {}
 
 
+def read_config_file(path):
+    """Load a YAML config file given on the command line."""
+    import yaml
+    with open(path, 'r') as f:
+        return yaml.safe_load(f)
+
+
 def get_file_list(file_path_name):
     path = os.path.dirname(os.path.abspath(__file__))
     json_path = os.path.join(path, "metrics", file_path_name)
@@ -65,6 +232,42 @@ def parse_args():
     parser.add_argument('-nns', required=False, metavar='namenode_jmx_url', help='Hadoop hdfs namenode jmx metrics URL.', nargs="*")
     parser.add_argument('-rms', required=False, metavar='resourcemanager_jmx_url', help='Hadoop resourcemanager metrics jmx URL.', nargs="*")
     parser.add_argument('-jns', required=False, metavar='journalnode_jmx_url', help='Hadoop journalnode jmx metrics URL.', nargs="*")
+    parser.add_argument('-interval', required=False, metavar='seconds', type=int, help='Refresh interval of NameNode, ResourceManager and JournalNode metrics in seconds. default: 15', default=15)
+    parser.add_argument('-node-interval', required=False, metavar='seconds', type=int, help='Refresh interval of DataNode and NodeManager metrics in seconds. default: 30', default=30)
+    parser.add_argument('-standby-interval', required=False, metavar='seconds', type=int, help='Refresh interval of standby NameNodes and ResourceManagers, which are scraped with fewer beans, 0 scrapes them like the active ones. default: 60', default=60)
+    parser.add_argument('-deadline', required=False, metavar='seconds', type=float, help='Time a NameNode, ResourceManager or JournalNode refresh waits for its jmx requests, 0 waits for every target. default: 0', default=0)
+    parser.add_argument('-node-deadline', required=False, metavar='seconds', type=float, help='Time a DataNode or NodeManager refresh waits for its jmx requests, 0 waits for every target. default: 0', default=0)
+    parser.add_argument('-late-policy', required=False, metavar='policy', choices=['reuse', 'stale', 'drop'], help='What is exported for a target which misses the deadline: reuse its last beans, stale exports them with NaN values, or drop it. default: reuse', default='reuse')
+    parser.add_argument('-rolling-scrape', required=False, action='store_true', help='Spread the DataNode and NodeManager requests over the node interval instead of sending them at once.')
+    parser.add_argument('-concurrency', required=False, metavar='requests', type=int, help='Max number of jmx requests in flight. default: 64', default=64)
+    parser.add_argument('-host-concurrency', required=False, metavar='requests', type=int, help='Max number of jmx requests in flight to one host. default: 2', default=2)
+    parser.add_argument('-pool-size', required=False, metavar='connections', type=int, help='Max number of keep-alive connections kept to one host. default: 4', default=4)
+    parser.add_argument('-pool-idle-timeout', required=False, metavar='seconds', type=int, help='Close keep-alive connections to a host idle for this long. default: 300', default=300)
+    parser.add_argument('-request-timeout', required=False, metavar='seconds', type=float, help='Timeout of one jmx request. default: 5', default=5)
+    parser.add_argument('-breaker-failures', required=False, metavar='failures', type=int, help='Skip a DataNode or NodeManager after this many failed scrapes in a row, 0 never skips. default: 0', default=0)
+    parser.add_argument('-breaker-backoff', required=False, metavar='seconds', type=int, help='Skip a failing target for this long, doubled after each failed probe. default: 30', default=30)
+    parser.add_argument('-hedge-after', required=False, metavar='seconds', type=float, help='Send a jmx request once more when it did not answer after this long, 0 never does. default: 0', default=0)
+    parser.add_argument('-bean-cache-size', required=False, metavar='beans', type=int, help='Max number of beans kept to skip decoding the /jmx?qry= documents which did not change, full jmx documents are never cached, 0 disables the cache. default: 0', default=0)
+    parser.add_argument('-full-jmx', required=False, action='store_true', help='Fetch the full jmx document instead of querying only the beans in use.')
+    parser.add_argument('-json-decoder', required=False, metavar='decoder', choices=['auto', 'ujson', 'simplejson', 'json'], help='JSON module used to decode jmx beans: auto, ujson, simplejson or json. default: auto', default='auto')
+    parser.add_argument('-stream-above', required=False, metavar='bytes', type=int, help='Decode a full jmx document bean by bean, holding less of it in memory, when it is larger than this or of unknown size, 0 always decodes it whole. default: 0', default=0)
+    parser.add_argument('-parse-workers', required=False, metavar='processes', type=int, help='Number of processes decoding the jmx documents, 0 decodes them in the scraping threads. default: 0', default=0)
+    parser.add_argument('-cardinality-config', required=False, metavar='file', help='YAML file of cardinality rules bounding the label values of metric families. default: no limit', default=None)
+    parser.add_argument('-rollup-config', required=False, metavar='file', help='YAML file of rollup rules aggregating DataNode and NodeManager metrics over the cluster or the racks. default: no rollup', default=None)
+    parser.add_argument('-state-file', required=False, metavar='file', help='File the discovered DataNodes and NodeManagers are saved to, and restored from at startup. default: none', default=None)
+    parser.add_argument('-state-snapshots', required=False, action='store_true', help='Also save the last snapshots to -state-file, they are served at startup until the first refresh.')
+    parser.add_argument('-shard-index', required=False, metavar='index', type=int, help='Index of this exporter among the replicas sharing the DataNodes and NodeManagers, replica 0 also exports the master metrics. default: 0', default=0)
+    parser.add_argument('-shard-count', required=False, metavar='count', type=int, help='Number of exporter replicas sharing the DataNodes and NodeManagers. default: 1', default=1)
+    parser.add_argument('-log-level', required=False, metavar='level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='Lowest level of the logged messages: DEBUG, INFO, WARNING or ERROR, DEBUG also logs each failed jmx request. default: INFO', default='INFO')
     parser.add_argument('-host', required=False, metavar='host', help='Listen on this address. default: 0.0.0.0', default='0.0.0.0')
     parser.add_argument('-port', required=False, metavar='port', type=int, help='Listen to this port. default: 6688', default=6688)
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.shard_count < 1 or not 0 <= args.shard_index < args.shard_count:
+        parser.error("-shard-index must be in [0, -shard-count)")
+    if args.parse_workers < 0:
+        parser.error("-parse-workers must not be negative")
+    if args.state_snapshots and args.state_file is None:
+        parser.error("-state-snapshots needs -state-file")
+    if args.deadline < 0 or args.node_deadline < 0:
+        parser.error("-deadline and -node-deadline must not be negative")
+    return args
@@ -1,32 +1,44 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8 -*-
 
-import re
-from prometheus_client.core import GaugeMetricFamily
+from functools import partial
 
 from utils import get_module_logger
-from common import MetricCollector, CommonMetricCollector
-from scraper import ScrapeMetrics
+from sample_store import CompactGaugeFamily
+from common import MetricCollector, CommonMetricCollector, to_snake_case
+from scraper import ScrapeMetrics, RollingScrapeMetrics
+import sharding
+from bean_cache import map_bean
 
 logger = get_module_logger(__name__)
 
 
 class NodeManagerMetricCollector(MetricCollector):
 
-    def __init__(self, cluster, rmc):
+    def __init__(self, cluster, rmc, rolling_interval=None):
         MetricCollector.__init__(self, cluster, "yarn", "nodemanager")
         self.target = "-"
         self.rmc = rmc
+        self.rolling = None
+        if rolling_interval is not None:
+            self.rolling = RollingScrapeMetrics("nodemanager", rolling_interval, self.fetch_plan)
+            self.rolling.start()
 
         self.hadoop_nodemanager_metrics = {}
         for i in range(len(self.file_list)):
             self.hadoop_nodemanager_metrics.setdefault(self.file_list[i], {})
 
         self.common_metric_collector = CommonMetricCollector(cluster, "yarn", "nodemanager")
+        self.plans = self.compile_plans()
 
     def collect(self):
         isSetup = False
-        beans_list = ScrapeMetrics(self.rmc.nms).scrape()
+        if self.rolling is not None:
+            beans_list = self.rolling.scrape(sharding.select(self.rmc.nms))
+        else:
+            beans_list = ScrapeMetrics(sharding.select(self.rmc.nms), self.fetch_plan).scrape()
+        if len(beans_list) == 0:
+            return
         for beans in beans_list:
             if not isSetup:
                 self.common_metric_collector.setup_labels(beans)
@@ -47,42 +59,50 @@ class NodeManagerMetricCollector(MetricCollector):
 
     def setup_metrics_labels(self, beans):
         for i in range(len(beans)):
-            for service in self.metrics:
-                if service in beans[i]['name']:
-                    container_flag = 1
-                    for metric in self.metrics[service]:
-                        label = ["cluster", "host"]
-                        if metric.startswith("Containers"):
-                            if container_flag:
-                                container_flag = 0
-                                label.append("status")
-                                key = "containers"
-                                name = "_".join([self.prefix, "container_count"])
-                                description = "Count of container"
-                            else:
-                                continue
-                        else:
-                            snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
-                            name = "_".join([self.prefix, snake_case])
-                            key = metric
-                            description = self.metrics[service][metric]
-                        label.append("target")
-                        self.hadoop_nodemanager_metrics[service][key] = GaugeMetricFamily(name, description, labels=label)
+            service = self.router.route(beans[i]['name'])
+            if service is None:
+                continue
+            container_flag = 1
+            for metric in self.metrics[service]:
+                label = ["cluster", "host"]
+                if metric.startswith("Containers"):
+                    if container_flag:
+                        container_flag = 0
+                        label.append("status")
+                        key = "containers"
+                        name = "_".join([self.prefix, "container_count"])
+                        description = "Count of container"
+                    else:
+                        continue
+                else:
+                    name = "_".join([self.prefix, to_snake_case(metric)])
+                    key = metric
+                    description = self.metrics[service][metric]
+                label.append("target")
+                self.hadoop_nodemanager_metrics[service][key] = CompactGaugeFamily(name, description, labels=label)
+
+    def compile_plans(self):
+        plans = {}
+        for service in self.metrics:
+            plan = plans.setdefault(service, {})
+            for metric in self.metrics[service]:
+                if metric.startswith("Containers"):
+                    plan[metric] = ("containers", [metric.split("Containers")[1]])
+                else:
+                    plan[metric] = (metric, [])
+        return plans
+
+    def get_service_metrics(self, service, bean):
+        plan = self.plans[service]
+        for metric in bean:
+            if metric not in plan:
+                continue
+            key, label = plan[metric]
+            value = bean[metric] if bean[metric] > 0 else 0  # incase vcore or memory < 0
+            self.hadoop_nodemanager_metrics[service][key].add_metric([self.cluster, self.target] + label + [self.target], value)
 
     def get_metrics(self, beans):
         for i in range(len(beans)):
-            for service in self.metrics:
-                if service not in beans[i]['name']:
-                    continue
-                for metric in beans[i]:
-                    if metric not in self.metrics[service]:
-                        continue
-                    label = [self.cluster, self.target]
-                    if metric.startswith("Containers"):
-                        key = "containers"
-                        label.append(metric.split("Containers")[1])
-                    else:
-                        key = metric
-                    label.append(self.target)
-                    value = beans[i][metric] if beans[i][metric] > 0 else 0  # incase vcore or memory < 0
-                    self.hadoop_nodemanager_metrics[service][key].add_metric(label, value)
+            service = self.router.route(beans[i]['name'])
+            if service is not None:
+                map_bean(beans[i], self.hadoop_nodemanager_metrics[service], partial(self.get_service_metrics, service))
@@ -1,13 +1,16 @@
 #!/usr/bin/env python2
 # -*- coding: utf-8 -*-
 
-import yaml
 import re
-from prometheus_client.core import GaugeMetricFamily
 
 from utils import get_module_logger
-from common import MetricCollector, CommonMetricCollector
+from sample_store import CompactGaugeFamily
+from common import MetricCollector, CommonMetricCollector, to_snake_case
 from scraper import ScrapeMetrics
+from fetch_plan import compile_plan
+from decoder import load_embedded
+from bean_cache import map_bean
+from ha import HAScrape
 
 logger = get_module_logger(__name__)
 
@@ -23,23 +26,46 @@ class ResourceManagerMetricCollector(MetricCollector):
         'REBOOTED': 6,
     }
 
-    def __init__(self, cluster, urls, queue_regexp):
+    # beans not fetched from a standby ResourceManager, they are empty there
+    STANDBY_EXCLUDED = ['ClusterMetrics', 'QueueMetrics', 'RMNMInfo']
+
+    # bean whose State tells the active ResourceManager of an HA pair
+    RMINFO = "Hadoop:service=ResourceManager,name=RMInfo"
+
+    def __init__(self, cluster, urls, queue_regexp, discovery_only=False, standby_interval=0):
         MetricCollector.__init__(self, cluster, "yarn", "resourcemanager")
+        names = self.merge_list
+        if discovery_only:
+            # only RMNMInfo is needed to find the NodeManagers
+            names = ["RMNMInfo"]
+            self.fetch_plan = compile_plan("resourcemanager", names)
         self.target = "-"
         self.queue_regexp = queue_regexp
         self.nms = set()
+        self.racks = {}
 
         self.hadoop_resourcemanager_metrics = {}
         for i in range(len(self.file_list)):
             self.hadoop_resourcemanager_metrics.setdefault(self.file_list[i], {})
 
         self.common_metric_collector = CommonMetricCollector(cluster, "yarn", "resourcemanager")
+        self.queue_plan = self.compile_queue_plan()
+        self.cluster_plan = self.compile_cluster_plan()
 
-        self.scrape_metrics = ScrapeMetrics(urls)
+        if standby_interval > 0:
+            names = names + ["RMInfo"]
+            self.fetch_plan = compile_plan("resourcemanager", names)
+            standby_plan = compile_plan("resourcemanager", [name for name in names if name not in self.STANDBY_EXCLUDED])
+            self.scrape_metrics = HAScrape("resourcemanager", urls, self.fetch_plan, standby_plan, standby_interval,
+                                           self.ha_role)
+        else:
+            self.scrape_metrics = ScrapeMetrics(urls, self.fetch_plan)
 
     def collect(self):
         isSetup = False
         beans_list = self.scrape_metrics.scrape()
+        if len(beans_list) == 0:
+            return
         for beans in beans_list:
             if not isSetup:
                 self.common_metric_collector.setup_labels(beans)
@@ -71,7 +97,7 @@ class ResourceManagerMetricCollector(MetricCollector):
                 name = "_".join([self.prefix, 'node_memory_available_mb'])
             else:
                 continue
-            self.hadoop_resourcemanager_metrics['RMNMInfo'][metric] = GaugeMetricFamily(name, self.metrics['RMNMInfo'][metric], labels=label)
+            self.hadoop_resourcemanager_metrics['RMNMInfo'][metric] = CompactGaugeFamily(name, self.metrics['RMNMInfo'][metric], labels=label)
 
     def setup_queue_labels(self):
         running_flag, mb_flag, vcore_flag, container_flag, apps_flag = 1, 1, 1, 1, 1
@@ -124,11 +150,10 @@ class ResourceManagerMetricCollector(MetricCollector):
                     continue
             else:
                 key = metric
-                snake_case = re.sub('([a-z0-9])([A-Z])', r'\1_\2', metric).lower()
-                name = "_".join([self.prefix, snake_case])
+                name = "_".join([self.prefix, to_snake_case(metric)])
                 description = self.metrics['QueueMetrics'][metric]
             label.append("_target")
-            self.hadoop_resourcemanager_metrics['QueueMetrics'][key] = GaugeMetricFamily(name, description, labels=label)
+            self.hadoop_resourcemanager_metrics['QueueMetrics'][key] = CompactGaugeFamily(name, description, labels=label)
 
     def setup_cluster_labels(self):
         nm_flag, cm_num_flag, cm_avg_flag = 1, 1, 1
@@ -166,26 +191,34 @@ class ResourceManagerMetricCollector(MetricCollector):
                 description = self.metrics['ClusterMetrics'][metric]
                 label = ["cluster"]
             label.append("_target")
-            self.hadoop_resourcemanager_metrics['ClusterMetrics'][key] = GaugeMetricFamily("_".join([self.prefix, name]), description, labels=label)
+            self.hadoop_resourcemanager_metrics['ClusterMetrics'][key] = CompactGaugeFamily("_".join([self.prefix, name]), description, labels=label)
+
+    def ha_role(self, url, beans):
+        for bean in beans:
+            if bean['name'] == self.RMINFO:
+                state = bean.get('State')
+                return state.lower() if state else None
+        return None
 
     def setup_metrics_labels(self, beans):
         for i in range(len(beans)):
-            if 'RMNMInfo' in beans[i]['name']:
+            if self.router.route(beans[i]['name']) == 'RMNMInfo':
                 self.setup_rmnminfo_labels()
-            if 'QueueMetrics' in self.metrics:
-                self.setup_queue_labels()
-            if 'ClusterMetrics' in self.metrics:
-                self.setup_cluster_labels()
+        if 'QueueMetrics' in self.metrics:
+            self.setup_queue_labels()
+        if 'ClusterMetrics' in self.metrics:
+            self.setup_cluster_labels()
 
     def get_rmnminfo_metrics(self, bean):
+        live_nm_list = load_embedded(bean['LiveNodeManagers'])
         for metric in self.metrics['RMNMInfo']:
-            nms = set()
-            live_nm_list = yaml.safe_load(bean['LiveNodeManagers'])
+            nms, racks = set(), {}
             for j in range(len(live_nm_list)):
                 nms.add("http://"+live_nm_list[j]["NodeHTTPAddress"]+"/jmx")
                 host = live_nm_list[j]['HostName']
                 version = live_nm_list[j]['NodeManagerVersion']
                 rack = live_nm_list[j]['Rack']
+                racks[host] = rack
                 label = [self.cluster, host, version, rack, self.target]
                 if 'State' == metric:
                     value = self.NODE_STATE[live_nm_list[j]['State']]
@@ -193,61 +226,62 @@ class ResourceManagerMetricCollector(MetricCollector):
                     value = live_nm_list[j][metric] if metric in live_nm_list[j] else 0.0
                 self.hadoop_resourcemanager_metrics['RMNMInfo'][metric].add_metric(label, value)
             self.nms = nms
+            self.racks = racks
 
-    def get_queue_metrics(self, bean):
-        for metric in self.metrics['QueueMetrics']:
-            label = [self.cluster, bean.get("modelerType", "-"), bean.get("tag.Queue", "-"), bean.get("tag.User", "-")]
+    def compile_queue_plan(self):
+        plan = []
+        for metric in self.metrics.get('QueueMetrics', {}):
             if "running_0" in metric:
-                key = "running_app"
-                label.append("0to60")
+                key, label = "running_app", ["0to60"]
             elif "running_60" in metric:
-                key = "running_app"
-                label.append("60to300")
+                key, label = "running_app", ["60to300"]
             elif "running_300" in metric:
-                key = "running_app"
-                label.append("300to1440")
+                key, label = "running_app", ["300to1440"]
             elif "running_1440" in metric:
-                key = "running_app"
-                label.append("1440up")
+                key, label = "running_app", ["1440up"]
             elif metric.endswith("VCores"):
-                label.append(metric.split("VCores")[0])
-                key = "vcore"
+                key, label = "vcore", [metric.split("VCores")[0]]
             elif metric.endswith("Containers"):
-                label.append(metric.split("Containers")[0])
-                key = "containers"
+                key, label = "containers", [metric.split("Containers")[0]]
             elif metric.endswith("MB"):
-                label.append(metric.split("MB")[0])
-                key = "memory"
+                key, label = "memory", [metric.split("MB")[0]]
             elif metric.startswith("Apps"):
-                label.append(metric.split("Apps")[1])
-                key = "apps"
+                key, label = "apps", [metric.split("Apps")[1]]
             else:
-                key = metric
-            label.append(self.target)
-            self.hadoop_resourcemanager_metrics['QueueMetrics'][key].add_metric(label, bean[metric] if metric in bean else 0)
+                key, label = metric, []
+            plan.append((metric, key, label))
+        return plan
 
-    def get_cluster_metrics(self, bean):
-        for metric in self.metrics['ClusterMetrics']:
-            label = [self.cluster]
+    def compile_cluster_plan(self):
+        plan = []
+        for metric in self.metrics.get('ClusterMetrics', {}):
             if "NMs" in metric:
-                label.append(metric.split('NMs')[0].split('Num')[1])
-                key = "NMs"
+                key, label = "NMs", [metric.split('NMs')[0].split('Num')[1]]
             elif "NumOps" in metric:
-                key = "NumOps"
-                label.append(metric.split("DelayNumOps")[0].split('AM')[1])
+                key, label = "NumOps", [metric.split("DelayNumOps")[0].split('AM')[1]]
             elif "AvgTime" in metric:
-                key = "AvgTime"
-                label.append(metric.split("DelayAvgTime")[0].split('AM')[1])
+                key, label = "AvgTime", [metric.split("DelayAvgTime")[0].split('AM')[1]]
             else:
                 continue
-            label.append(self.target)
-            self.hadoop_resourcemanager_metrics['ClusterMetrics'][key].add_metric(label, bean[metric] if metric in bean else 0)
+            plan.append((metric, key, label))
+        return plan
+
+    def get_queue_metrics(self, bean):
+        prefix = [self.cluster, bean.get("modelerType", "-"), bean.get("tag.Queue", "-"), bean.get("tag.User", "-")]
+        for metric, key, label in self.queue_plan:
+            self.hadoop_resourcemanager_metrics['QueueMetrics'][key].add_metric(prefix + label + [self.target], bean[metric] if metric in bean else 0)
+
+    def get_cluster_metrics(self, bean):
+        for metric, key, label in self.cluster_plan:
+            self.hadoop_resourcemanager_metrics['ClusterMetrics'][key].add_metric([self.cluster] + label + [self.target], bean[metric] if metric in bean else 0)
 
     def get_metrics(self, beans):
         for i in range(len(beans)):
-            if 'RMNMInfo' in beans[i]['name']:
+            service = self.router.route(beans[i]['name'])
+            if service == 'RMNMInfo':
+                # not replayed from the bean cache, it also updates the NodeManagers to scrape
                 self.get_rmnminfo_metrics(beans[i])
-            if 'name=QueueMetrics' in beans[i]['name'] and re.match(self.queue_regexp, beans[i]['tag.Queue']):
-                self.get_queue_metrics(beans[i])
-            if 'ClusterMetrics' in beans[i]['name']:
-                self.get_cluster_metrics(beans[i])
+            elif service == 'QueueMetrics' and re.match(self.queue_regexp, beans[i]['tag.Queue']):
+                map_bean(beans[i], self.hadoop_resourcemanager_metrics[service], self.get_queue_metrics)
+            elif service == 'ClusterMetrics':
+                map_bean(beans[i], self.hadoop_resourcemanager_metrics[service], self.get_cluster_metrics)